@@ -1,26 +1,98 @@
 import os
 import secrets
+import click
 from functools import wraps    # for creating 'named' decorators
 from flask import (
+    abort,
+    before_render_template,
     flash,
     Flask,
     g,
+    jsonify,
     redirect,
     render_template,
     request,
+    Response,
     send_from_directory,
     session,
+    stream_template,
+    template_rendered,
     url_for
 )
 from job_board.utils import (
     validate_new_password_minimum_requirements
 )
+from werkzeug.http import is_resource_modified
 from werkzeug.utils import secure_filename
-from job_board.database_persistence import DatabasePersistence
-from bcrypt import checkpw, gensalt, hashpw
+from job_board.auth import SessionVerifier
+from job_board.autocomplete import PrefixIndex
+from job_board.cache import LazySequence, TaxonomyCache
+from job_board.database_persistence import (
+    DatabasePersistence,
+    DuplicateCompany,
+    StaleJob
+)
+from job_board.instrumentation import (
+    current_metrics,
+    end_request,
+    EndpointHistograms,
+    start_request
+)
+from job_board.fragments import FragmentCache
+from job_board.invalidation import InvalidationListener
+from job_board.job_import import InvalidImport, detect_format, import_jobs
+from job_board.loadtest import (
+    DEFAULT_THRESHOLD,
+    DEFAULT_WEIGHTS,
+    LoadTest,
+    LoadTestError,
+    compare,
+    format_report,
+    load as load_report,
+    save as save_report
+)
+from job_board.logos import (
+    InvalidLogo,
+    is_processed,
+    process_logo,
+    remove_other_variants,
+    VARIANT_NAME,
+    variant_name
+)
+from job_board.migrate import run_migrations
+from job_board.passwords import PasswordHasher, PasswordHasherBusy
+from job_board.sessions import ServerSideSession, ServerSideSessionInterface
+from job_board.synthetic import generate as generate_data
+from job_board.versions import ContentVersions
 
 app = Flask(__name__)
 app.secret_key = secrets.token_hex(32)
+app.config.update(
+    JOBS_PER_PAGE=20,           # job listing and feed page size
+    MAX_JOBS_PER_PAGE=100,      # upper bound for ?per_page=
+    PROFILE_RECENT_JOBS=3,      # jobs previewed on a company profile
+    AUTOCOMPLETE_LIMIT=8,       # suggestions per typeahead request
+    SHOW_REQUEST_TIMINGS=False, # timings footer (always shown in debug)
+    # Server-Timing headers and /_metrics (always exposed in debug)
+    EXPOSE_REQUEST_METRICS=os.environ.get('FLASK_ENV') == 'development',
+    SESSION_BACKEND=os.environ.get('SESSION_BACKEND', 'cookie'), # or server
+    LOGO_MAX_AGE=365 * 24 * 60 * 60, # logo URLs change with their content
+    STREAM_CHUNK_SIZE=8192,     # bytes buffered per write of a streamed page
+    JOB_IMPORT_MAX_BYTES=50 * 1024 * 1024, # largest bulk job upload
+)
+storage = DatabasePersistence() # one per worker, shared across requests
+taxonomy = TaxonomyCache(storage)
+autocomplete_index = PrefixIndex(storage)
+invalidation_listener = InvalidationListener(storage)
+request_histograms = EndpointHistograms()
+password_hasher = PasswordHasher()
+if os.environ.get('FLASK_ENV') == 'production':
+    password_hasher.rounds # fail now without BCRYPT_ROUNDS, not at a sign-in
+session_verifier = SessionVerifier(storage)
+content_versions = ContentVersions(storage)
+fragments = FragmentCache(storage, app.jinja_env)
+if app.config['SESSION_BACKEND'] == 'server':
+    app.session_interface = ServerSideSessionInterface(storage)
 
 def get_data_path(): # for company profile images
     app_dir = os.path.dirname(__file__)
@@ -30,26 +102,159 @@ def get_data_path(): # for company profile images
     else:
         return os.path.join(app_dir, 'job_board', 'data')
 
-def valid_credentials(company_email, password):
+def logos_dir():
+    return os.path.join(get_data_path(), 'logos')
+
+def logo_url(company, size=125, extension='png'):
+    '''
+    Immutable URL of a company's logo variant, or the original image for
+    logos uploaded before variants existed
+    '''
+    if is_processed(company['logo']):
+        return url_for('serve_logo_variant',
+                       name=variant_name(company['logo'], size, extension))
+    return url_for('serve_logo', company_id=company['id'])
+
+# globals rather than context processors, so cached fragments can use them
+app.add_template_global(logo_url)
+app.add_template_global(is_processed, 'is_processed_logo')
+app.add_template_global(fragments.render, 'fragment')
+
+def authenticate(company_email, password):
+    '''
+    The company row if the credentials match, otherwise None
+    '''
     company = g.storage.find_company_by_email(company_email)
-    if company:
-        stored_password = company['password'].encode('utf-8')
-        return checkpw(password.encode('utf-8'), stored_password)
-    else:
-        return False
+    if company and password_hasher.check(password, company['password']):
+        return company
+    return None
+
+def sign_in(company):
+    # only the id and version live in the session, see current_company_id()
+    if isinstance(session, ServerSideSession):
+        session.rotate() # a fresh id once signed in, against fixation
+    session['company_id'] = company['id']
+    session['company_version'] = company['session_version']
+    g.pop('current_company_id', None)
+
+def sign_out():
+    session.pop('company_id', None)
+    session.pop('company_version', None)
+    g.pop('current_company_id', None)
+
+def current_company_id():
+    '''
+    Id of the signed in company, checked once per request against the
+    cached session version of that company (no query when warm).  A
+    session whose version no longer matches is signed out.
+    '''
+    if 'current_company_id' not in g:
+        company_id = session.get('company_id')
+        if (company_id is not None and not session_verifier.is_valid(
+                company_id, session.get('company_version'))):
+            sign_out()
+            company_id = None
+        g.current_company_id = company_id
+
+    return g.current_company_id
+
+def current_company():
+    '''
+    The signed in company's row, through the company cache
+    '''
+    company_id = current_company_id()
+    if company_id is None:
+        return None
+    return g.storage.find_company_by_id(company_id)
+
+def requested_page_size():
+    '''
+    ?per_page= clamped to MAX_JOBS_PER_PAGE, JOBS_PER_PAGE by default
+    '''
+    per_page = request.args.get('per_page', app.config['JOBS_PER_PAGE'],
+                                type=int)
+    return min(max(per_page, 1), app.config['MAX_JOBS_PER_PAGE'])
+
+def stream_page(template, **context):
+    '''
+    Streamed response rendering template as its context is iterated,
+    written in chunks of about STREAM_CHUNK_SIZE bytes rather than one
+    write per template statement.  The response headers (Server-Timing
+    included) go out before the body is rendered, and the connection is
+    only released once the body has been sent.
+    '''
+    g.streaming = True # see finish_timings() and release_db()
+    stream = stream_template(template, **context) # keeps the request context
+    chunk_size = app.config['STREAM_CHUNK_SIZE']
+
+    def chunks():
+        buffered, size = [], 0
+        for text in stream:
+            buffered.append(text)
+            size += len(text)
+            if size >= chunk_size:
+                yield ''.join(buffered)
+                buffered, size = [], 0
+        if buffered:
+            yield ''.join(buffered)
+
+    response = app.response_class(chunks(), mimetype='text/html')
+    response.call_on_close(release_streamed_request)
+    return response
+
+def release_streamed_request():
+    storage.close()
+    end_request()
+
+def render_job_feed(heading, **filters):
+    per_page = requested_page_size()
+    try:
+        page = g.storage.find_job_page(limit=per_page,
+                                       after=request.args.get('after'),
+                                       before=request.args.get('before'),
+                                       **filters)
+    except ValueError:
+        flash("That page of job postings does not exist.", "error")
+        return render_template('index.html'), 422
+
+    return render_template('job_feed.html', heading=heading,
+                           jobs=page.jobs, page=page, per_page=per_page)
+
+def rehash_password(company, password):
+    '''
+    Re-hash a just-verified password stored with an outdated bcrypt cost
+    '''
+    if not password_hasher.needs_rehash(company['password']):
+        return
+
+    try:
+        new_hash = password_hasher.hash(password)
+    except PasswordHasherBusy:
+        return # upgraded on a later sign-in instead
+
+    g.storage.update_company_password(company['id'], new_hash)
+    company['password'] = new_hash
+
+def server_busy(template, **context):
+    '''
+    503 asking the user to retry, for when password hashing is saturated
+    '''
+    flash("We are handling a lot of sign-ins right now. "
+          "Please, try again in a moment.", "error")
+    response = app.make_response(
+        (render_template(template, **context), 503))
+    response.headers['Retry-After'] = '5'
+    return response
 
 def company_id_verification_required_w_session(f):
     '''
-    Custom decorator for verifying that company_id exists
-    and that it matches the company_id in current session
+    Custom decorator for verifying that the signed in company (from the
+    session claim, see current_company_id) is the company_id in the URL
     '''
     @wraps(f)
     def decorated_function(*args, **kwargs):
         company_id = kwargs.get('company_id')
-        company = g.storage.find_company_by_id(company_id)
-        if (not company
-            or 'company' not in session
-            or session['company']['id'] != company_id):
+        if company_id is None or current_company_id() != company_id:
             flash("You cannot do that!", "error")
             return render_template('index.html'), 422
 
@@ -57,32 +262,262 @@ def company_id_verification_required_w_session(f):
 
     return decorated_function
 
+def conditional_page(*scopes):
+    '''
+    Custom decorator adding ETag and Last-Modified headers to a public
+    page, from the version stamps of `scopes` (formatted with the view
+    arguments) plus what the layout shows: the taxonomy and the signed
+    in company.  The layout's site-wide job counts would make every
+    page depend on every job, so these pages fetch them from
+    /jobs/counts instead.  Matching conditional requests get a 304
+    before the view runs.
+    '''
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if '_flashes' in session: # one-off content, never revalidated
+                return f(*args, **kwargs)
+
+            g.defer_job_counts = True
+            page_scopes = [scope.format(**kwargs) for scope in scopes]
+            page_scopes.append('taxonomy')
+            company_id = current_company_id()
+            if company_id is not None:
+                page_scopes.append(f'company:{company_id}')
+            etag, last_modified = content_versions.stamp(page_scopes,
+                                                         company_id)
+
+            if is_resource_modified(request.environ, etag=etag,
+                                    last_modified=last_modified):
+                response = app.make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            else:
+                response = app.response_class(status=304)
+
+            response.set_etag(etag, weak=True)
+            response.last_modified = last_modified
+            response.cache_control.no_cache = True
+            response.vary.add('Cookie')
+            return response
+
+        return decorated_function
+
+    return decorator
+
 @app.context_processor
 def company_signed_in():
-    return dict(company_signed_in=lambda: 'company' in session)
+    return dict(company_signed_in=lambda: current_company_id() is not None,
+                current_company=current_company)
 
 @app.context_processor
 def inject_company_from_session():
-    return dict(company=session.get('company'))
+    return dict(company=current_company())
 
 @app.context_processor
 def inject_employment_types_and_departments():
-    employment_types = g.storage.get_employment_types()
-    departments = g.storage.get_departments()
-    return dict(departments=departments, employment_types=employment_types)
+    # only touches the cache if the template actually uses them
+    return dict(
+        departments=LazySequence(lambda: taxonomy.departments),
+        employment_types=LazySequence(lambda: taxonomy.employment_types)
+    )
+
+@app.context_processor
+def inject_job_counts():
+    # a callable, so the counts are only read by templates that show them;
+    # None where conditional_page leaves them to /jobs/counts
+    if g.get('defer_job_counts'):
+        return dict(job_counts=lambda: None)
+    return dict(job_counts=lambda: g.storage.job_counts())
+
+@app.context_processor
+def inject_request_timings():
+    show = app.config['SHOW_REQUEST_TIMINGS'] or app.debug
+    return dict(request_timings=current_metrics() if show else None)
+
+def request_metrics_exposed():
+    '''
+    Whether responses may reveal query counts and timings, which are
+    otherwise only recorded for this worker
+    '''
+    return app.config['EXPOSE_REQUEST_METRICS'] or app.debug
+
+@app.before_request
+def start_timings():
+    start_request()
+
+@before_render_template.connect_via(app)
+def time_render_start(sender, template, context, **extra):
+    metrics = current_metrics()
+    if metrics is not None:
+        metrics.render_started()
+
+@template_rendered.connect_via(app)
+def time_render_end(sender, template, context, **extra):
+    metrics = current_metrics()
+    if metrics is not None:
+        metrics.render_finished()
+
+@app.after_request
+def add_server_timing(response):
+    metrics = current_metrics()
+    if metrics is not None:
+        metrics.finish()
+        if request_metrics_exposed():
+            response.headers['Server-Timing'] = metrics.server_timing()
+        request_histograms.observe(request.endpoint or 'unmatched', metrics)
+    return response
+
+@app.teardown_request
+def finish_timings(exception):
+    # a streamed body is rendered after this runs, see stream_page()
+    if not g.get('streaming'):
+        end_request()
 
 @app.before_request
 def load_db():
-    g.storage = DatabasePersistence()
+    if not app.testing:
+        invalidation_listener.ensure_started() # once per worker process
+    g.storage = storage
+
+@app.teardown_request
+def release_db(exception):
+    if g.get('streaming'):
+        return
+    if g.pop('storage', None) is not None:
+        storage.close()
+
+@app.cli.command('migrate')
+def migrate_command():
+    '''Apply pending schema migrations.'''
+    applied = run_migrations()
+    print(f"Applied {len(applied)} migration(s).")
+
+@app.cli.command('purge-sessions')
+def purge_sessions_command():
+    '''Delete expired server-side sessions.'''
+    interface = ServerSideSessionInterface(storage)
+    print(f"Deleted {interface.cleanup()} expired session(s).")
+
+@app.cli.command('process-logos')
+def process_logos_command():
+    '''Create resized variants for logos uploaded before they existed.'''
+    count = 0
+    for company in storage.all_companies():
+        logo = company['logo']
+        path = os.path.join(logos_dir(), logo or '')
+        if (not logo or is_processed(logo) or logo == 'logo_placeholder.png'
+                or not os.path.isfile(path)):
+            continue
+
+        with open(path, 'rb') as file:
+            try:
+                key = process_logo(file, logos_dir(), company['id'])
+            except InvalidLogo as error:
+                print(f"Skipped {logo}: {error}")
+                continue
+        storage.update_company_profile_logo(company['id'], key)
+        count += 1
+
+    print(f"Processed {count} logo(s).")
+
+@app.cli.command('import-jobs')
+@click.argument('company_id', type=int)
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'jsonl',
+                                                            'yaml']),
+              help="File format, by default from the file's extension.")
+def import_jobs_command(company_id, path, file_format):
+    '''Import a CSV, JSON lines or YAML file of jobs for a company.'''
+    file_format = file_format or detect_format(path)
+    with open(path, 'rb') as file:
+        try:
+            count = import_jobs(storage, taxonomy, company_id, file,
+                                file_format)
+        except InvalidImport as error:
+            raise click.ClickException(
+                "Nothing imported:\n" + '\n'.join(error.errors))
+    print(f"Imported {count} job(s).")
+
+@app.cli.command('generate-data')
+@click.option('--companies', default=500, show_default=True)
+@click.option('--jobs', default=20_000, show_default=True)
+@click.option('--password', default='loadtest', show_default=True,
+              help="Password of every generated company.")
+@click.option('--seed', default=0, show_default=True)
+def generate_data_command(companies, jobs, password, seed):
+    '''Fill the database with synthetic companies and jobs.'''
+    company_ids = generate_data(companies, jobs,
+                                password_hasher.hash(password), seed=seed)
+    print(f"Generated {len(company_ids)} companies and {jobs} jobs.")
+    if company_ids:
+        print(f"Sign in as any of them, e.g. "
+              f"{storage.find_company_by_id(company_ids[0])['email']}, "
+              f"with password {password!r}.")
+
+@app.cli.command('load-test')
+@click.option('--url', default='http://127.0.0.1:5003', show_default=True)
+@click.option('--concurrency', default=8, show_default=True)
+@click.option('--duration', default=30.0, show_default=True,
+              help="Seconds to run for.")
+@click.option('--email', help="Company to sign in and post jobs as.")
+@click.option('--password', default='loadtest', show_default=True)
+@click.option('--weight', 'weights', multiple=True, metavar='SCENARIO=N',
+              help="Relative frequency of a scenario (companies, "
+                   "company_jobs, signin or post_job); 0 disables it.")
+@click.option('--save', 'save_path', type=click.Path(dir_okay=False),
+              help="Write the report to this JSON file.")
+@click.option('--baseline', type=click.Path(exists=True, dir_okay=False),
+              help="Compare with a report saved earlier.")
+@click.option('--threshold', default=DEFAULT_THRESHOLD, show_default=True,
+              help="Relative change counted as a regression.")
+def load_test_command(url, concurrency, duration, email, password, weights,
+                      save_path, baseline, threshold):
+    '''Load test a running job board and report latency percentiles.'''
+    chosen = dict(DEFAULT_WEIGHTS)
+    for weight in weights:
+        scenario, _, value = weight.partition('=')
+        if scenario not in chosen or not value.isdigit():
+            raise click.BadParameter(weight, param_hint='--weight')
+        chosen[scenario] = int(value)
+
+    try:
+        report = LoadTest(url, concurrency, duration, chosen, email,
+                          password).run()
+    except LoadTestError as error:
+        raise click.ClickException(str(error))
+
+    print(format_report(report))
+    if save_path:
+        save_report(report, save_path)
+    if baseline:
+        regressions = compare(report, load_report(baseline), threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            raise SystemExit(1)
+        print(f"No regressions beyond {threshold:.0%} of {baseline}.")
+
+@app.route('/_metrics')
+def metrics():
+    if not request_metrics_exposed():
+        abort(404)
+
+    return Response(request_histograms.render()
+                    + password_hasher.latency.render(),
+                    mimetype='text/plain; version=0.0.4')
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
 @app.route('/companies')
+@conditional_page('companies')
 def display_company_profiles():
-    companies = g.storage.all_companies()
-    return render_template('companies.html', companies=companies)
+    # the directory grows with every signup, so rows are streamed in
+    # batches instead of being loaded and rendered all at once
+    return stream_page('companies.html',
+                       companies=g.storage.iter_companies())
 
 @app.route('/signup')
 def signup():
@@ -90,28 +525,19 @@ def signup():
 
 @app.route('/signup', methods=['POST'])
 def signup_company():
-    company_emails = g.storage.all_company_emails()
-    company_names = g.storage.all_company_names()
     name = request.form['name'].strip()
     location = request.form['location'].strip()
     email = request.form['email'].strip()
     password = request.form['password']
     description = request.form['description'].strip()
 
-    # split email to get domain to check against company_domains
-    email_parts = email.split('@')
-    email_domain = email_parts[1]
-    company_domains = [email.split('@')[1] for email in company_emails]
+    email_domain = email.rpartition('@')[2]
+    conflicts = g.storage.find_signup_conflicts(name, email_domain)
 
-    if email_domain in company_domains:
-        flash("An account with that company domain already exists. "
-              "Please, try again.", "error")
-        return render_template('signup.html', name=name,
-                               description=description), 422
-    elif name in company_names:
-        flash("An account with that company name already exists. "
-              "Please, try again.", "error")
-        return render_template('signup.html', description=description), 422
+    if conflicts['email_domain']:
+        return signup_conflict('email_domain', name, description)
+    elif conflicts['name']:
+        return signup_conflict('name', name, description)
     elif len(email) > 45 or len(password) > 45:
         flash("Email and Password cannot be longer than 45 characters.",
               "error")
@@ -122,18 +548,36 @@ def signup_company():
         return render_template('signup.html', email=email, name=name,
                                description=description), 422
     else:
-        hashed = hashpw(password.encode('utf-8'), gensalt())
-        hashed_password_string = hashed.decode('utf-8')
-        g.storage.create_new_company(name, location, email,
-                                  hashed_password_string, description)
+        try:
+            hashed_password_string = password_hasher.hash(password)
+        except PasswordHasherBusy:
+            return server_busy('signup.html', email=email, name=name,
+                               description=description)
+
+        try:
+            g.storage.create_new_company(name, location, email,
+                                         hashed_password_string, description)
+        except DuplicateCompany as error:
+            return signup_conflict(error.field, name, description)
 
         flash("Account successfully created! "
               "You may sign in to your account.", "success")
         return redirect(url_for('signin'))
 
+def signup_conflict(field, name, description):
+    if field == 'email_domain':
+        flash("An account with that company domain already exists. "
+              "Please, try again.", "error")
+        return render_template('signup.html', name=name,
+                               description=description), 422
+    else:
+        flash("An account with that company name already exists. "
+              "Please, try again.", "error")
+        return render_template('signup.html', description=description), 422
+
 @app.route('/signin')
 def signin():
-    if 'company' in session:
+    if current_company_id() is not None:
         flash("You are already signed in!", "error")
         return redirect('index')
 
@@ -143,9 +587,14 @@ def signin():
 def signin_company():
     company_email = request.form['email'].strip()
     password = request.form['password'].strip()
-    if valid_credentials(company_email, password):
-        company = g.storage.find_company_by_email(company_email)
-        session['company'] = company
+    try:
+        company = authenticate(company_email, password)
+    except PasswordHasherBusy:
+        return server_busy('signin.html', company_email=company_email)
+
+    if company:
+        rehash_password(company, password)
+        sign_in(company)
         flash("You have successfully signed in!", "success")
         return redirect(url_for('index'))
     else:
@@ -154,19 +603,33 @@ def signin_company():
 
 @app.route('/signout')
 def signout():
-    if 'company' not in session:
+    if current_company_id() is None:
         flash("You are already signed out!", "error")
         return redirect(url_for('index'))
 
-    session.pop('company')
+    sign_out()
     flash("You have successfully signed out.", "success")
     return redirect(url_for('signin'))
 
 @app.route('/companies/<int:company_id>/logo')
 def serve_logo(company_id):
     company = g.storage.find_company_by_id(company_id)
-    logos_dir = os.path.join(get_data_path(), 'logos')
-    return send_from_directory(logos_dir, company['logo'])
+    if is_processed(company['logo']):
+        return redirect(logo_url(company), 301)
+    return send_from_directory(logos_dir(), company['logo'])
+
+@app.route('/logos/<name>')
+def serve_logo_variant(name):
+    # the name embeds a content hash, so no lookup and no revalidation;
+    # anything else (e.g. a legacy original) must never be marked immutable
+    if not VARIANT_NAME.match(name):
+        abort(404)
+
+    response = send_from_directory(logos_dir(), name,
+                                   max_age=app.config['LOGO_MAX_AGE'])
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
 
 @app.route('/companies/<int:company_id>/dashboard')
 @company_id_verification_required_w_session
@@ -192,31 +655,36 @@ def update_company_profile(company_id):
               "so please choose a different name!", "error")
         return render_template('update_company_profile.html'), 422
 
-    if request.files['company_logo'].filename:
-        logo_file = request.files['company_logo']
-        file_extension = os.path.splitext(logo_file.filename)[1]
-        filename = f'{company_id}{file_extension}'
-        save_path = os.path.join(get_data_path(), 'logos', filename)
-        logo_file.save(save_path)
-        g.storage.update_company_profile_logo(company_id, filename)
+    logo_file = request.files.get('company_logo')
+    if logo_file and logo_file.filename:
+        try:
+            logo = process_logo(logo_file.stream, logos_dir(), company_id)
+        except InvalidLogo as error:
+            flash(f"Changes NOT saved. {error}", "error")
+            return render_template('update_company_profile.html'), 422
+
+        g.storage.update_company_profile_logo(company_id, logo)
+        remove_other_variants(logos_dir(), company_id, keep=logo)
     
     g.storage.update_company_profile_info(company_id, new_name,
                                           new_location, new_description)
-    session['company'] = g.storage.find_company_by_id(company_id)
     flash("Profile updated successfully!", "success")
     return redirect(url_for('update_company_profile', company_id=company_id))
 
 @app.route('/companies/<int:company_id>')
+@conditional_page('company:{company_id}', 'company:{company_id}:jobs')
 def view_company_profile(company_id):
     company = g.storage.find_company_by_id(company_id)
-    jobs = g.storage.find_jobs_by_company_id(company_id)
     if not company or company.get('id') == 1:
         flash("No company profile to show.", "error")
         return render_template('index.html'), 422
-    
-    return render_template('profile.html', company=company, jobs=jobs)
+
+    page = g.storage.find_job_page(
+        company_id, limit=app.config['PROFILE_RECENT_JOBS'])
+    return render_template('profile.html', company=company, jobs=page.jobs)
 
 @app.route('/companies/<int:company_id>/jobs')
+@conditional_page('company:{company_id}', 'company:{company_id}:jobs')
 def show_company_job_postings(company_id):
     company = g.storage.find_company_by_id(company_id)
     if (company['name'].casefold() == 'admin' or
@@ -224,49 +692,221 @@ def show_company_job_postings(company_id):
         flash("You cannot do that!", "error")
         return render_template('index.html'), 422
 
-    jobs = g.storage.find_jobs_by_company_id(company_id)
-    return render_template('jobs.html', company=company, jobs=jobs)
+    per_page = requested_page_size()
+    try:
+        page = g.storage.find_job_page(
+            company_id, limit=per_page,
+            after=request.args.get('after'),
+            before=request.args.get('before'))
+    except ValueError:
+        flash("That page of job postings does not exist.", "error")
+        return render_template('index.html'), 422
+
+    return render_template('jobs.html', company=company, jobs=page.jobs,
+                           page=page, per_page=per_page)
+
+@app.route('/jobs')
+def show_recent_jobs():
+    return render_job_feed("Recent Job Postings")
+
+@app.route('/jobs/departments/<int:department_id>')
+def show_department_jobs(department_id):
+    department = taxonomy.departments_by_id.get(department_id)
+    if not department:
+        flash("No such department.", "error")
+        return render_template('index.html'), 422
+
+    return render_job_feed(f"{department.name} Jobs",
+                           department_id=department_id)
+
+@app.route('/jobs/employment_types/<int:employment_type_id>')
+def show_employment_type_jobs(employment_type_id):
+    employment_type = taxonomy.employment_types_by_id.get(employment_type_id)
+    if not employment_type:
+        flash("No such employment type.", "error")
+        return render_template('index.html'), 422
+
+    return render_job_feed(f"{employment_type.type} Jobs",
+                           employment_type_id=employment_type_id)
+
+@app.route('/search')
+def search_jobs():
+    text = request.args.get('q', '').strip()
+    department_id = request.args.get('department', type=int)
+    employment_type_id = request.args.get('employment_type', type=int)
+    if not text:
+        return render_template('search.html', query=text, jobs=[],
+                               page=None)
+
+    try:
+        page = g.storage.search_jobs(
+            text, department_id=department_id,
+            employment_type_id=employment_type_id,
+            limit=app.config['JOBS_PER_PAGE'],
+            after=request.args.get('after'))
+    except ValueError:
+        flash("That page of search results does not exist.", "error")
+        return render_template('search.html', query=text, jobs=[],
+                               page=None), 422
+
+    return render_template('search.html', query=text, jobs=page.jobs,
+                           page=page, department_id=department_id,
+                           employment_type_id=employment_type_id)
+
+@app.route('/jobs/counts')
+def show_job_counts():
+    counts = g.storage.job_counts()
+    return jsonify(departments=counts['departments'],
+                   employment_types=counts['employment_types'])
+
+@app.route('/autocomplete')
+def autocomplete():
+    text = request.args.get('q', '').strip()
+    limit = app.config['AUTOCOMPLETE_LIMIT']
+    suggestions = autocomplete_index.suggest(text, limit)
+
+    # Typos miss every prefix, so fall back to trigram similarity
+    if (len(suggestions) < limit and len(text) >= 3
+            and g.storage.has_trigram_search()):
+        for suggestion in g.storage.fuzzy_autocomplete(text, limit):
+            if len(suggestions) == limit:
+                break
+            if suggestion not in suggestions:
+                suggestions.append(suggestion)
+
+    return jsonify(suggestions=[{'kind': kind, 'text': term}
+                                for kind, term in suggestions])
 
 @app.route('/post_job')
 def view_post_job_form():
-    if not session:
+    if current_company_id() is None:
         flash("You must be logged in to do that.", "error")
         return render_template('index.html'), 422
 
-    return render_template('post_job.html')
+    return render_template('post_job.html', job=None)
+
+def job_form():
+    '''
+    The posted job fields, as keyword arguments for insert_new_job() and
+    update_job()
+    '''
+    return dict(
+        title=request.form['title'].strip(),
+        location=request.form['location'].strip(),
+        role_overview=request.form['role_overview'].strip(),
+        responsibilities=request.form['responsibilities'].strip(),
+        requirements=request.form['requirements'].strip(),
+        nice_to_haves=request.form['nice_to_haves'].strip(),
+        benefits=request.form['benefits'].strip() or None,
+        pay_range=request.form['pay_range'].strip() or None,
+        closing_date=request.form['closing_date'] or None,
+        employment_type_id=int(request.form['employment_type']),
+        department_id=int(request.form['department']),
+    )
 
 @app.route('/post_job/<int:company_id>/jobs/post', methods=['POST'])
 @company_id_verification_required_w_session
 def post_job(company_id):
-    title = request.form['title'].strip()
-    location = request.form['location'].strip()
-    role_overview = request.form['role_overview'].strip()
-    responsibilities = request.form['responsibilities'].strip()
-    requirements = request.form['requirements'].strip()
-    nice_to_haves = request.form['nice_to_haves'].strip()
-    benefits = request.form['benefits'].strip()
-    pay_range = request.form['pay_range'].strip()
-    closing_date = request.form['closing_date']
-    employment_type_id = int(request.form['employment_type'])
-    department_id = int(request.form['department'])
-
-    final_benefits = benefits if benefits else None
-    final_pay_range = pay_range if pay_range else None
-    final_closing_date = closing_date if closing_date else None
-
-    g.storage.insert_new_job(title, location,
-                             role_overview, responsibilities, requirements,
-                             nice_to_haves, final_benefits, final_pay_range,
-                             final_closing_date, company_id,
-                             employment_type_id, department_id)
-    
-    flash(f"Successfully posted new job '{title}'.", "success")
+    job = job_form()
+    g.storage.insert_new_job(company_id=company_id, **job)
+
+    flash(f"Successfully posted new job '{job['title']}'.", "success")
     return redirect(url_for('view_company_profile', company_id=company_id))
 
+@app.route('/companies/<int:company_id>/dashboard/jobs')
+@company_id_verification_required_w_session
+def view_company_jobs_to_edit(company_id):
+    per_page = requested_page_size()
+    try:
+        page = g.storage.find_job_page(company_id, limit=per_page,
+                                       after=request.args.get('after'),
+                                       before=request.args.get('before'))
+    except ValueError:
+        flash("That page of job postings does not exist.", "error")
+        return render_template('index.html'), 422
+
+    return render_template('edit_jobs.html', jobs=page.jobs, page=page,
+                           per_page=per_page)
+
+@app.route('/companies/<int:company_id>/dashboard/import_jobs')
+@company_id_verification_required_w_session
+def view_import_jobs_form(company_id):
+    return render_template('import_jobs.html')
+
+@app.route('/companies/<int:company_id>/dashboard/import_jobs',
+           methods=['POST'])
+@company_id_verification_required_w_session
+def upload_jobs(company_id):
+    if (request.content_length or 0) > app.config['JOB_IMPORT_MAX_BYTES']:
+        flash("Nothing imported. That file is too large.", "error")
+        return render_template('import_jobs.html'), 422
+
+    jobs_file = request.files.get('jobs_file')
+    file_format = detect_format(jobs_file.filename if jobs_file else None)
+    if file_format is None:
+        flash("Nothing imported. Please upload a .csv, .jsonl or .yaml "
+              "file.", "error")
+        return render_template('import_jobs.html'), 422
+
+    try:
+        count = import_jobs(g.storage, taxonomy, company_id,
+                            jobs_file.stream, file_format)
+    except InvalidImport as error:
+        flash("Nothing imported. Please fix these rows and try again.",
+              "error")
+        return render_template('import_jobs.html', errors=error.errors), 422
+
+    flash(f"Successfully imported {count} jobs.", "success")
+    return redirect(url_for('view_company_jobs_to_edit',
+                            company_id=company_id))
+
+@app.route('/post_job/<int:company_id>/jobs/<int:job_id>')
+@company_id_verification_required_w_session
+def view_edit_job_form(company_id, job_id):
+    job = g.storage.find_job(job_id, company_id)
+    if job is None:
+        flash("No job posting to edit.", "error")
+        return render_template('index.html'), 422
+
+    return render_template('post_job.html', job=job)
+
 @app.route('/post_job/<int:company_id>/jobs/<int:job_id>', methods=['POST'])
 @company_id_verification_required_w_session
-def edit_job(company_id):
-    pass
+def edit_job(company_id, job_id):
+    try:
+        version = int(request.form.get('version', ''))
+    except ValueError:
+        version = None
+
+    if version is None:
+        current = g.storage.find_job(job_id, company_id)
+        if current is None:
+            flash("No job posting to edit.", "error")
+            return render_template('index.html'), 422
+
+        flash("This edit could not be matched to a version of the job. "
+              "Please review it and save again.", "error")
+        return render_template('post_job.html', job=current), 422
+
+    job = job_form()
+    try:
+        g.storage.update_job(job_id, company_id, version, **job)
+    except StaleJob:
+        current = g.storage.find_job(job_id, company_id)
+        if current is None:
+            flash("No job posting to edit.", "error")
+            return render_template('index.html'), 422
+
+        # show what the other edit saved, so it can be reviewed first
+        flash("This job was changed while you were editing it. "
+              "Please review the changes and save again.", "error")
+        return render_template('post_job.html', job=current), 409
+
+    flash(f"Successfully updated job '{job['title']}'.", "success")
+    return redirect(url_for('view_company_jobs_to_edit',
+                            company_id=company_id))
 
 if __name__ == "__main__":
+    run_migrations()
+    password_hasher.calibrate()
     app.run(debug=True, port=5003)
\ No newline at end of file
@@ -0,0 +1,36 @@
+'''
+Authorization of company routes from the session claim alone.
+'''
+from job_board.cache import TTLCache
+
+DEFAULT_TTL = 30 # seconds a company's session version is trusted
+
+class SessionVerifier:
+    '''
+    Checks a session's (company id, session version) claim against the
+    company's current session_version.  Versions are cached per worker
+    for `ttl` seconds and evicted by 'companies' events (updates,
+    deletions, revocations), so the database is only asked on a miss.
+    '''
+    def __init__(self, storage, ttl=DEFAULT_TTL):
+        self._storage = storage
+        self._versions = TTLCache(ttl) # company id -> version, None if gone
+        storage.subscribe('companies', self._evict)
+
+    def _evict(self, company_id):
+        if company_id is None:
+            self._versions.clear()
+        else:
+            self._versions.evict(company_id)
+
+    def is_valid(self, company_id, version):
+        if company_id is None:
+            return False
+
+        current = self._versions.get_or_load(
+            company_id,
+            lambda: self._storage.find_company_session_version(company_id))
+        return current is not None and current == version
+
+    def stats(self):
+        return self._versions.stats()
@@ -0,0 +1,213 @@
+'''
+Typeahead suggestions for company names, job titles and locations.
+'''
+import threading
+from bisect import bisect_left, insort
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 200_000
+
+def _normalize(text):
+    return ' '.join(text.casefold().split())
+
+class PrefixIndex:
+    '''
+    In-worker prefix index over the terms storage.autocomplete_terms()
+    returns, kept in a sorted array so a lookup is one binary search plus
+    a short scan.  Every term is indexed from each of its word starts
+    ("senior python developer" is found by "pyth" too).
+
+    Terms are tracked per company: a 'companies' or 'jobs' event marks
+    the company stale, and the next lookup re-reads just that company's
+    terms and adds or removes the difference.  At most `max_entries`
+    index entries are held; terms beyond that are skipped until the next
+    full rebuild.
+
+    Full builds (the first one, and after an event for every company)
+    run on a background thread unless `background` is False.  Lookups
+    keep using the previous index until the new one is ready, and find
+    nothing before the first build finishes.
+    '''
+    def __init__(self, storage, max_entries=DEFAULT_MAX_ENTRIES,
+                 background=True):
+        self._storage = storage
+        self.max_entries = max_entries
+        self.background = background
+        self._lock = threading.Lock()
+        self._entries = []      # sorted (normalized suffix, kind, text)
+        self._refs = {}         # (kind, text) -> number of companies
+        self._by_company = {}   # company id -> {(kind, text), ...}
+        self._stale = set()     # company ids to re-read before a lookup
+        self._loaded = False    # the index reflects the latest full reset
+        self._ready = False     # some index has been built
+        self._building = False
+        self._generation = 0    # bumped by every full reset
+        self._marked = set()    # company ids marked stale during a build
+        self.skipped = 0
+        storage.subscribe('companies', self._mark_stale)
+        storage.subscribe('jobs', self._mark_stale)
+
+    def suggest(self, prefix, limit=10):
+        '''
+        Up to `limit` (kind, text) pairs with a word starting with prefix
+        '''
+        prefix = _normalize(prefix)
+        if not prefix:
+            return []
+
+        self._ensure_loaded()
+        if not self._ready:
+            return []
+        self._refresh_stale()
+        suggestions = []
+        seen = set()
+        with self._lock:
+            position = bisect_left(self._entries, (prefix,))
+            while (position < len(self._entries)
+                   and len(suggestions) < limit):
+                key, kind, text = self._entries[position]
+                if not key.startswith(prefix):
+                    break
+                if (kind, text) not in seen:
+                    seen.add((kind, text))
+                    suggestions.append((kind, text))
+                position += 1
+
+        return suggestions
+
+    def stats(self):
+        return {'entries': len(self._entries), 'terms': len(self._refs),
+                'skipped': self.skipped}
+
+    def _ensure_loaded(self):
+        with self._lock:
+            if self._loaded or self._building:
+                return
+            self._building = True
+
+        if self.background:
+            threading.Thread(target=self._build_in_background,
+                             name='autocomplete-build', daemon=True).start()
+        else:
+            self._build()
+
+    def _build(self):
+        try:
+            while True:
+                with self._lock:
+                    generation = self._generation
+                    self._marked = set()
+                built = self._read_index()
+                with self._lock:
+                    if generation == self._generation:
+                        (self._entries, self._refs, self._by_company,
+                         self.skipped) = built
+                        # their events may have come after the query
+                        self._stale |= self._marked
+                        self._loaded = self._ready = True
+                        break
+                # reset while querying, so the result may predate it
+                logger.info("Autocomplete index reset during a build, "
+                            "building again")
+            logger.info("Autocomplete index built: %s", self.stats())
+        except Exception:
+            logger.exception("Autocomplete index build failed")
+        finally:
+            with self._lock:
+                self._building = False
+
+    def _build_in_background(self):
+        try:
+            self._build()
+        finally:
+            self._storage.close() # the thread's pooled connection
+
+    def _read_index(self):
+        by_company = {}
+        refs = {}
+        for company_id, kind, text in self._storage.autocomplete_terms():
+            term = (kind, text)
+            terms = by_company.setdefault(company_id, set())
+            if term not in terms:
+                terms.add(term)
+                refs[term] = refs.get(term, 0) + 1
+
+        # built in one sort rather than by repeated insertion
+        entries = []
+        skipped = 0
+        for term in refs:
+            term_entries = self._index_entries(term)
+            if len(entries) + len(term_entries) > self.max_entries:
+                skipped += 1
+            else:
+                entries.extend(term_entries)
+        entries.sort()
+        return entries, refs, by_company, skipped
+
+    def _mark_stale(self, company_id):
+        with self._lock:
+            if company_id is None:
+                # the current index is served until the rebuild replaces it
+                self._generation += 1
+                self._loaded = False
+            else:
+                self._stale.add(company_id)
+                if self._building:
+                    self._marked.add(company_id)
+
+    def _refresh_stale(self):
+        while self._stale:
+            with self._lock:
+                if not self._stale:
+                    return
+                company_id = self._stale.pop()
+
+            terms = {(kind, text) for _, kind, text
+                     in self._storage.autocomplete_terms(company_id)}
+            with self._lock:
+                self._replace_company(company_id, terms)
+
+    def _replace_company(self, company_id, terms):
+        old_terms = self._by_company.get(company_id, set())
+        for term in old_terms - terms:
+            self._release(term)
+        for term in terms - old_terms:
+            self._retain(term)
+        self._by_company[company_id] = terms
+
+    def _retain(self, term):
+        if term in self._refs:
+            self._refs[term] += 1
+            return
+
+        entries = self._index_entries(term)
+        if len(self._entries) + len(entries) > self.max_entries:
+            self.skipped += 1
+            self._refs[term] = 1 # tracked so releasing it stays balanced
+            return
+
+        self._refs[term] = 1
+        for entry in entries:
+            insort(self._entries, entry)
+
+    def _release(self, term):
+        self._refs[term] -= 1
+        if self._refs[term] > 0:
+            return
+
+        del self._refs[term]
+        for entry in self._index_entries(term):
+            position = bisect_left(self._entries, entry)
+            if (position < len(self._entries)
+                    and self._entries[position] == entry):
+                del self._entries[position]
+
+    @staticmethod
+    def _index_entries(term):
+        kind, text = term
+        words = _normalize(text).split(' ')
+        return [(' '.join(words[start:]), kind, text)
+                for start in range(len(words))]
@@ -0,0 +1,148 @@
+'''
+A small micro-benchmark runner, in the spirit of pytest-benchmark.
+
+Benchmarks are functions registered on a Suite.  Each is calibrated to
+the number of calls that take at least `min_time` seconds, then timed
+for `rounds` rounds of that many calls.  Results are per call and can
+be saved as JSON, tagged with the git commit, and compared with an
+earlier run: a benchmark whose median grew by more than the threshold
+is a regression.
+'''
+import json
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+
+DEFAULT_MIN_TIME = 0.1      # seconds per round
+DEFAULT_ROUNDS = 5
+DEFAULT_THRESHOLD = 0.10    # relative median increase counted as a regression
+MAX_ITERATIONS = 1_000_000
+
+class Suite:
+    def __init__(self):
+        self.benchmarks = {} # name -> (group, function)
+
+    def add(self, name, group=None):
+        '''
+        Decorator registering a function taking no arguments
+        '''
+        def decorator(function):
+            if name in self.benchmarks:
+                raise ValueError(f"Duplicate benchmark {name!r}")
+            self.benchmarks[name] = (group, function)
+            return function
+        return decorator
+
+    def run(self, selected=None, min_time=DEFAULT_MIN_TIME,
+            rounds=DEFAULT_ROUNDS, progress=None):
+        '''
+        Results of the benchmarks whose names contain any of `selected`
+        (all of them by default), in the format save() writes
+        '''
+        results = []
+        for name, (group, function) in self.benchmarks.items():
+            if selected and not any(part in name for part in selected):
+                continue
+            stats = measure(function, min_time, rounds)
+            results.append({'name': name, 'group': group, 'stats': stats})
+            if progress:
+                progress(results[-1])
+
+        return {'datetime': datetime.now(timezone.utc).isoformat(),
+                'commit_info': commit_info(),
+                'machine_info': {'node': platform.node(),
+                                 'python': platform.python_version(),
+                                 'processor': platform.processor()},
+                'benchmarks': results}
+
+def measure(function, min_time=DEFAULT_MIN_TIME, rounds=DEFAULT_ROUNDS):
+    '''
+    Per-call timings in seconds of function, which is called at least
+    once more than rounds * iterations times (the first is a warm-up)
+    '''
+    function()
+    iterations = 1
+    while iterations < MAX_ITERATIONS:
+        if _time(function, iterations) >= min_time:
+            break
+        iterations *= 2
+
+    timings = [_time(function, iterations) / iterations
+               for _ in range(rounds)]
+    return {'min': min(timings), 'max': max(timings),
+            'mean': statistics.fmean(timings),
+            'median': statistics.median(timings),
+            'stddev': statistics.stdev(timings) if rounds > 1 else 0.0,
+            'rounds': rounds, 'iterations': iterations}
+
+def _time(function, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    return time.perf_counter() - started
+
+def commit_info():
+    def git(*args):
+        try:
+            return subprocess.run(('git', *args), capture_output=True,
+                                  text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    status = git('status', '--porcelain', '--untracked-files=no')
+    return {'id': git('rev-parse', 'HEAD'),
+            'dirty': bool(status) if status is not None else None}
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    '''
+    (name, baseline median, median, relative change, regressed) for
+    every benchmark present in both runs
+    '''
+    before = {benchmark['name']: benchmark['stats']['median']
+              for benchmark in baseline['benchmarks']}
+    rows = []
+    for benchmark in results['benchmarks']:
+        old = before.get(benchmark['name'])
+        if not old:
+            continue
+        new = benchmark['stats']['median']
+        change = (new - old) / old
+        rows.append((benchmark['name'], old, new, change, change > threshold))
+    return rows
+
+def format_time(seconds):
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f'{seconds / scale:.2f} {unit}'
+    return f'{seconds / 1e-9:.0f} ns'
+
+def format_results(results):
+    lines = [f"{'benchmark':<56}{'median':>12}{'min':>12}{'stddev':>12}"
+             f"{'calls':>10}"]
+    for benchmark in results['benchmarks']:
+        stats = benchmark['stats']
+        lines.append(f"{benchmark['name']:<56}"
+                     f"{format_time(stats['median']):>12}"
+                     f"{format_time(stats['min']):>12}"
+                     f"{format_time(stats['stddev']):>12}"
+                     f"{stats['rounds'] * stats['iterations']:>10}")
+    return '\n'.join(lines)
+
+def format_comparison(rows, threshold=DEFAULT_THRESHOLD):
+    lines = [f"{'benchmark':<56}{'baseline':>12}{'now':>12}{'change':>9}"]
+    for name, old, new, change, regressed in rows:
+        lines.append(f"{name:<56}{format_time(old):>12}"
+                     f"{format_time(new):>12}{change:>+9.0%}"
+                     + (f"  REGRESSION (> {threshold:.0%})" if regressed
+                        else ''))
+    return '\n'.join(lines)
+
+def save(results, path):
+    with open(path, 'w') as file:
+        json.dump(results, file, indent=2)
+
+def load(path):
+    with open(path) as file:
+        return json.load(file)
@@ -0,0 +1,223 @@
+'''
+In-process caches, one instance per worker.
+'''
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from types import MappingProxyType
+
+_MISSING = object()
+
+EmploymentType = namedtuple('EmploymentType', ['id', 'type'])
+Department = namedtuple('Department', ['id', 'name'])
+
+class TTLCache:
+    '''
+    Thread-safe mapping whose entries expire `ttl` seconds after being
+    stored.  Holds at most `max_size` entries, evicting the least
+    recently used first.
+    '''
+    def __init__(self, ttl, max_size=1024):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict() # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._generation = 0 # bumped by every eviction
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def get_or_load(self, key, load):
+        '''
+        Cached value for key, calling load() on a miss.  A value loaded
+        while an eviction happened is returned but not stored, since it
+        may predate the write that caused the eviction.
+        '''
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        generation = self._generation
+        value = load()
+        with self._lock:
+            if self._generation == generation:
+                self._store(key, value)
+
+        return value
+
+    def get_many_or_load(self, keys, load):
+        '''
+        {key: value} for keys, calling load(missing keys) once for the
+        misses; it returns a dict.  Stored under the same rule as
+        get_or_load.
+        '''
+        found = {}
+        missing = []
+        for key in keys:
+            value = self.get(key, _MISSING)
+            if value is _MISSING:
+                missing.append(key)
+            else:
+                found[key] = value
+
+        if missing:
+            generation = self._generation
+            loaded = load(missing)
+            with self._lock:
+                unchanged = self._generation == generation
+                for key in missing:
+                    found[key] = loaded[key]
+                    if unchanged:
+                        self._store(key, loaded[key])
+
+        return found
+
+    def set(self, key, value):
+        with self._lock:
+            self._store(key, value)
+
+    def _store(self, key, value):
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def evict(self, key):
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(key, None)
+
+    def evict_where(self, predicate):
+        with self._lock:
+            self._generation += 1
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses,
+                'size': len(self._entries)}
+
+class TaxonomyCache:
+    '''
+    Employment types and departments, loaded from storage on first use
+    and kept until invalidate() is called.  Storage publishes a
+    'taxonomy' event whenever either table is written, which invalidates
+    the cache.
+
+    Rows are exposed as tuples (in the order storage returns them) and as
+    read-only mappings keyed by id.
+    '''
+    def __init__(self, storage):
+        self._storage = storage
+        self._lock = threading.Lock()
+        self._data = None
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        storage.subscribe('taxonomy', lambda key: self.invalidate())
+
+    @property
+    def employment_types(self):
+        return self._get()['employment_types']
+
+    @property
+    def departments(self):
+        return self._get()['departments']
+
+    @property
+    def employment_types_by_id(self):
+        return self._get()['employment_types_by_id']
+
+    @property
+    def departments_by_id(self):
+        return self._get()['departments_by_id']
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._data = None
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses,
+                'loaded': self._data is not None}
+
+    def _get(self):
+        data = self._data
+        if data is not None:
+            self.hits += 1
+            return data
+
+        self.misses += 1
+        with self._lock:
+            generation = self._generation
+
+        data = self._load()
+        with self._lock:
+            # Only keep what was loaded if nothing was written meanwhile
+            if self._generation == generation:
+                self._data = data
+
+        return data
+
+    def _load(self):
+        employment_types = tuple(
+            EmploymentType(row['id'], row['type'])
+            for row in self._storage.get_employment_types())
+        departments = tuple(
+            Department(row['id'], row['name'])
+            for row in self._storage.get_departments())
+
+        return {
+            'employment_types': employment_types,
+            'departments': departments,
+            'employment_types_by_id': MappingProxyType(
+                {row.id: row for row in employment_types}),
+            'departments_by_id': MappingProxyType(
+                {row.id: row for row in departments}),
+        }
+
+class LazySequence:
+    '''
+    Sequence whose contents are only fetched when a template first
+    iterates, indexes or tests it
+    '''
+    def __init__(self, load):
+        self._load = load
+        self._items = None
+
+    def _resolve(self):
+        if self._items is None:
+            self._items = self._load()
+        return self._items
+
+    def __iter__(self):
+        return iter(self._resolve())
+
+    def __len__(self):
+        return len(self._resolve())
+
+    def __getitem__(self, index):
+        return self._resolve()[index]
+
+    def __bool__(self):
+        return bool(self._resolve())
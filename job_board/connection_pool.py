@@ -0,0 +1,222 @@
+import os
+import threading
+import time
+from collections import deque
+
+import logging
+import psycopg2
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+from job_board.instrumentation import InstrumentedConnection
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 5
+DEFAULT_MAX_LIFETIME = 30 * 60      # seconds before a connection is recycled
+DEFAULT_HEALTH_CHECK_AFTER = 30     # idle seconds before a ping on checkout
+DEFAULT_CHECKOUT_TIMEOUT = 10       # seconds to wait for a free connection
+
+class PoolTimeout(Exception):
+    pass
+
+def connection_kwargs():
+    '''
+    Connection arguments for the current FLASK_ENV
+    '''
+    env = os.environ.get('FLASK_ENV')
+    if env == 'production':
+        return {'dsn': os.environ['DATABASE_URL']}
+    elif env == 'test':
+        return {'dbname': 'job_board_test'}
+    else:
+        return {'dbname': 'job_board'}
+
+def _env_number(name, default, cast=int):
+    value = os.environ.get(name)
+    return cast(value) if value else default
+
+class ConnectionPool:
+    '''
+    Thread-safe pool of psycopg2 connections for a single process.
+
+    At most `max_size` connections are checked out at once; callers block
+    for up to `timeout` seconds before PoolTimeout is raised.  Idle
+    connections are pinged before reuse once they have sat unused for
+    `health_check_after` seconds, and connections older than
+    `max_lifetime` seconds are closed instead of being reused.
+    '''
+    def __init__(self, connect, max_size=DEFAULT_POOL_SIZE,
+                 max_lifetime=DEFAULT_MAX_LIFETIME,
+                 health_check_after=DEFAULT_HEALTH_CHECK_AFTER,
+                 timeout=DEFAULT_CHECKOUT_TIMEOUT):
+        self._connect = connect
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.health_check_after = health_check_after
+        self.timeout = timeout
+        self.pid = os.getpid()
+
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._idle = deque()    # (connection, last_used)
+        self._created = {}      # id(connection) -> creation time
+        self._closed = False
+
+    def getconn(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeout(f"No database connection available after "
+                              f"{self.timeout} seconds "
+                              f"(pool size {self.max_size})")
+        try:
+            while True:
+                with self._lock:
+                    entry = self._idle.pop() if self._idle else None
+
+                if entry is None:
+                    return self._new_connection()
+
+                connection, last_used = entry
+                if self._usable(connection, last_used):
+                    return connection
+
+                self._discard(connection)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def putconn(self, connection, discard=False):
+        try:
+            if not discard and not connection.closed:
+                try:
+                    if (connection.info.transaction_status
+                            != TRANSACTION_STATUS_IDLE):
+                        connection.rollback()
+                except psycopg2.Error:
+                    discard = True
+
+            if (discard or self._closed or connection.closed
+                    or self._expired(connection)):
+                self._discard(connection)
+            else:
+                with self._lock:
+                    self._idle.append((connection, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    def closeall(self):
+        with self._lock:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+
+        for connection, _ in idle:
+            self._discard(connection)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._created),
+                'idle': len(self._idle),
+                'max_size': self.max_size,
+            }
+
+    def _new_connection(self):
+        connection = self._connect()
+        with self._lock:
+            self._created[id(connection)] = time.monotonic()
+        logger.info("Opened database connection (pool size: %d)",
+                    len(self._created))
+        return connection
+
+    def _expired(self, connection):
+        created = self._created.get(id(connection))
+        return (created is None
+                or time.monotonic() - created > self.max_lifetime)
+
+    def _usable(self, connection, last_used):
+        if connection.closed or self._expired(connection):
+            return False
+
+        if time.monotonic() - last_used < self.health_check_after:
+            return True
+
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            connection.rollback()
+            return True
+        except psycopg2.Error:
+            logger.warning("Discarding database connection that failed "
+                           "its health check")
+            return False
+
+    def _discard(self, connection):
+        with self._lock:
+            self._created.pop(id(connection), None)
+
+        try:
+            connection.close()
+        except psycopg2.Error:
+            pass
+
+_pool = None
+_pool_lock = threading.Lock()
+# Pools inherited across a fork.  Their sockets belong to the parent, so
+# they are kept referenced (never closed or garbage collected) in the child.
+_inherited_pools = []
+
+def get_pool():
+    '''
+    Process-wide pool, created on first use and sized per worker
+    through DB_POOL_SIZE, DB_POOL_MAX_LIFETIME and DB_POOL_TIMEOUT.
+    '''
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool.pid != os.getpid():
+            _abandon_pool()
+
+        if _pool is None:
+            kwargs = connection_kwargs()
+            _pool = ConnectionPool(
+                lambda: psycopg2.connect(
+                    connection_factory=InstrumentedConnection, **kwargs),
+                max_size=_env_number('DB_POOL_SIZE', DEFAULT_POOL_SIZE),
+                max_lifetime=_env_number('DB_POOL_MAX_LIFETIME',
+                                         DEFAULT_MAX_LIFETIME, float),
+                timeout=_env_number('DB_POOL_TIMEOUT',
+                                    DEFAULT_CHECKOUT_TIMEOUT, float),
+            )
+
+        return _pool
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+def use_pool(pool):
+    '''
+    Make pool the process-wide pool and return the previous one (either
+    may be None, meaning one is created on first use).  Tests use this
+    to share a single connection with the app.
+    '''
+    global _pool
+    with _pool_lock:
+        previous, _pool = _pool, pool
+        return previous
+
+def _abandon_pool():
+    global _pool
+    if _pool is not None:
+        _inherited_pools.append(_pool)
+        _pool = None
+
+def _reset_after_fork():
+    global _pool_lock
+    _pool_lock = threading.Lock()
+    _abandon_pool()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -1,34 +1,170 @@
-import os 
+import binascii
+import io
+import os
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import defaultdict, namedtuple
 from contextlib import contextmanager
+from datetime import datetime
 
 import logging
-import psycopg2
+import threading
+from psycopg2.errors import UniqueViolation
 from psycopg2.extras import DictCursor
 from textwrap import dedent
 
+from job_board.cache import TTLCache
+from job_board.connection_pool import get_pool
+from job_board.instrumentation import timed
+from job_board.invalidation import notification, notify
+
 LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
 logging.basicConfig(level=logging.INFO, format=LOG_FORMAT) # configures root logger
 logger = logging.getLogger(__name__)
 
+# Cached rows are evicted on every committed write (in this worker and,
+# through the invalidation listener, in every other one), so the TTL only
+# bounds staleness if a notification is ever lost.
+CACHE_TTL = int(os.environ.get('CACHE_TTL', 3600))
+JOBS_PER_PAGE = 20
+STREAM_BATCH_SIZE = 200 # rows per round trip when streaming results
+# Fields of each job given to import_jobs(), in COPY order
+JOB_IMPORT_COLUMNS = ('title', 'location', 'role_overview', 'responsibilities',
+                      'requirements', 'nice_to_haves', 'benefits', 'pay_range',
+                      'closing_date', 'employment_type_id', 'department_id')
+
+# A page of job rows plus opaque cursors for the neighbouring pages
+# (None when there is no such page)
+JobPage = namedtuple('JobPage', ['jobs', 'next_cursor', 'prev_cursor'])
+
+def encode_cursor(*values):
+    '''
+    Opaque, URL-safe page cursor holding the sort key of a row
+    '''
+    position = '|'.join(value.isoformat() if isinstance(value, datetime)
+                        else repr(value) for value in values)
+    return urlsafe_b64encode(position.encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor, *parsers):
+    '''
+    Sort key from encode_cursor, each part converted by its parser
+    '''
+    try:
+        position = urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        parts = position.split('|')
+        if len(parts) != len(parsers):
+            raise ValueError(cursor)
+        return tuple(parse(part) for parse, part in zip(parsers, parts))
+    except (UnicodeError, binascii.Error, ValueError) as error:
+        raise ValueError(f"Invalid page cursor: {cursor!r}") from error
+
+# Unique constraints on companies -> the field a violation is about
+COMPANY_UNIQUE_FIELDS = {
+    'companies_email_domain_key': 'email_domain',
+    'companies_email_key': 'email_domain',
+    'companies_name_key': 'name',
+}
+
+class DuplicateCompany(Exception):
+    '''
+    A company with the same name or email domain already exists
+    '''
+    def __init__(self, field):
+        super().__init__(f"A company with that {field} already exists")
+        self.field = field
+
+class StaleJob(Exception):
+    '''
+    The job was edited by someone else since it was loaded, or is gone
+    '''
+
+def _copy_value(value):
+    '''
+    value as a field of COPY's text format
+    '''
+    if value is None:
+        return '\\N'
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+def _job_cursor(job):
+    return encode_cursor(job['posted_at'], job['id'])
+
 class DatabasePersistence:
+    '''
+    Long-lived and shared by every request in a worker.  The schema is
+    managed by job_board.migrate, so constructing this does no queries.
+    '''
     def __init__(self):
-        self._setup_schema()
+        self._local = threading.local() # connection checked out per thread
+        self._subscribers = defaultdict(list)
+        self._trigram_search = None # see has_trigram_search
+        self._companies = TTLCache(CACHE_TTL)    # company id -> row
+        self._job_pages = TTLCache(CACHE_TTL)    # page args -> JobPage
+        self._job_counts = TTLCache(CACHE_TTL)   # None -> job_counts()
+        self.subscribe('companies', self._evict_company)
+        self.subscribe('jobs', self._evict_job_pages)
 
     @contextmanager
     def _database_connection(self):
-        env = os.environ.get('FLASK_ENV')
-        if env == 'production':
-            connection = psycopg2.connect(os.environ['DATABASE_URL'])
-        elif env == 'test':
-            connection = psycopg2.connect(dbname='job_board_test')
+        '''
+        Each block runs in its own transaction, but every block on a thread
+        shares one pooled connection until close() hands it back
+        '''
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None and connection.closed:
+            get_pool().putconn(connection, discard=True)
+            connection = None
+
+        if connection is None:
+            with timed('acquire_time'):
+                connection = get_pool().getconn()
+            self._local.connection = connection
+
+        with connection:
+            yield connection
+
+    def close(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            self._local.connection = None
+            get_pool().putconn(connection)
+
+    def subscribe(self, topic, callback):
+        '''
+        Call callback(key) after a committed write touching topic
+        ('taxonomy', 'companies' or 'jobs').  The key is a company id
+        for companies and jobs, or None meaning "everything".
+        '''
+        self._subscribers[topic].append(callback)
+
+    def publish(self, topic, key=None):
+        for callback in self._subscribers[topic]:
+            callback(key)
+
+    def publish_all(self):
+        for topic in list(self._subscribers):
+            self.publish(topic)
+
+    def cache_stats(self):
+        return {'companies': self._companies.stats(),
+                'job_pages': self._job_pages.stats(),
+                'job_counts': self._job_counts.stats()}
+
+    def _evict_company(self, company_id):
+        if company_id is None:
+            self._companies.clear()
         else:
-            connection = psycopg2.connect(dbname='job_board')
-        
-        try:
-            with connection:
-                yield connection
-        finally:
-            connection.close()
+            self._companies.evict(company_id)
+
+    def _evict_job_pages(self, company_id):
+        self._job_counts.clear()
+        if company_id is None:
+            self._job_pages.clear()
+        else:
+            # that company's pages, plus every page not limited to one
+            # company (feeds and browse pages may list its jobs)
+            self._job_pages.evict_where(
+                lambda key: key[0] in (company_id, None))
 
     def all_companies(self):
         query = """
@@ -43,33 +179,54 @@ class DatabasePersistence:
         companies = [dict(result) for result in results]
         return companies
 
-    def all_company_names(self):
+    def iter_companies(self, batch_size=STREAM_BATCH_SIZE):
+        '''
+        Every company, in id order, fetched `batch_size` rows at a time
+        through a server-side cursor, so only one batch is in memory.
+        The cursor is declared WITH HOLD: other storage calls made while
+        iterating commit on the same connection, which would otherwise
+        close it.
+        '''
         query = """
-            SELECT \"name\" FROM companies
+            SELECT * FROM companies ORDER BY id
         """
-        logger.info("Executing query: %s", query)
+        logger.info("Executing query: %s in batches of %d", query,
+                    batch_size)
         with self._database_connection() as conn:
-            with conn.cursor(cursor_factory=DictCursor) as cursor:
+            with conn.cursor('iter_companies', cursor_factory=DictCursor,
+                             withhold=True) as cursor:
+                cursor.itersize = batch_size
                 cursor.execute(query)
-                results = cursor.fetchall()
-        
-        company_names = [result['name'] for result in results]
-        return company_names
+                for result in cursor:
+                    yield dict(result)
 
-    def all_company_emails(self):
+    def find_signup_conflicts(self, name, email_domain):
+        '''
+        Which of the company name and email domain are already taken,
+        as {'name': bool, 'email_domain': bool}
+        '''
         query = """
-            SELECT email FROM companies
+            SELECT
+                EXISTS (SELECT 1 FROM companies
+                        WHERE email_domain = lower(%s)) AS email_domain,
+                EXISTS (SELECT 1 FROM companies
+                        WHERE "name" = %s) AS "name"
         """
-        logger.info("Executing query: %s", query)
+        logger.info("Executing query: %s with name: %s, with domain: %s",
+                    query, name, email_domain)
         with self._database_connection() as conn:
             with conn.cursor(cursor_factory=DictCursor) as cursor:
-                cursor.execute(query)
-                results = cursor.fetchall()
-        
-        company_emails = [result['email'] for result in results]
-        return company_emails
-    
+                cursor.execute(query, (email_domain, name))
+                result = cursor.fetchone()
+
+        return dict(result)
+
     def find_company_by_id(self, company_id):
+        company = self._companies.get_or_load(
+            company_id, lambda: self._find_company_by_id(company_id))
+        return dict(company) if company else None
+
+    def _find_company_by_id(self, company_id):
         query = """
             SELECT * FROM companies
             WHERE id = %s
@@ -85,6 +242,19 @@ class DatabasePersistence:
         
         return dict(result)
     
+    def find_company_session_version(self, company_id):
+        '''
+        The company's session_version, None if there is no such company
+        '''
+        query = "SELECT session_version FROM companies WHERE id = %s"
+        logger.info("Executing query: %s with id: %s", query, company_id)
+        with self._database_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, (company_id,))
+                result = cursor.fetchone()
+
+        return result[0] if result else None
+
     def find_company_by_name(self, company_name):
         query = 'SELECT * FROM companies WHERE "name" = %s'
         logger.info('Executing query: %s with name: %s', query, company_name)
@@ -116,15 +286,28 @@ class DatabasePersistence:
         query = dedent('INSERT INTO companies '
                        '("name", "location", email, '
                        '"password", "description") '
-                       'VALUES (%s, %s, %s, %s, %s)')
+                       'VALUES (%s, %s, %s, %s, %s) '
+                       'RETURNING id')
         logger.info("""Executing query: %s with name: %s,
                     with location: %s, with email: %s,
                     with password: %s, with description: %s""",
                     query, name, location, email, password, description)
-        with self._database_connection() as connection:
-            with connection.cursor() as cursor:
-                cursor.execute(query, (name, location, email,
-                                       password, description))
+        try:
+            with self._database_connection() as connection:
+                with connection.cursor() as cursor:
+                    cursor.execute(query, (name, location, email,
+                                           password, description))
+                    company_id = cursor.fetchone()[0]
+                    notify(cursor, 'companies', company_id)
+        except UniqueViolation as error:
+            # lost a race with a concurrent signup
+            field = COMPANY_UNIQUE_FIELDS.get(error.diag.constraint_name)
+            if field is None:
+                raise
+            raise DuplicateCompany(field) from error
+
+        self.publish('companies', company_id)
+        return company_id
     
     def update_company_profile_info(self, company_id, name,
                                     location, description):
@@ -141,6 +324,11 @@ class DatabasePersistence:
             with conn.cursor() as cursor:
                 cursor.execute(query, (name, location,
                                        description, company_id))
+                notify(cursor, 'companies', company_id)
+                notify(cursor, 'jobs', company_id) # rows carry the name
+
+        self.publish('companies', company_id)
+        self.publish('jobs', company_id)
 
     def update_company_profile_logo(self, company_id, filename):
         query = """
@@ -154,34 +342,290 @@ class DatabasePersistence:
         with self._database_connection() as conn:
             with conn.cursor() as cursor:
                 cursor.execute(query, (filename, company_id))
+                notify(cursor, 'companies', company_id)
+
+        self.publish('companies', company_id)
     
-    def find_jobs_by_company_id(self, company_id):
+    def update_company_password(self, company_id, password):
         query = """
-            SELECT companies.id, companies.name AS company_name,
-            companies.email,
-            jobs.id, jobs.title, jobs.location, jobs.role_overview,
+            UPDATE companies
+            SET "password" = %s
+            WHERE id = %s
+        """
+        logger.info("Executing query: %s with company_id: %s",
+                    query, company_id)
+        with self._database_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, (password, company_id))
+                notify(cursor, 'companies', company_id)
+
+        self.publish('companies', company_id)
+
+    def find_job_page(self, company_id=None, department_id=None,
+                      employment_type_id=None, limit=JOBS_PER_PAGE,
+                      after=None, before=None):
+        '''
+        One page of jobs, most recent first, optionally only those of one
+        company, department or employment type.  `after` and `before`
+        are cursors from a previous JobPage: `after` continues with older
+        postings, `before` goes back to newer ones.  Raises ValueError
+        for a malformed cursor.
+        '''
+        key = (company_id, department_id, employment_type_id,
+               limit, after, before)
+        return self._job_pages.get_or_load(key, lambda: self._find_job_page(
+            company_id, department_id, employment_type_id,
+            limit, after, before))
+
+    def _find_job_page(self, company_id, department_id, employment_type_id,
+                       limit, after, before):
+        conditions = []
+        params = []
+        for column, value in (('jobs.company_id', company_id),
+                              ('dj.department_id', department_id),
+                              ('etj.employment_type_id',
+                               employment_type_id)):
+            if value is not None:
+                conditions.append(f'{column} = %s')
+                params.append(value)
+
+        order = 'DESC'
+        if after is not None:
+            conditions.append('(jobs.posted_date, jobs.id) < (%s, %s)')
+            params.extend(decode_cursor(after, datetime.fromisoformat, int))
+        elif before is not None:
+            conditions.append('(jobs.posted_date, jobs.id) > (%s, %s)')
+            params.extend(decode_cursor(before, datetime.fromisoformat, int))
+            order = 'ASC'
+
+        where = 'WHERE ' + ' AND '.join(conditions) if conditions else ''
+        query = f"""
+            SELECT jobs.id, jobs.title, jobs.location, jobs.role_overview,
             jobs.responsibilities, jobs.requirements, jobs.nice_to_haves,
             jobs.benefits, jobs.pay_range, jobs.posted_date::date,
-            jobs.closing_date, jobs.company_id, et.type,
-            departments.name AS department,
-            etj.employment_type_id, etj.job_id, dj.department_id, dj.job_id
-            FROM companies
-            JOIN jobs ON companies.id = jobs.company_id
+            jobs.posted_date AS posted_at, jobs.closing_date,
+            jobs.company_id, companies.name AS company_name,
+            companies.email, et.type, departments.name AS department,
+            etj.employment_type_id, dj.department_id
+            FROM jobs
+            JOIN companies ON companies.id = jobs.company_id
             JOIN employment_types_jobs AS etj ON jobs.id = etj.job_id
             JOIN departments_jobs AS dj ON jobs.id = dj.job_id
             JOIN employment_types AS et ON et.id = etj.employment_type_id
             JOIN departments ON departments.id = dj.department_id
-            WHERE companies.id = %s
+            {where}
+            ORDER BY jobs.posted_date {order}, jobs.id {order}
+            LIMIT %s
+        """
+        params.append(limit + 1) # one extra row: is there another page?
+        logger.info("Executing query: %s with params: %s", query, params)
+        with self._database_connection() as conn:
+            with conn.cursor(cursor_factory=DictCursor) as cursor:
+                cursor.execute(query, params)
+                results = cursor.fetchall()
+
+        jobs = [dict(result) for result in results[:limit]]
+        has_more = len(results) > limit
+        if before is not None:
+            jobs.reverse()
+            has_newer, has_older = has_more, True
+        else:
+            has_newer, has_older = after is not None, has_more
+
+        if not jobs:
+            return JobPage([], None, None)
+
+        return JobPage(
+            jobs,
+            _job_cursor(jobs[-1]) if has_older else None,
+            _job_cursor(jobs[0]) if has_newer else None,
+        )
+
+    def job_counts(self):
+        '''
+        {'departments': {id: count}, 'employment_types': {id: count}},
+        read from the trigger-maintained counter tables
+        '''
+        return self._job_counts.get_or_load(None, self._load_job_counts)
+
+    def _load_job_counts(self):
+        query = """
+            SELECT 'departments', department_id, job_count
+            FROM department_job_counts
+            UNION ALL
+            SELECT 'employment_types', employment_type_id, job_count
+            FROM employment_type_job_counts
+        """
+        logger.info("Executing query: %s", query)
+        with self._database_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query)
+                results = cursor.fetchall()
+
+        counts = {'departments': {}, 'employment_types': {}}
+        for facet, facet_id, job_count in results:
+            counts[facet][facet_id] = job_count
+        return counts
+
+    def search_jobs(self, text, department_id=None, employment_type_id=None,
+                    limit=JOBS_PER_PAGE, after=None):
+        '''
+        One page of jobs matching a web-style search (quoted phrases, OR,
+        -exclusions), best match first.  `after` is the next_cursor of the
+        previous page.  Raises ValueError for a malformed cursor.
+        '''
+        params = {'text': text, 'limit': limit + 1, # one extra: more pages?
+                  'department_id': department_id,
+                  'employment_type_id': employment_type_id}
+        filters = ''
+        if department_id is not None:
+            filters += """
+                AND EXISTS (SELECT 1 FROM departments_jobs AS dj
+                            WHERE dj.job_id = jobs.id
+                            AND dj.department_id = %(department_id)s)
+            """
+        if employment_type_id is not None:
+            filters += """
+                AND EXISTS (SELECT 1 FROM employment_types_jobs AS etj
+                            WHERE etj.job_id = jobs.id
+                            AND etj.employment_type_id
+                                = %(employment_type_id)s)
+            """
+
+        position = ''
+        if after is not None:
+            params['rank'], params['id'] = decode_cursor(after, float, int)
+            position = 'WHERE (matches.rank, matches.id) < (%(rank)s, %(id)s)'
+
+        # rank and cut the page on jobs alone, then join details for
+        # just that page
+        query = f"""
+            WITH page AS (
+                SELECT matches.id, matches.rank
+                FROM (
+                    SELECT jobs.id,
+                    ts_rank(jobs.search_vector, search_query)::float8
+                        AS rank
+                    FROM jobs,
+                    websearch_to_tsquery('english', %(text)s)
+                        AS search_query
+                    WHERE jobs.search_vector @@ search_query
+                    {filters}
+                ) AS matches
+                {position}
+                ORDER BY matches.rank DESC, matches.id DESC
+                LIMIT %(limit)s
+            )
+            SELECT jobs.id, jobs.title, jobs.location, jobs.role_overview,
+            jobs.pay_range, jobs.posted_date::date, jobs.closing_date,
+            jobs.company_id, companies.name AS company_name,
+            et.type, departments.name AS department, page.rank
+            FROM page
+            JOIN jobs ON jobs.id = page.id
+            JOIN companies ON companies.id = jobs.company_id
+            JOIN employment_types_jobs AS etj ON jobs.id = etj.job_id
+            JOIN departments_jobs AS dj ON jobs.id = dj.job_id
+            JOIN employment_types AS et ON et.id = etj.employment_type_id
+            JOIN departments ON departments.id = dj.department_id
+            ORDER BY page.rank DESC, page.id DESC
+        """
+        logger.info("Executing query: %s with params: %s", query, params)
+        with self._database_connection() as conn:
+            with conn.cursor(cursor_factory=DictCursor) as cursor:
+                cursor.execute(query, params)
+                results = cursor.fetchall()
+
+        jobs = [dict(result) for result in results[:limit]]
+        next_cursor = None
+        if len(results) > limit:
+            next_cursor = encode_cursor(jobs[-1]['rank'], jobs[-1]['id'])
+
+        return JobPage(jobs, next_cursor, None)
+
+    def autocomplete_terms(self, company_id=None):
+        '''
+        (company_id, kind, text) for every company name, job title and job
+        location, or only those belonging to one company
+        '''
+        company_filter = job_filter = ''
+        if company_id is not None:
+            company_filter = 'AND id = %(company_id)s'
+            job_filter = 'WHERE company_id = %(company_id)s'
+
+        query = f"""
+            SELECT id, 'company', "name" FROM companies
+            WHERE id <> 1 {company_filter} -- 1 is the site admin account
+            UNION
+            SELECT company_id, 'title', title FROM jobs {job_filter}
+            UNION
+            SELECT company_id, 'location', "location" FROM jobs {job_filter}
         """
         logger.info("Executing query: %s with company_id: %s",
                     query, company_id)
         with self._database_connection() as conn:
-            with conn.cursor(cursor_factory=DictCursor) as cursor:
-                cursor.execute(query, (company_id,))
+            with conn.cursor() as cursor:
+                cursor.execute(query, {'company_id': company_id})
+                return cursor.fetchall()
+
+    def has_trigram_search(self):
+        '''
+        Whether pg_trgm is installed, checked once per worker
+        '''
+        if self._trigram_search is None:
+            query = """
+                SELECT EXISTS (SELECT 1 FROM pg_extension
+                               WHERE extname = 'pg_trgm')
+            """
+            logger.info("Executing query: %s", query)
+            with self._database_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(query)
+                    self._trigram_search = cursor.fetchone()[0]
+
+        return self._trigram_search
+
+    def fuzzy_autocomplete(self, text, limit):
+        '''
+        (kind, text) pairs similar to text (pg_trgm), best match first
+        '''
+        query = """
+            SELECT kind, term FROM (
+                SELECT 'company' AS kind, "name" AS term,
+                similarity("name", %(text)s) AS score
+                FROM companies
+                WHERE "name" %% %(text)s AND id <> 1
+                UNION
+                SELECT 'title', title, similarity(title, %(text)s)
+                FROM jobs WHERE title %% %(text)s
+                UNION
+                SELECT 'location', "location", similarity("location", %(text)s)
+                FROM jobs WHERE "location" %% %(text)s
+            ) AS matches
+            ORDER BY score DESC, term
+            LIMIT %(limit)s
+        """
+        logger.info("Executing query: %s with text: %s", query, text)
+        with self._database_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, {'text': text, 'limit': limit})
+                return cursor.fetchall()
+
+    def find_content_versions(self, scopes):
+        '''
+        {scope: (version, updated_at)} for the scopes that have a stamp
+        '''
+        query = """
+            SELECT scope, version, updated_at FROM content_versions
+            WHERE scope = ANY(%s)
+        """
+        logger.info("Executing query: %s with scopes: %s", query, scopes)
+        with self._database_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, (list(scopes),))
                 results = cursor.fetchall()
-        
-        jobs = [dict(result) for result in results]
-        return jobs
+
+        return {scope: (version, updated_at)
+                for scope, version, updated_at in results}
 
     def get_employment_types(self):
         query = "SELECT * FROM employment_types"
@@ -205,160 +649,282 @@ class DatabasePersistence:
         departments = [dict(result) for result in results]
         return departments
 
+    def add_employment_type(self, employment_type):
+        query = """
+            INSERT INTO employment_types ("type")
+            VALUES (%s)
+            RETURNING id
+        """
+        logger.info("Executing query: %s with type: %s",
+                    query, employment_type)
+        with self._database_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, (employment_type,))
+                employment_type_id = cursor.fetchone()[0]
+                notify(cursor, 'taxonomy')
+
+        self.publish('taxonomy')
+        return employment_type_id
+
+    def add_department(self, name):
+        query = """
+            INSERT INTO departments ("name")
+            VALUES (%s)
+            RETURNING id
+        """
+        logger.info("Executing query: %s with name: %s", query, name)
+        with self._database_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, (name,))
+                department_id = cursor.fetchone()[0]
+                notify(cursor, 'taxonomy')
+
+        self.publish('taxonomy')
+        return department_id
+
+    def find_job(self, job_id, company_id):
+        '''
+        One of company_id's jobs, with its version and taxonomy ids, for
+        editing.  None if it has no such job.
+        '''
+        query = """
+            SELECT jobs.*, etj.employment_type_id, dj.department_id
+            FROM jobs
+            JOIN employment_types_jobs AS etj ON jobs.id = etj.job_id
+            JOIN departments_jobs AS dj ON jobs.id = dj.job_id
+            WHERE jobs.id = %s AND jobs.company_id = %s
+            LIMIT 1
+        """
+        logger.info("Executing query: %s with job_id: %s, company_id: %s",
+                    query, job_id, company_id)
+        with self._database_connection() as conn:
+            with conn.cursor(cursor_factory=DictCursor) as cursor:
+                cursor.execute(query, (job_id, company_id))
+                result = cursor.fetchone()
+
+        return dict(result) if result else None
+
     def insert_new_job(self, title, location,
                        role_overview, responsibilities, requirements,
                        nice_to_haves, benefits, pay_range, closing_date,
                        company_id, employment_type_id, department_id):
-        query_jobs = """
-            INSERT INTO jobs (title, location, role_overview,
-            responsibilities, requirements, nice_to_haves, benefits,
-            pay_range, closing_date, company_id)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            RETURNING id
+        '''
+        Inserts the job, its employment type and department and notifies
+        other workers in one statement.  Returns the new job's id.
+        '''
+        query = """
+            WITH new_job AS (
+                INSERT INTO jobs (title, location, role_overview,
+                responsibilities, requirements, nice_to_haves, benefits,
+                pay_range, closing_date, company_id)
+                VALUES (%(title)s, %(location)s, %(role_overview)s,
+                %(responsibilities)s, %(requirements)s, %(nice_to_haves)s,
+                %(benefits)s, %(pay_range)s, %(closing_date)s,
+                %(company_id)s)
+                RETURNING id
+            ), employment_type AS (
+                INSERT INTO employment_types_jobs (employment_type_id, job_id)
+                SELECT %(employment_type_id)s, id FROM new_job
+            ), department AS (
+                INSERT INTO departments_jobs (department_id, job_id)
+                SELECT %(department_id)s, id FROM new_job
+            )
+            SELECT id, pg_notify(%(channel)s, %(payload)s) FROM new_job
+        """
+        params = dict(title=title, location=location,
+                      role_overview=role_overview,
+                      responsibilities=responsibilities,
+                      requirements=requirements, nice_to_haves=nice_to_haves,
+                      benefits=benefits, pay_range=pay_range,
+                      closing_date=closing_date, company_id=company_id,
+                      employment_type_id=employment_type_id,
+                      department_id=department_id)
+        logger.info("Executing query: %s with params: %s", query, params)
+        channel, payload = notification('jobs', company_id)
+        with self._database_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, dict(params, channel=channel,
+                                           payload=payload))
+                job_id = cursor.fetchone()[0]
+
+        self.publish('jobs', company_id)
+        return job_id
+
+    def import_jobs(self, company_id, batches):
+        '''
+        Inserts the jobs in batches, an iterable of lists of dicts keyed
+        by JOB_IMPORT_COLUMNS, for company_id in one transaction.  Each
+        batch is COPYed into a temporary staging table, which then fills
+        jobs and both junction tables in one statement.  An exception
+        from batches rolls everything back.  Returns the number of jobs.
+        '''
+        columns = ', '.join(JOB_IMPORT_COLUMNS)
+        create_staging = """
+            CREATE TEMPORARY TABLE job_import (
+                job_id integer NOT NULL DEFAULT nextval('jobs_id_seq'),
+                title text, location text, role_overview text,
+                responsibilities text, requirements text,
+                nice_to_haves text, benefits text, pay_range text,
+                closing_date date, employment_type_id integer,
+                department_id integer
+            ) ON COMMIT DROP
+        """
+        copy = f"COPY job_import ({columns}) FROM STDIN"
+        insert = """
+            WITH new_jobs AS (
+                INSERT INTO jobs (id, title, location, role_overview,
+                responsibilities, requirements, nice_to_haves, benefits,
+                pay_range, closing_date, company_id)
+                SELECT job_id, title, location, role_overview,
+                responsibilities, requirements, nice_to_haves, benefits,
+                pay_range, closing_date, %(company_id)s
+                FROM job_import
+                RETURNING id
+            ), employment_types AS (
+                INSERT INTO employment_types_jobs (employment_type_id, job_id)
+                SELECT employment_type_id, job_id FROM job_import
+            ), departments AS (
+                INSERT INTO departments_jobs (department_id, job_id)
+                SELECT department_id, job_id FROM job_import
+            )
+            SELECT count(*), pg_notify(%(channel)s, %(payload)s)
+            FROM new_jobs
+        """
+        logger.info("Executing query: %s, %s, then %s with company_id: %s",
+                    create_staging, copy, insert, company_id)
+        channel, payload = notification('jobs', company_id)
+        with self._database_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(create_staging)
+                for batch in batches:
+                    buffer = io.StringIO()
+                    for job in batch:
+                        buffer.write('\t'.join(
+                            _copy_value(job[column])
+                            for column in JOB_IMPORT_COLUMNS) + '\n')
+                    buffer.seek(0)
+                    cursor.copy_expert(copy, buffer)
+
+                cursor.execute(insert, {'company_id': company_id,
+                                        'channel': channel,
+                                        'payload': payload})
+                count = cursor.fetchone()[0]
+
+        if count:
+            self.publish('jobs', company_id)
+        return count
+
+    def update_job(self, job_id, company_id, version, title, location,
+                   role_overview, responsibilities, requirements,
+                   nice_to_haves, benefits, pay_range, closing_date,
+                   employment_type_id, department_id):
+        '''
+        Updates company_id's job, and moves it to the given employment
+        type and department, in one statement, if the job is still at
+        `version`.  Returns its new version; raises StaleJob if it was
+        edited since (or deleted, or isn't company_id's).
+        '''
+        query = """
+            WITH updated AS (
+                UPDATE jobs SET title = %(title)s, location = %(location)s,
+                role_overview = %(role_overview)s,
+                responsibilities = %(responsibilities)s,
+                requirements = %(requirements)s,
+                nice_to_haves = %(nice_to_haves)s, benefits = %(benefits)s,
+                pay_range = %(pay_range)s, closing_date = %(closing_date)s,
+                version = version + 1
+                WHERE id = %(job_id)s AND company_id = %(company_id)s
+                AND version = %(version)s
+                RETURNING id, version
+            ), employment_type AS (
+                UPDATE employment_types_jobs
+                SET employment_type_id = %(employment_type_id)s
+                WHERE job_id IN (SELECT id FROM updated)
+                AND employment_type_id <> %(employment_type_id)s
+            ), department AS (
+                UPDATE departments_jobs
+                SET department_id = %(department_id)s
+                WHERE job_id IN (SELECT id FROM updated)
+                AND department_id <> %(department_id)s
+            )
+            SELECT version, pg_notify(%(channel)s, %(payload)s) FROM updated
+        """
+        params = dict(job_id=job_id, company_id=company_id, version=version,
+                      title=title, location=location,
+                      role_overview=role_overview,
+                      responsibilities=responsibilities,
+                      requirements=requirements, nice_to_haves=nice_to_haves,
+                      benefits=benefits, pay_range=pay_range,
+                      closing_date=closing_date,
+                      employment_type_id=employment_type_id,
+                      department_id=department_id)
+        logger.info("Executing query: %s with params: %s", query, params)
+        channel, payload = notification('jobs', company_id)
+        with self._database_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, dict(params, channel=channel,
+                                           payload=payload))
+                result = cursor.fetchone()
+
+        if result is None:
+            raise StaleJob(f"Job {job_id} is no longer at version {version}")
+
+        self.publish('jobs', company_id)
+        return result[0]
+
+    def load_session(self, session_id):
+        '''
+        Serialized data of an unexpired session, or None
+        '''
+        query = """
+            SELECT "data" FROM sessions
+            WHERE id = %s AND expires_at > NOW()
+        """
+        logger.info("Executing query: %s", query)
+        with self._database_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, (session_id,))
+                result = cursor.fetchone()
+
+        return result[0] if result else None
+
+    def save_session(self, session_id, data, lifetime):
+        query = """
+            INSERT INTO sessions (id, "data", expires_at)
+            VALUES (%s, %s, NOW() + %s * interval '1 second')
+            ON CONFLICT (id) DO UPDATE
+            SET "data" = EXCLUDED."data", expires_at = EXCLUDED.expires_at
+        """
+        logger.info("Executing query: %s", query)
+        with self._database_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, (session_id, data, lifetime))
+                notify(cursor, 'sessions', session_id)
+
+        self.publish('sessions', session_id)
+
+    def delete_session(self, session_id):
+        query = "DELETE FROM sessions WHERE id = %s"
+        logger.info("Executing query: %s", query)
+        with self._database_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, (session_id,))
+                notify(cursor, 'sessions', session_id)
+
+        self.publish('sessions', session_id)
+
+    def delete_expired_sessions(self, limit):
+        '''
+        Delete up to limit expired sessions and return how many were
+        '''
+        query = """
+            DELETE FROM sessions
+            WHERE id IN (SELECT id FROM sessions
+                         WHERE expires_at <= NOW()
+                         LIMIT %s)
         """
-        logger.info("""Executing query: %s, w/ title: %s, w/ location: %s,
-                    w/ role_overview: %s, w/ responsibilities: %s,
-                    w/ requirements: %s, w/ nice_to_haves: %s,
-                    w/ benefits: %s, w/ pay_range: %s, w/ closing_date: %s,
-                    w/ company_id: %s""", query_jobs, title, location,
-                    role_overview, responsibilities, requirements,
-                    nice_to_haves, benefits, pay_range, closing_date,
-                    company_id)
+        logger.info("Executing query: %s with limit: %s", query, limit)
         with self._database_connection() as conn:
             with conn.cursor() as cursor:
-                cursor.execute(query_jobs, (title, location, role_overview,
-                                       responsibilities, requirements,
-                                       nice_to_haves, benefits, pay_range,
-                                       closing_date, company_id))
-
-                job_id = cursor.fetchone()[0] # getting new job's id
-
-                query_employment_types_jobs = """
-                    INSERT INTO employment_types_jobs
-                    (employment_type_id, job_id)
-                    VALUES (%s, %s)
-                """
-                cursor.execute(query_employment_types_jobs,
-                               (employment_type_id, job_id))
-                query_departments_jobs = """
-                    INSERT INTO departments_jobs
-                    (department_id, job_id)
-                    VALUES (%s, %s)
-                """
-                cursor.execute(query_departments_jobs,
-                               (department_id, job_id))
-
-    def _setup_schema(self):
-        with self._database_connection() as connection:
-            with connection.cursor() as cursor:
-                cursor.execute("""
-                    SELECT COUNT(*)
-                    FROM information_schema.tables
-                    WHERE table_schema = 'public'
-                        AND table_name = 'companies'
-                """)
-                if cursor.fetchone()[0] == 0:
-                    cursor.execute("""
-                        CREATE TABLE companies (
-                            id serial PRIMARY KEY,
-                            "name" varchar(100) NOT NULL UNIQUE,
-                            "location" varchar(100) NOT NULL,
-                            email text NOT NULL UNIQUE,
-                            "password" text NOT NULL,
-                            "description" varchar(1000),
-                            logo text
-                        )
-                    """)
-                
-                cursor.execute("""
-                    SELECT COUNT(*)
-                    FROM information_schema.tables
-                    WHERE table_schema = 'public' AND table_name = 'jobs'
-                """)
-                if cursor.fetchone()[0] == 0:
-                    cursor.execute("""
-                        CREATE TABLE jobs (
-                            id serial PRIMARY KEY,
-                            title varchar(100) NOT NULL,
-                            "location" varchar(100) NOT NULL,
-                            role_overview varchar(1000) NOT NULL,
-                            responsibilities varchar(600) NOT NULL,
-                            requirements varchar(600) NOT NULL,
-                            nice_to_haves varchar(600) NOT NULL,
-                            benefits varchar(600),
-                            pay_range text,
-                            posted_date timestamp DEFAULT NOW(),
-                            closing_date date,
-                            company_id int NOT NULL
-                                REFERENCES companies (id)
-                                ON DELETE CASCADE
-                        )
-                    """)
-                
-                cursor.execute("""
-                    SELECT COUNT(*)
-                    FROM information_schema.tables
-                    WHERE table_schema = 'public'
-                        AND table_name = 'employment_types'
-                """)
-                if cursor.fetchone()[0] == 0:
-                    cursor.execute("""
-                        CREATE TABLE employment_types (
-                            id serial PRIMARY KEY,
-                            "type" varchar(100) NOT NULL
-                        )
-                    """)
-
-                cursor.execute("""
-                    SELECT COUNT(*)
-                    FROM information_schema.tables
-                    WHERE table_schema = 'public'
-                        AND table_name = 'departments'
-                """)
-                if cursor.fetchone()[0] == 0:
-                    cursor.execute("""
-                        CREATE TABLE departments (
-                            id serial PRIMARY KEY,
-                            "name" varchar(100) NOT NULL
-                        )
-                    """)
-                
-                cursor.execute("""
-                    SELECT COUNT(*)
-                    FROM information_schema.tables
-                    WHERE table_schema = 'public'
-                        AND table_name = 'employment_types_jobs'
-                """)
-                if cursor.fetchone()[0] == 0:
-                    cursor.execute("""
-                        CREATE TABLE employment_types_jobs (
-                            id serial PRIMARY KEY,
-                            employment_type_id int NOT NULL
-                                REFERENCES employment_types (id)
-                                ON DELETE CASCADE,
-                            job_id int NOT NULL
-                                REFERENCES jobs (id)
-                                ON DELETE CASCADE,
-                            UNIQUE (employment_type_id, job_id)
-                        )
-                    """)
-                
-                cursor.execute("""
-                    SELECT COUNT(*)
-                    FROM information_schema.tables
-                    WHERE table_schema = 'public'
-                        AND table_name = 'departments_jobs'
-                """)
-                if cursor.fetchone()[0] == 0:
-                    cursor.execute("""
-                        CREATE TABLE departments_jobs (
-                            id serial PRIMARY KEY,
-                            department_id int NOT NULL
-                                REFERENCES departments (id)
-                                ON DELETE CASCADE,
-                            job_id int NOT NULL
-                                REFERENCES jobs (id)
-                                ON DELETE CASCADE,
-                            UNIQUE (department_id, job_id)
-                        )
-                    """)
\ No newline at end of file
+                cursor.execute(query, (limit,))
+                return cursor.rowcount
@@ -0,0 +1,55 @@
+'''
+Cache of rendered per-entity template fragments (job and company cards).
+'''
+import hashlib
+
+from markupsafe import Markup
+
+from job_board.cache import TTLCache
+
+DEFAULT_MAX_SIZE = 5_000
+DEFAULT_TTL = 3600
+
+class FragmentCache:
+    '''
+    Rendered HTML keyed by (template, company id, entity id, digest of the
+    context).
+
+    Fragments are rendered without the request context, so they may only
+    use their own arguments and the environment's globals.  Keying on the
+    arguments themselves means a fragment always matches the row the page
+    loaded, however a write interleaves with the request.  Events only
+    drop outdated entries early: 'companies' and 'jobs' events those of
+    their company, 'taxonomy' and "everything" events all of them.
+    Otherwise the LRU bound of `max_size` fragments drops them in time.
+    '''
+    def __init__(self, storage, environment, max_size=DEFAULT_MAX_SIZE,
+                 ttl=DEFAULT_TTL):
+        self._environment = environment
+        self._cache = TTLCache(ttl, max_size=max_size)
+        storage.subscribe('companies', self._evict)
+        storage.subscribe('jobs', self._evict)
+        storage.subscribe('taxonomy', lambda key: self.clear())
+
+    def _evict(self, company_id):
+        if company_id is None:
+            self.clear()
+        else:
+            self._cache.evict_where(lambda key: key[1] == company_id)
+
+    def render(self, template_name, company_id, entity_id, **context):
+        '''
+        template_name rendered with context, cached for the entity
+        '''
+        digest = hashlib.sha1(repr(sorted(context.items())).encode(
+            'utf-8')).digest()
+        key = (template_name, company_id, entity_id, digest)
+        return self._cache.get_or_load(
+            key, lambda: Markup(self._environment.get_template(
+                template_name).render(context)))
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self):
+        return self._cache.stats()
@@ -0,0 +1,251 @@
+'''
+Per-request query and timing instrumentation.
+
+Pooled connections hand out cursors that time every statement, and
+DatabasePersistence times connection checkouts.  Both are added to the
+RequestMetrics of the request being served (if any), which the app turns
+into a Server-Timing header and feeds into per-endpoint histograms.
+'''
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from psycopg2.extensions import connection as base_connection, cursor
+
+# Upper bounds of the histogram buckets (Prometheus `le` labels)
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+_current = ContextVar('request_metrics', default=None)
+
+class RequestMetrics:
+    '''
+    Counters for one request; times are in seconds
+    '''
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.elapsed = None
+        self.queries = 0
+        self.db_time = 0.0
+        self.acquire_time = 0.0
+        self.render_time = 0.0 # includes queries the templates trigger
+        self._render_depth = 0
+        self._render_started = None
+
+    def render_started(self):
+        # templates rendered from within a template count once
+        self._render_depth += 1
+        if self._render_depth == 1:
+            self._render_started = time.perf_counter()
+
+    def render_finished(self):
+        self._render_depth -= 1
+        if self._render_depth == 0:
+            self.render_time += time.perf_counter() - self._render_started
+
+    def finish(self):
+        if self.elapsed is None:
+            self.elapsed = time.perf_counter() - self.started
+        return self.elapsed
+
+    def server_timing(self):
+        '''
+        Value for the Server-Timing response header (durations in ms)
+        '''
+        total = self.elapsed
+        if total is None:
+            total = time.perf_counter() - self.started
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.2f};desc="{self.queries} queries"',
+            f'conn;dur={self.acquire_time * 1000:.2f}',
+            f'render;dur={self.render_time * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ])
+
+def start_request():
+    metrics = RequestMetrics()
+    _current.set(metrics)
+    return metrics
+
+def current_metrics():
+    return _current.get()
+
+def end_request():
+    _current.set(None)
+
+@contextmanager
+def timed(attribute):
+    '''
+    Add the time spent in the block to the current request's attribute
+    '''
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics = _current.get()
+        if metrics is not None:
+            setattr(metrics, attribute, getattr(metrics, attribute)
+                    + time.perf_counter() - started)
+
+def record_query(duration):
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.queries += 1
+        metrics.db_time += duration
+
+def _timed_cursor_class(factory):
+    class TimedCursor(factory):
+        def execute(self, query, vars=None):
+            started = time.perf_counter()
+            try:
+                return super().execute(query, vars)
+            finally:
+                record_query(time.perf_counter() - started)
+
+        def executemany(self, query, vars_list):
+            started = time.perf_counter()
+            try:
+                return super().executemany(query, vars_list)
+            finally:
+                record_query(time.perf_counter() - started)
+
+        def copy_expert(self, sql, file, size=8192):
+            started = time.perf_counter()
+            try:
+                return super().copy_expert(sql, file, size)
+            finally:
+                record_query(time.perf_counter() - started)
+
+    TimedCursor.__name__ = f'Timed{factory.__name__}'
+    return TimedCursor
+
+class InstrumentedConnection(base_connection):
+    '''
+    Connection whose cursors report each statement to record_query()
+    '''
+    _cursor_classes = {}
+    _cursor_classes_lock = threading.Lock()
+
+    def cursor(self, *args, **kwargs):
+        factory = (kwargs.pop('cursor_factory', None) or self.cursor_factory
+                   or cursor)
+        with self._cursor_classes_lock:
+            if factory not in self._cursor_classes:
+                self._cursor_classes[factory] = _timed_cursor_class(factory)
+            timed_factory = self._cursor_classes[factory]
+        return super().cursor(*args, cursor_factory=timed_factory, **kwargs)
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0
+        self.count = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+        self.total += value
+        self.count += 1
+
+class EndpointHistograms:
+    '''
+    Per-endpoint histograms of request duration, database time, query
+    count and render time, rendered in the Prometheus text format.
+    Each worker process keeps (and exposes) its own.
+    '''
+    METRICS = (
+        ('job_board_request_duration_seconds', 'elapsed', SECONDS_BUCKETS,
+         "Time to serve a request"),
+        ('job_board_request_db_seconds', 'db_time', SECONDS_BUCKETS,
+         "Time spent executing SQL per request"),
+        ('job_board_request_queries', 'queries', QUERY_BUCKETS,
+         "SQL statements executed per request"),
+        ('job_board_request_render_seconds', 'render_time', SECONDS_BUCKETS,
+         "Time spent rendering templates per request"),
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {} # (metric name, endpoint) -> _Histogram
+
+    def observe(self, endpoint, metrics):
+        with self._lock:
+            for name, attribute, buckets, _ in self.METRICS:
+                key = (name, endpoint)
+                if key not in self._histograms:
+                    self._histograms[key] = _Histogram(buckets)
+                self._histograms[key].observe(getattr(metrics, attribute))
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for name, _, _, description in self.METRICS:
+                _render_header(lines, name, description)
+                for (metric, endpoint), histogram in sorted(
+                        self._histograms.items()):
+                    if metric == name:
+                        _render_histogram(lines, name, 'endpoint', endpoint,
+                                          histogram)
+
+        return '\n'.join(lines) + '\n'
+
+class LatencyHistograms:
+    '''
+    One Prometheus histogram of durations in seconds, labelled by
+    operation, plus a counter of rejected operations
+    '''
+    def __init__(self, name, description, buckets=SECONDS_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._histograms = {} # operation -> _Histogram
+        self._rejected = {}   # operation -> count
+
+    def observe(self, operation, seconds):
+        with self._lock:
+            if operation not in self._histograms:
+                self._histograms[operation] = _Histogram(self.buckets)
+            self._histograms[operation].observe(seconds)
+
+    def reject(self, operation):
+        with self._lock:
+            self._rejected[operation] = self._rejected.get(operation, 0) + 1
+
+    def render(self):
+        lines = []
+        with self._lock:
+            _render_header(lines, self.name, self.description)
+            for operation, histogram in sorted(self._histograms.items()):
+                _render_histogram(lines, self.name, 'operation', operation,
+                                  histogram)
+
+            rejected = f'{self.name.removesuffix("_seconds")}_rejected_total'
+            lines.append(f'# HELP {rejected} Operations refused because '
+                         'the pool was saturated')
+            lines.append(f'# TYPE {rejected} counter')
+            for operation, count in sorted(self._rejected.items()):
+                lines.append(f'{rejected}{{operation="'
+                             f'{_escape_label(operation)}"}} {count}')
+
+        return '\n'.join(lines) + '\n'
+
+def _render_header(lines, name, description):
+    lines.append(f'# HELP {name} {description}')
+    lines.append(f'# TYPE {name} histogram')
+
+def _render_histogram(lines, name, label_name, label_value, histogram):
+    label = f'{label_name}="{_escape_label(label_value)}"'
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        lines.append(f'{name}_bucket{{{label},le="{bound}"}} {count}')
+    lines.append(f'{name}_bucket{{{label},le="+Inf"}} {histogram.count}')
+    lines.append(f'{name}_sum{{{label}}} {histogram.total}')
+    lines.append(f'{name}_count{{{label}}} {histogram.count}')
+
+def _escape_label(value):
+    return (value.replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
@@ -0,0 +1,137 @@
+'''
+Cross-worker cache invalidation over Postgres LISTEN/NOTIFY.
+
+DatabasePersistence write methods send a notification on CHANNEL inside
+their transaction, so it is only delivered once the write commits.  Each
+worker runs one InvalidationListener thread that receives notifications
+from the other workers and republishes them to the local storage
+subscribers, which evict whatever they cached for that key.
+'''
+import json
+import os
+import select
+import socket
+import threading
+
+import logging
+import psycopg2
+
+from job_board.connection_pool import connection_kwargs
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'job_board_invalidation'
+
+def origin_id():
+    '''
+    Identifies the sending worker so listeners can skip their own
+    notifications (already applied locally after commit)
+    '''
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+def notification(topic, key=None):
+    '''
+    pg_notify() arguments, for writes that notify within their own statement
+    '''
+    payload = json.dumps({'origin': origin_id(), 'topic': topic, 'key': key})
+    return CHANNEL, payload
+
+def notify(cursor, topic, key=None):
+    cursor.execute("SELECT pg_notify(%s, %s)", notification(topic, key))
+
+class InvalidationListener:
+    '''
+    Background thread holding a dedicated autocommit connection that
+    LISTENs on CHANNEL.  Whenever it (re)connects, every topic is flushed
+    locally because notifications sent while disconnected are lost.
+    '''
+    def __init__(self, storage, poll_interval=5.0, reconnect_delay=5.0):
+        self._storage = storage
+        self.poll_interval = poll_interval
+        self.reconnect_delay = reconnect_delay
+        self._thread = None
+        self._pid = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        if hasattr(os, 'register_at_fork'):
+            # a lock held while forking would stay held in the child
+            os.register_at_fork(after_in_child=self._reset_lock)
+
+    def _reset_lock(self):
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        '''
+        Safe to call on every request: starts the thread once per process,
+        including in workers forked after the parent started one
+        '''
+        if self._running():
+            return
+
+        with self._lock: # concurrent first requests must start only one
+            if self._running():
+                return
+
+            self._pid = os.getpid()
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run,
+                                            name='cache-invalidation',
+                                            daemon=True)
+            self._thread.start()
+
+    def _running(self):
+        return (self._thread is not None and self._pid == os.getpid()
+                and self._thread.is_alive())
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                connection = psycopg2.connect(**connection_kwargs())
+            except psycopg2.Error:
+                logger.exception("Cache invalidation listener could not "
+                                 "connect, retrying")
+                self._stopping.wait(self.reconnect_delay)
+                continue
+
+            try:
+                connection.autocommit = True
+                with connection.cursor() as cursor:
+                    cursor.execute(f"LISTEN {CHANNEL}")
+                logger.info("Listening for cache invalidations on %s",
+                            CHANNEL)
+                self._storage.publish_all()
+                self._listen(connection)
+            except (psycopg2.Error, OSError):
+                logger.exception("Cache invalidation listener lost its "
+                                 "connection, reconnecting")
+                self._stopping.wait(self.reconnect_delay)
+            finally:
+                connection.close()
+
+    def _listen(self, connection):
+        own_origin = origin_id()
+        while not self._stopping.is_set():
+            ready, _, _ = select.select([connection], [], [],
+                                        self.poll_interval)
+            if not ready:
+                continue
+
+            connection.poll()
+            while connection.notifies:
+                notification = connection.notifies.pop(0)
+                try:
+                    message = json.loads(notification.payload)
+                except ValueError:
+                    logger.warning("Ignoring malformed invalidation: %s",
+                                   notification.payload)
+                    continue
+
+                if message.get('origin') == own_origin:
+                    continue
+
+                self._storage.publish(message['topic'], message.get('key'))
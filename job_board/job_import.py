@@ -0,0 +1,185 @@
+'''
+Bulk job import from CSV, JSON lines or YAML files.
+
+Rows are read from the file one at a time, validated, and have their
+department and employment type names resolved to ids.  They are handed
+to DatabasePersistence.import_jobs() in batches.  That method COPYs each
+batch into a staging table and inserts everything with one set-based
+statement at the end.  Nothing is imported unless every row is valid.
+
+Each row has the fields of the post job form.  Departments and employment
+types are given by name, case-insensitively:
+
+    title,location,department,employment_type,role_overview,...
+'''
+import csv
+import io
+import json
+import os
+from datetime import date
+
+try:
+    import yaml
+except ImportError: # only needed for YAML files
+    yaml = None
+
+FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl',
+           '.yml': 'yaml', '.yaml': 'yaml'}
+DEFAULT_BATCH_SIZE = 5_000  # rows per COPY
+MAX_REPORTED_ERRORS = 20
+
+# field -> (maximum length from the jobs table, required)
+TEXT_FIELDS = {
+    'title': (100, True),
+    'location': (100, True),
+    'role_overview': (1000, True),
+    'responsibilities': (600, True),
+    'requirements': (600, True),
+    'nice_to_haves': (600, False),
+    'benefits': (600, False),
+    'pay_range': (None, False),
+}
+
+class InvalidImport(ValueError):
+    '''
+    The file can't be imported; `errors` says why, row by row
+    '''
+    def __init__(self, errors):
+        super().__init__('; '.join(errors))
+        self.errors = errors
+
+def detect_format(filename):
+    '''
+    'csv', 'jsonl' or 'yaml' from filename's extension, None if unknown
+    '''
+    return FORMATS.get(os.path.splitext(filename or '')[1].lower())
+
+def import_jobs(storage, taxonomy, company_id, stream, file_format,
+                batch_size=DEFAULT_BATCH_SIZE):
+    '''
+    Import every job in the binary stream for company_id and return how
+    many there were.  Raises InvalidImport, having imported nothing, if
+    any row is invalid.
+    '''
+    departments = {department.name.casefold(): department.id
+                   for department in taxonomy.departments}
+    employment_types = {employment_type.type.casefold(): employment_type.id
+                        for employment_type in taxonomy.employment_types}
+    rows = read_rows(stream, file_format)
+    count = storage.import_jobs(company_id, _batches(
+        rows, departments, employment_types, batch_size))
+    if not count:
+        raise InvalidImport(["The file has no job postings."])
+    return count
+
+def read_rows(stream, file_format):
+    '''
+    (row number, mapping) for each row of the binary stream
+    '''
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    try:
+        if file_format == 'csv':
+            yield from enumerate(csv.DictReader(text), start=1)
+        elif file_format == 'jsonl':
+            yield from _read_json_lines(text)
+        elif file_format == 'yaml':
+            yield from _read_yaml(text)
+        else:
+            raise InvalidImport(["Please upload a .csv, .jsonl or .yaml "
+                                 "file."])
+    except (UnicodeDecodeError, csv.Error) as error:
+        raise InvalidImport([f"The file could not be read: {error}"])
+    finally:
+        text.detach() # leave the caller's stream open
+
+def _read_json_lines(text):
+    number = 0
+    for line in text:
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            yield number, json.loads(line)
+        except ValueError:
+            yield number, None
+
+def _read_yaml(text):
+    '''
+    Each document is one job, or a list of jobs
+    '''
+    if yaml is None:
+        raise InvalidImport(["YAML files can't be imported on this server "
+                             "(PyYAML is not installed)."])
+    number = 0
+    try:
+        for document in yaml.safe_load_all(text):
+            for row in (document if isinstance(document, list)
+                        else [document]):
+                number += 1
+                yield number, row
+    except yaml.YAMLError as error:
+        raise InvalidImport([f"The file is not valid YAML: {error}"])
+
+def _batches(rows, departments, employment_types, batch_size):
+    batch = []
+    errors = []
+    for number, row in rows:
+        job, row_errors = validate_row(row, departments, employment_types)
+        errors.extend(f"Row {number}: {error}" for error in row_errors)
+        if len(errors) >= MAX_REPORTED_ERRORS:
+            raise InvalidImport(errors[:MAX_REPORTED_ERRORS])
+
+        if job is not None and not errors:
+            batch.append(job)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+
+    if errors:
+        raise InvalidImport(errors)
+    if batch:
+        yield batch
+
+def validate_row(row, departments, employment_types):
+    '''
+    (job, errors): job is a dict of jobs columns plus employment_type_id
+    and department_id, or None if errors lists any problem
+    '''
+    if not isinstance(row, dict):
+        return None, ["not a set of job fields"]
+
+    job = {}
+    errors = []
+    for field, (max_length, required) in TEXT_FIELDS.items():
+        value = row.get(field)
+        value = '' if value is None else str(value).strip()
+        if required and not value:
+            errors.append(f"{field} is required")
+        elif max_length and len(value) > max_length:
+            errors.append(f"{field} is longer than {max_length} characters")
+        job[field] = value if value or field == 'nice_to_haves' else None
+
+    job['closing_date'], error = _parse_date(row.get('closing_date'))
+    if error:
+        errors.append(error)
+
+    for field, names in (('department', departments),
+                         ('employment_type', employment_types)):
+        name = str(row.get(field) or '').strip()
+        job[f'{field}_id'] = names.get(name.casefold())
+        if not name:
+            errors.append(f"{field} is required")
+        elif job[f'{field}_id'] is None:
+            errors.append(f"unknown {field.replace('_', ' ')} '{name}'")
+
+    return (None if errors else job), errors
+
+def _parse_date(value):
+    if value is None or value == '':
+        return None, None
+    if isinstance(value, date):
+        return value, None
+    try:
+        return date.fromisoformat(str(value).strip()), None
+    except ValueError:
+        return None, f"closing_date '{value}' is not a YYYY-MM-DD date"
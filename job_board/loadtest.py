@@ -0,0 +1,252 @@
+'''
+HTTP load test of a running job board.
+
+A fixed number of worker threads, each with its own cookie jar, send
+requests for `duration` seconds.  Each request is a scenario picked by
+weight:
+
+    companies       GET /companies
+    company_jobs    GET /companies/<id>/jobs, for a random company
+    signin          POST /signin
+    post_job        POST /post_job/<id>/jobs/post, signed in
+
+The report has the throughput and the p50, p95 and p99 latencies of
+every scenario.  It can be saved as JSON and compared with a saved
+baseline.  Sign-in and job posting need the credentials of an existing
+company, such as one made by job_board.synthetic.
+'''
+import http.cookiejar
+import json
+import math
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+DEFAULT_WEIGHTS = {'companies': 2, 'company_jobs': 6, 'signin': 1,
+                   'post_job': 1}
+DEFAULT_THRESHOLD = 0.10    # relative change reported as a regression
+TIMEOUT = 30                # seconds per request
+
+class LoadTestError(Exception):
+    pass
+
+def percentile(sorted_values, fraction):
+    '''
+    Nearest-rank percentile of an ascending list
+    '''
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+class Client:
+    '''
+    One worker's session: cookies, and what it learned about the site
+    '''
+    def __init__(self, base_url, email=None, password=None):
+        self.base_url = base_url.rstrip('/')
+        self.email = email
+        self.password = password
+        self.company_id = None
+        self._opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def request(self, path, data=None):
+        '''
+        (status, body) of a GET, or of a form POST when data is given
+        '''
+        body = None if data is None else urllib.parse.urlencode(
+            data).encode('utf-8')
+        try:
+            with self._opener.open(self.base_url + path, body,
+                                   timeout=TIMEOUT) as response:
+                return response.status, response.read().decode('utf-8')
+        except urllib.error.HTTPError as error:
+            return error.code, error.read().decode('utf-8', 'replace')
+
+    def sign_in(self):
+        status, body = self.request('/signin', {'email': self.email,
+                                                'password': self.password})
+        found = re.search(r'/companies/(\d+)/dashboard', body)
+        if found:
+            self.company_id = int(found.group(1))
+        return status
+
+class LoadTest:
+    def __init__(self, base_url, concurrency=8, duration=30.0,
+                 weights=None, email=None, password=None, seed=None):
+        self.base_url = base_url
+        self.concurrency = concurrency
+        self.duration = duration
+        self.weights = dict(weights or DEFAULT_WEIGHTS)
+        self.email = email
+        self.password = password
+        self.seed = seed
+        self.company_ids = []
+        self.taxonomy = None
+        self._lock = threading.Lock()
+        self._latencies = {scenario: [] for scenario in self.weights}
+        self._errors = {scenario: 0 for scenario in self.weights}
+
+        if not email and ({'signin', 'post_job'} & {
+                scenario for scenario, weight in self.weights.items()
+                if weight}):
+            raise LoadTestError("Sign-in and job posting need --email and "
+                                "--password.")
+
+    def prepare(self):
+        '''
+        Find company ids, and the taxonomy ids for posting jobs
+        '''
+        client = Client(self.base_url, self.email, self.password)
+        status, body = client.request('/companies')
+        if status != 200:
+            raise LoadTestError(f"GET /companies answered {status}")
+        self.company_ids = sorted({int(company_id) for company_id in
+                                   re.findall(r'/companies/(\d+)"', body)})
+        if not self.company_ids:
+            raise LoadTestError("No companies to request; generate some "
+                                "with 'flask generate-data'.")
+
+        if self.weights.get('post_job'):
+            client.sign_in()
+            if client.company_id is None:
+                raise LoadTestError(f"Could not sign in as {self.email}.")
+            status, body = client.request('/post_job')
+            employment_types = re.findall(
+                r'<option value="(\d+)"', body.split('id="department"')[0])
+            departments = re.findall(
+                r'<option value="(\d+)"', body.split('id="department"')[1])
+            self.taxonomy = (employment_types, departments)
+
+    def run(self):
+        self.prepare()
+        deadline = time.perf_counter() + self.duration
+        started = time.perf_counter()
+        threads = [threading.Thread(target=self._work,
+                                    args=(deadline, index), daemon=True)
+                   for index in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return self.report(time.perf_counter() - started)
+
+    def _work(self, deadline, index):
+        rng = random.Random(None if self.seed is None else self.seed + index)
+        client = Client(self.base_url, self.email, self.password)
+        scenarios = [scenario for scenario in self.weights
+                     if self.weights[scenario]]
+        weights = [self.weights[scenario] for scenario in scenarios]
+
+        while time.perf_counter() < deadline:
+            scenario = rng.choices(scenarios, weights)[0]
+            started = time.perf_counter()
+            try:
+                ok = getattr(self, f'_{scenario}')(client, rng)
+            except OSError:
+                ok = False
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._latencies[scenario].append(elapsed)
+                if not ok:
+                    self._errors[scenario] += 1
+
+    def _companies(self, client, rng):
+        return client.request('/companies')[0] == 200
+
+    def _company_jobs(self, client, rng):
+        company_id = rng.choice(self.company_ids)
+        return client.request(f'/companies/{company_id}/jobs')[0] == 200
+
+    def _signin(self, client, rng):
+        return client.sign_in() == 200 and client.company_id is not None
+
+    def _post_job(self, client, rng):
+        if client.company_id is None:
+            client.sign_in() # not timed separately: part of this request
+        employment_types, departments = self.taxonomy
+        status, _ = client.request(
+            f'/post_job/{client.company_id}/jobs/post', {
+                'title': 'Load Test Job', 'location': 'Remote',
+                'employment_type': rng.choice(employment_types),
+                'department': rng.choice(departments),
+                'role_overview': 'Posted by the load test.',
+                'responsibilities': 'None', 'requirements': 'None',
+                'nice_to_haves': '', 'benefits': '', 'pay_range': '',
+                'closing_date': ''})
+        return status == 200
+
+    def report(self, elapsed):
+        '''
+        Per-scenario results, plus a 'total' entry; latencies in ms
+        '''
+        results = {}
+        everything = []
+        with self._lock:
+            for scenario, latencies in self._latencies.items():
+                everything.extend(latencies)
+                results[scenario] = _summary(latencies,
+                                             self._errors[scenario], elapsed)
+            results['total'] = _summary(everything,
+                                        sum(self._errors.values()), elapsed)
+
+        return {'concurrency': self.concurrency,
+                'duration': round(elapsed, 2),
+                'scenarios': results}
+
+def _summary(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    summary = {'requests': len(latencies), 'errors': errors,
+               'throughput': round(len(latencies) / elapsed, 2)}
+    for name, fraction in (('p50', 0.50), ('p95', 0.95), ('p99', 0.99)):
+        value = percentile(latencies, fraction)
+        summary[name] = None if value is None else round(value * 1000, 2)
+    return summary
+
+def format_report(report):
+    lines = [f"{report['concurrency']} workers for {report['duration']}s",
+             f"{'scenario':<14}{'requests':>9}{'errors':>8}{'req/s':>9}"
+             f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"]
+    for scenario, summary in report['scenarios'].items():
+        lines.append(
+            f"{scenario:<14}{summary['requests']:>9}{summary['errors']:>8}"
+            f"{summary['throughput']:>9}"
+            + ''.join(f"{'-' if summary[name] is None else summary[name]:>9}"
+                      for name in ('p50', 'p95', 'p99')))
+    return '\n'.join(lines)
+
+def compare(report, baseline, threshold=DEFAULT_THRESHOLD):
+    '''
+    Lines describing every scenario whose throughput dropped, or whose
+    p50/p95/p99 rose, by more than threshold (a fraction) since baseline
+    '''
+    regressions = []
+    for scenario, summary in report['scenarios'].items():
+        before = baseline['scenarios'].get(scenario)
+        if not before:
+            continue
+        for name, worse in (('throughput', lambda new, old: new < old),
+                            ('p50', lambda new, old: new > old),
+                            ('p95', lambda new, old: new > old),
+                            ('p99', lambda new, old: new > old)):
+            new, old = summary[name], before[name]
+            if not new or not old:
+                continue
+            change = (new - old) / old
+            if worse(new, old) and abs(change) > threshold:
+                regressions.append(f"{scenario} {name}: {old} -> {new} "
+                                   f"({change:+.0%})")
+    return regressions
+
+def save(report, path):
+    with open(path, 'w') as file:
+        json.dump(report, file, indent=2)
+
+def load(path):
+    with open(path) as file:
+        return json.load(file)
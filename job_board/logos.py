@@ -0,0 +1,119 @@
+'''
+Company logo upload pipeline.
+
+Uploads are decoded and validated, then written as small square WebP and
+PNG variants whose names embed a hash of the upload:
+
+    <company id>-<content hash>-<size>.<webp|png>
+
+The companies row stores "<company id>-<content hash>" as its logo, so a
+logo URL changes whenever the image does and can be cached forever.
+Logos uploaded before this pipeline are still served as-is.
+'''
+import hashlib
+import os
+import re
+import tempfile
+from io import BytesIO
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+MAX_UPLOAD_BYTES = 5 * 1024 * 1024
+MAX_PIXELS = 25_000_000     # refuse decompression bombs outright
+ACCEPTED_FORMATS = {'PNG', 'JPEG', 'WEBP'}
+SIZES = (125, 250)          # displayed size, and for 2x screens
+FORMATS = {'webp': ('WEBP', {'quality': 85, 'method': 6}),
+           'png': ('PNG', {'optimize': True})}
+
+LOGO_KEY = re.compile(r'^\d+-[0-9a-f]{16}$')
+VARIANT_NAME = re.compile(r'^\d+-[0-9a-f]{16}-\d+\.(webp|png)$')
+
+class InvalidLogo(ValueError):
+    pass
+
+def is_processed(logo):
+    '''
+    Whether a companies.logo value names pipeline variants
+    '''
+    return bool(logo and LOGO_KEY.match(logo))
+
+def variant_name(logo, size, extension):
+    return f'{logo}-{size}.{extension}'
+
+def process_logo(stream, logos_dir, company_id):
+    '''
+    Validate the uploaded image in stream, write its variants to
+    logos_dir and return the logo key to store for the company
+    '''
+    data = stream.read(MAX_UPLOAD_BYTES + 1)
+    if len(data) > MAX_UPLOAD_BYTES:
+        raise InvalidLogo("Logos must be smaller than "
+                          f"{MAX_UPLOAD_BYTES // (1024 * 1024)} MB.")
+
+    image = _decode(data)
+    logo = f'{company_id}-{hashlib.sha256(data).hexdigest()[:16]}'
+
+    for size in SIZES:
+        variant = _square(image, size)
+        for extension, (image_format, options) in FORMATS.items():
+            buffer = BytesIO()
+            variant.save(buffer, image_format, **options)
+            _write_atomically(os.path.join(
+                logos_dir, variant_name(logo, size, extension)),
+                buffer.getvalue())
+
+    return logo
+
+def remove_other_variants(logos_dir, company_id, keep):
+    '''
+    Delete a company's variants other than those of the logo `keep`
+    '''
+    prefix = f'{company_id}-'
+    for filename in os.listdir(logos_dir):
+        if (filename.startswith(prefix) and VARIANT_NAME.match(filename)
+                and not filename.startswith(f'{keep}-')):
+            try:
+                os.remove(os.path.join(logos_dir, filename))
+            except FileNotFoundError:
+                pass
+
+def _decode(data):
+    try:
+        with Image.open(BytesIO(data)) as probe:
+            image_format = probe.format
+            width, height = probe.size
+            probe.verify()
+    except (UnidentifiedImageError, OSError, SyntaxError,
+            Image.DecompressionBombError):
+        raise InvalidLogo("Please upload a PNG, JPEG or WebP image.")
+
+    if image_format not in ACCEPTED_FORMATS:
+        raise InvalidLogo("Please upload a PNG, JPEG or WebP image.")
+    if width * height > MAX_PIXELS:
+        raise InvalidLogo("That image is too large.")
+
+    # verify() leaves the image unusable, so decode it again
+    image = Image.open(BytesIO(data))
+    image = ImageOps.exif_transpose(image)
+    return image.convert('RGBA')
+
+def _square(image, size):
+    '''
+    image scaled to fit a transparent size x size square, centred
+    '''
+    fitted = ImageOps.contain(image, (size, size), Image.Resampling.LANCZOS)
+    canvas = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+    canvas.paste(fitted, ((size - fitted.width) // 2,
+                          (size - fitted.height) // 2))
+    return canvas
+
+def _write_atomically(path, content):
+    directory = os.path.dirname(path)
+    descriptor, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            file.write(content)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
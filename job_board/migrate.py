@@ -0,0 +1,154 @@
+'''
+Versioned schema migrations.
+
+Migrations are the numbered .sql files in job_board/migrations, applied
+in order, each in its own transaction, and recorded in schema_version.
+Run them once per deploy, before the app starts serving requests:
+
+    python -m job_board.migrate
+    flask --app app migrate
+'''
+import argparse
+import os
+import re
+from contextlib import closing
+
+import logging
+import psycopg2
+
+from job_board.connection_pool import connection_kwargs
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), 'migrations')
+MIGRATION_FILENAME = re.compile(r'^(\d+)_(\w+)\.sql$')
+ADVISORY_LOCK_KEY = 724_311_001 # any constant shared by every runner
+
+# Databases created before schema_version existed already contain
+# everything up to this version (tables from the old per-request setup
+# or from schema.sql, plus its seed data)
+LEGACY_BASELINE_VERSION = 2
+
+def available_migrations():
+    '''
+    List of (version, name, path) sorted by version
+    '''
+    migrations = []
+    for filename in os.listdir(MIGRATIONS_DIR):
+        match = MIGRATION_FILENAME.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2),
+                               os.path.join(MIGRATIONS_DIR, filename)))
+
+    migrations.sort()
+    versions = [version for version, _, _ in migrations]
+    if len(versions) != len(set(versions)):
+        raise ValueError("Duplicate migration version in "
+                         f"{MIGRATIONS_DIR}")
+
+    return migrations
+
+def applied_versions(cursor):
+    cursor.execute("SELECT version FROM schema_version")
+    return {row[0] for row in cursor.fetchall()}
+
+def _ensure_version_table(cursor, migrations):
+    cursor.execute("SELECT to_regclass('public.schema_version')")
+    if cursor.fetchone()[0] is not None:
+        return
+
+    cursor.execute("""
+        CREATE TABLE schema_version (
+            version int PRIMARY KEY,
+            "name" text NOT NULL,
+            applied_at timestamp NOT NULL DEFAULT NOW()
+        )
+    """)
+
+    cursor.execute("SELECT to_regclass('public.companies')")
+    if cursor.fetchone()[0] is not None:
+        logger.info("Existing schema found, recording migrations up to "
+                    "version %d as applied", LEGACY_BASELINE_VERSION)
+        for version, name, _ in migrations:
+            if version <= LEGACY_BASELINE_VERSION:
+                cursor.execute("""
+                    INSERT INTO schema_version (version, "name")
+                    VALUES (%s, %s)
+                """, (version, name))
+
+def run_migrations(connection=None):
+    '''
+    Apply pending migrations and return the versions applied.
+    An advisory lock keeps concurrent runners from racing each other.
+    '''
+    if connection is None:
+        with closing(psycopg2.connect(**connection_kwargs())) as connection:
+            return run_migrations(connection)
+
+    migrations = available_migrations()
+    applied = []
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_lock(%s)", (ADVISORY_LOCK_KEY,))
+        connection.commit()
+        try:
+            with connection:
+                _ensure_version_table(cursor, migrations)
+                done = applied_versions(cursor)
+
+            for version, name, path in migrations:
+                if version in done:
+                    continue
+
+                logger.info("Applying migration %04d_%s", version, name)
+                with open(path, encoding='utf-8') as file:
+                    sql = file.read()
+
+                with connection:
+                    cursor.execute(sql)
+                    cursor.execute("""
+                        INSERT INTO schema_version (version, "name")
+                        VALUES (%s, %s)
+                    """, (version, name))
+
+                applied.append(version)
+        finally:
+            cursor.execute("SELECT pg_advisory_unlock(%s)",
+                           (ADVISORY_LOCK_KEY,))
+            connection.commit()
+
+    return applied
+
+def pending_migrations(connection=None):
+    if connection is None:
+        with closing(psycopg2.connect(**connection_kwargs())) as connection:
+            return pending_migrations(connection)
+
+    with connection, connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass('public.schema_version')")
+        done = applied_versions(cursor) if cursor.fetchone()[0] else set()
+
+    return [(version, name) for version, name, _ in available_migrations()
+            if version not in done]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Apply job board schema migrations")
+    parser.add_argument('--list', action='store_true',
+                        help="only list pending migrations")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for version, name in pending_migrations():
+            print(f"{version:04d}_{name}")
+        return
+
+    applied = run_migrations()
+    if applied:
+        print("Applied migrations: "
+              + ", ".join(f"{version:04d}" for version in applied))
+    else:
+        print("Schema is up to date.")
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,4 @@
+-- Job pages are paginated on (posted_date, id), which needs a posted_date
+UPDATE jobs SET posted_date = NOW() WHERE posted_date IS NULL;
+
+ALTER TABLE jobs ALTER COLUMN posted_date SET NOT NULL;
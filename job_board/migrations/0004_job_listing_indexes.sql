@@ -0,0 +1,12 @@
+-- Company job pages filter on company_id and walk (posted_date, id)
+-- newest first; this also covers the jobs.company_id foreign key.
+CREATE INDEX IF NOT EXISTS jobs_company_id_posted_date_id_idx
+    ON jobs (company_id, posted_date DESC, id DESC);
+
+-- The UNIQUE constraints on the junction tables lead with the taxonomy
+-- column, so joining from jobs needs its own job_id index.
+CREATE INDEX IF NOT EXISTS employment_types_jobs_job_id_idx
+    ON employment_types_jobs (job_id);
+
+CREATE INDEX IF NOT EXISTS departments_jobs_job_id_idx
+    ON departments_jobs (job_id);
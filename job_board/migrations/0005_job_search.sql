@@ -0,0 +1,12 @@
+-- Full-text search over job postings, weighted title > overview >
+-- responsibilities/requirements.  Adding a stored generated column
+-- rewrites jobs, so run this outside peak traffic on large tables.
+ALTER TABLE jobs ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english'::regconfig, title), 'A') ||
+        setweight(to_tsvector('english'::regconfig, role_overview), 'B') ||
+        setweight(to_tsvector('english'::regconfig, responsibilities), 'C') ||
+        setweight(to_tsvector('english'::regconfig, requirements), 'C')
+    ) STORED;
+
+CREATE INDEX jobs_search_vector_idx ON jobs USING GIN (search_vector);
@@ -0,0 +1,17 @@
+-- Trigram indexes for fuzzy autocomplete.  pg_trgm ships with the
+-- standard contrib package; where it is not installed the app falls
+-- back to prefix suggestions only.
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_available_extensions
+               WHERE "name" = 'pg_trgm') THEN
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+        EXECUTE 'CREATE INDEX IF NOT EXISTS companies_name_trgm_idx
+                 ON companies USING GIN ("name" gin_trgm_ops)';
+        EXECUTE 'CREATE INDEX IF NOT EXISTS jobs_title_trgm_idx
+                 ON jobs USING GIN (title gin_trgm_ops)';
+        EXECUTE 'CREATE INDEX IF NOT EXISTS jobs_location_trgm_idx
+                 ON jobs USING GIN ("location" gin_trgm_ops)';
+    END IF;
+END
+$$;
@@ -0,0 +1,107 @@
+-- The recent jobs feed walks every job newest first
+CREATE INDEX IF NOT EXISTS jobs_posted_date_id_idx
+    ON jobs (posted_date DESC, id DESC);
+
+-- Jobs per department and per employment type, kept current by
+-- statement-level triggers on the junction tables so the browse menu
+-- never needs a GROUP BY over jobs
+CREATE TABLE department_job_counts (
+    department_id int PRIMARY KEY
+        REFERENCES departments (id)
+        ON DELETE CASCADE,
+    job_count int NOT NULL DEFAULT 0
+);
+
+CREATE TABLE employment_type_job_counts (
+    employment_type_id int PRIMARY KEY
+        REFERENCES employment_types (id)
+        ON DELETE CASCADE,
+    job_count int NOT NULL DEFAULT 0
+);
+
+INSERT INTO department_job_counts (department_id, job_count)
+SELECT department_id, COUNT(*) FROM departments_jobs GROUP BY department_id;
+
+INSERT INTO employment_type_job_counts (employment_type_id, job_count)
+SELECT employment_type_id, COUNT(*) FROM employment_types_jobs
+GROUP BY employment_type_id;
+
+CREATE FUNCTION count_department_jobs() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        UPDATE department_job_counts AS counts
+        SET job_count = counts.job_count - removed.n
+        FROM (SELECT department_id, COUNT(*) AS n FROM old_rows
+              GROUP BY department_id) AS removed
+        WHERE counts.department_id = removed.department_id;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO department_job_counts (department_id, job_count)
+        SELECT department_id, COUNT(*) FROM new_rows
+        GROUP BY department_id
+        ORDER BY department_id -- consistent lock order between writers
+        ON CONFLICT (department_id) DO UPDATE
+        SET job_count = department_job_counts.job_count
+                        + EXCLUDED.job_count;
+    END IF;
+
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION count_employment_type_jobs() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        UPDATE employment_type_job_counts AS counts
+        SET job_count = counts.job_count - removed.n
+        FROM (SELECT employment_type_id, COUNT(*) AS n FROM old_rows
+              GROUP BY employment_type_id) AS removed
+        WHERE counts.employment_type_id = removed.employment_type_id;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO employment_type_job_counts
+        (employment_type_id, job_count)
+        SELECT employment_type_id, COUNT(*) FROM new_rows
+        GROUP BY employment_type_id
+        ORDER BY employment_type_id
+        ON CONFLICT (employment_type_id) DO UPDATE
+        SET job_count = employment_type_job_counts.job_count
+                        + EXCLUDED.job_count;
+    END IF;
+
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+-- A trigger with transition tables can only handle one event
+CREATE TRIGGER departments_jobs_counted_insert
+    AFTER INSERT ON departments_jobs
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION count_department_jobs();
+
+CREATE TRIGGER departments_jobs_counted_update
+    AFTER UPDATE ON departments_jobs
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION count_department_jobs();
+
+CREATE TRIGGER departments_jobs_counted_delete
+    AFTER DELETE ON departments_jobs
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION count_department_jobs();
+
+CREATE TRIGGER employment_types_jobs_counted_insert
+    AFTER INSERT ON employment_types_jobs
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION count_employment_type_jobs();
+
+CREATE TRIGGER employment_types_jobs_counted_update
+    AFTER UPDATE ON employment_types_jobs
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION count_employment_type_jobs();
+
+CREATE TRIGGER employment_types_jobs_counted_delete
+    AFTER DELETE ON employment_types_jobs
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION count_employment_type_jobs();
@@ -0,0 +1,5 @@
+-- Sessions store a company's id and session_version.  Incrementing the
+-- version signs that company out everywhere:
+--   UPDATE companies SET session_version = session_version + 1 WHERE id = ...
+ALTER TABLE companies
+    ADD COLUMN session_version integer NOT NULL DEFAULT 1;
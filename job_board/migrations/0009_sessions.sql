@@ -0,0 +1,9 @@
+-- Server-side session store (SESSION_BACKEND=server)
+CREATE TABLE sessions (
+    id text PRIMARY KEY,
+    "data" text NOT NULL,
+    expires_at timestamp NOT NULL
+);
+
+-- expired sessions are deleted in batches, oldest first
+CREATE INDEX sessions_expires_at_idx ON sessions (expires_at);
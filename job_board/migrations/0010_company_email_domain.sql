@@ -0,0 +1,35 @@
+-- One account per email domain, checked with an index lookup at signup
+-- and enforced at commit time.  The domain is everything after the last
+-- "@", lower-cased (matching email.rpartition('@') in the app).
+ALTER TABLE companies
+    ADD COLUMN email_domain text
+    GENERATED ALWAYS AS (lower(substring(email FROM '@([^@]*)$'))) STORED;
+
+-- Databases from before this migration may already hold companies that
+-- share a domain (e.g. differing only in case).  Which account to keep
+-- is a decision for a person, so stop with the list rather than fail on
+-- the index or merge companies automatically.
+DO $$
+DECLARE
+    duplicates text;
+BEGIN
+    SELECT string_agg(format('%s (company ids %s)', email_domain, ids),
+                      '; ' ORDER BY email_domain)
+    INTO duplicates
+    FROM (
+        SELECT email_domain, string_agg(id::text, ', ' ORDER BY id) AS ids
+        FROM companies
+        WHERE email_domain IS NOT NULL
+        GROUP BY email_domain
+        HAVING count(*) > 1
+    ) shared;
+
+    IF duplicates IS NOT NULL THEN
+        RAISE EXCEPTION 'Companies share an email domain: %', duplicates
+            USING HINT = 'Change the email of, or merge, all but one '
+                         'company per domain, then migrate again.';
+    END IF;
+END
+$$;
+
+CREATE UNIQUE INDEX companies_email_domain_key ON companies (email_domain);
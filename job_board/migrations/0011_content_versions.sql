@@ -0,0 +1,83 @@
+-- Version stamps behind the ETag and Last-Modified headers of public
+-- pages, bumped by statement-level triggers:
+--   'companies'      any company row changed
+--   'company:<id>'   that company's row changed
+--   'jobs'           any job or job assignment changed
+--   'taxonomy'       departments or employment types changed
+CREATE TABLE content_versions (
+    scope text PRIMARY KEY,
+    version bigint NOT NULL DEFAULT 1,
+    updated_at timestamptz NOT NULL DEFAULT NOW()
+);
+
+INSERT INTO content_versions (scope)
+VALUES ('companies'), ('jobs'), ('taxonomy');
+
+INSERT INTO content_versions (scope)
+SELECT 'company:' || id FROM companies;
+
+CREATE FUNCTION bump_content_versions(scopes text[]) RETURNS void AS $$
+    INSERT INTO content_versions (scope)
+    SELECT DISTINCT scope FROM unnest(scopes) AS scope
+    ORDER BY scope -- consistent lock order between writers
+    ON CONFLICT (scope) DO UPDATE
+    SET version = content_versions.version + 1, updated_at = NOW();
+$$ LANGUAGE sql;
+
+CREATE FUNCTION version_companies() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        PERFORM bump_content_versions(
+            ARRAY['companies'] || ARRAY(SELECT 'company:' || id
+                                        FROM old_rows));
+    ELSE
+        PERFORM bump_content_versions(
+            ARRAY['companies'] || ARRAY(SELECT 'company:' || id
+                                        FROM new_rows));
+    END IF;
+
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION version_scope() RETURNS trigger AS $$
+BEGIN
+    PERFORM bump_content_versions(ARRAY[TG_ARGV[0]]);
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER companies_versioned_insert
+    AFTER INSERT ON companies
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION version_companies();
+
+CREATE TRIGGER companies_versioned_update
+    AFTER UPDATE ON companies
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION version_companies();
+
+CREATE TRIGGER companies_versioned_delete
+    AFTER DELETE ON companies
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION version_companies();
+
+CREATE TRIGGER jobs_versioned
+    AFTER INSERT OR UPDATE OR DELETE ON jobs
+    FOR EACH STATEMENT EXECUTE FUNCTION version_scope('jobs');
+
+CREATE TRIGGER departments_jobs_versioned
+    AFTER INSERT OR UPDATE OR DELETE ON departments_jobs
+    FOR EACH STATEMENT EXECUTE FUNCTION version_scope('jobs');
+
+CREATE TRIGGER employment_types_jobs_versioned
+    AFTER INSERT OR UPDATE OR DELETE ON employment_types_jobs
+    FOR EACH STATEMENT EXECUTE FUNCTION version_scope('jobs');
+
+CREATE TRIGGER departments_versioned
+    AFTER INSERT OR UPDATE OR DELETE ON departments
+    FOR EACH STATEMENT EXECUTE FUNCTION version_scope('taxonomy');
+
+CREATE TRIGGER employment_types_versioned
+    AFTER INSERT OR UPDATE OR DELETE ON employment_types
+    FOR EACH STATEMENT EXECUTE FUNCTION version_scope('taxonomy');
@@ -0,0 +1,5 @@
+-- Incremented by every edit.  An edit only applies if the job is still at
+-- the version the editor loaded, so concurrent edits can't overwrite
+-- each other unnoticed.
+ALTER TABLE jobs
+    ADD COLUMN version integer NOT NULL DEFAULT 1;
@@ -0,0 +1,97 @@
+-- Job writes bump a version per company, 'company:<id>:jobs', instead of
+-- one site-wide 'jobs' row: that row's lock serialized every job write,
+-- and its stamp changed the ETag of every page whenever any company
+-- posted.  Junction rows are attributed through their job.
+DROP TRIGGER jobs_versioned ON jobs;
+DROP TRIGGER departments_jobs_versioned ON departments_jobs;
+DROP TRIGGER employment_types_jobs_versioned ON employment_types_jobs;
+
+CREATE FUNCTION version_company_jobs() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        PERFORM bump_content_versions(ARRAY(
+            SELECT DISTINCT 'company:' || company_id || ':jobs'
+            FROM old_rows));
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM bump_content_versions(ARRAY(
+            SELECT DISTINCT 'company:' || company_id || ':jobs'
+            FROM new_rows));
+    END IF;
+
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE FUNCTION version_company_job_assignments() RETURNS trigger AS $$
+BEGIN
+    -- jobs deleted with their assignments are versioned by their own
+    -- trigger, so only rows whose job remains need a company here
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        PERFORM bump_content_versions(ARRAY(
+            SELECT DISTINCT 'company:' || jobs.company_id || ':jobs'
+            FROM old_rows JOIN jobs ON jobs.id = old_rows.job_id));
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM bump_content_versions(ARRAY(
+            SELECT DISTINCT 'company:' || jobs.company_id || ':jobs'
+            FROM new_rows JOIN jobs ON jobs.id = new_rows.job_id));
+    END IF;
+
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+-- A trigger with transition tables can only handle one event
+CREATE TRIGGER jobs_versioned_insert
+    AFTER INSERT ON jobs
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION version_company_jobs();
+
+CREATE TRIGGER jobs_versioned_update
+    AFTER UPDATE ON jobs
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION version_company_jobs();
+
+CREATE TRIGGER jobs_versioned_delete
+    AFTER DELETE ON jobs
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION version_company_jobs();
+
+CREATE TRIGGER departments_jobs_versioned_insert
+    AFTER INSERT ON departments_jobs
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION version_company_job_assignments();
+
+CREATE TRIGGER departments_jobs_versioned_update
+    AFTER UPDATE ON departments_jobs
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION version_company_job_assignments();
+
+CREATE TRIGGER departments_jobs_versioned_delete
+    AFTER DELETE ON departments_jobs
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION version_company_job_assignments();
+
+CREATE TRIGGER employment_types_jobs_versioned_insert
+    AFTER INSERT ON employment_types_jobs
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION version_company_job_assignments();
+
+CREATE TRIGGER employment_types_jobs_versioned_update
+    AFTER UPDATE ON employment_types_jobs
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION version_company_job_assignments();
+
+CREATE TRIGGER employment_types_jobs_versioned_delete
+    AFTER DELETE ON employment_types_jobs
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION version_company_job_assignments();
+
+DELETE FROM content_versions WHERE scope = 'jobs';
+
+INSERT INTO content_versions (scope)
+SELECT DISTINCT 'company:' || company_id || ':jobs' FROM jobs
+ON CONFLICT (scope) DO NOTHING;
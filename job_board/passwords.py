@@ -0,0 +1,222 @@
+'''
+Password hashing and verification off the request thread.
+
+bcrypt is deliberately slow (~250 ms of CPU at cost 12), so running it
+in a request thread stalls every other request the worker is serving.
+PasswordHasher sends it to a small process pool instead and refuses new
+work once too much is already queued, so a burst of sign-ins fails fast
+rather than starving the rest of the site.
+
+The bcrypt cost is fixed through BCRYPT_ROUNDS, which is required in
+production so every worker and host agrees on it.  Pick it once per
+deploy with
+
+    python -m job_board.passwords
+
+which prints the cost that fits PASSWORD_HASH_BUDGET seconds per hash on
+this host.  Elsewhere the cost is calibrated on first use instead.
+Hashes with a lower cost are upgraded on sign-in; higher ones are kept.
+'''
+import argparse
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+
+import bcrypt
+import logging
+
+from job_board.instrumentation import LatencyHistograms
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 2
+DEFAULT_QUEUE_DEPTH = 8     # operations waiting beyond the busy workers
+DEFAULT_TIMEOUT = 10        # seconds to wait for a result
+DEFAULT_BUDGET = 0.25       # target seconds per hash when calibrating
+MIN_ROUNDS = 10             # never calibrate below this cost
+MAX_ROUNDS = 16
+CALIBRATION_ROUNDS = 8      # cost actually timed, then extrapolated
+
+class PasswordHasherBusy(Exception):
+    pass
+
+class PasswordCostNotSet(Exception):
+    pass
+
+# Run in the pool's processes, so they must be importable module functions
+def _hash(password, rounds):
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds)).decode('utf-8')
+
+def _check(password, hashed):
+    return bcrypt.checkpw(password, hashed)
+
+def _time_hash(rounds, samples=3):
+    fastest = None
+    for _ in range(samples):
+        started = time.perf_counter()
+        bcrypt.hashpw(b'calibration', bcrypt.gensalt(rounds))
+        elapsed = time.perf_counter() - started
+        fastest = elapsed if fastest is None else min(fastest, elapsed)
+    return fastest
+
+def choose_rounds(seconds, budget, measured_rounds=CALIBRATION_ROUNDS):
+    '''
+    Highest cost whose hash fits the budget, given that one hash at
+    measured_rounds took `seconds` (each extra round doubles the work)
+    '''
+    rounds = MIN_ROUNDS
+    while (rounds < MAX_ROUNDS
+           and seconds * 2 ** (rounds + 1 - measured_rounds) <= budget):
+        rounds += 1
+    return rounds
+
+def hash_rounds(hashed):
+    '''
+    Cost of a bcrypt hash such as "$2b$12$...", None if unparseable
+    '''
+    try:
+        return int(hashed.split('$')[2])
+    except (IndexError, ValueError):
+        return None
+
+class PasswordHasher:
+    '''
+    At most `workers + queue_depth` operations are in flight at once;
+    beyond that hash() and check() raise PasswordHasherBusy immediately,
+    as they do when a result takes longer than `timeout` seconds.
+
+    The pool is started on first use in each process, with the "spawn"
+    method, since forking a threaded web worker is unsafe.  Unless
+    `rounds` is given, the cost is calibrated in the pool the first time
+    it is needed, except in production, where that raises
+    PasswordCostNotSet: each worker would time its own, slightly
+    different cost.
+    '''
+    def __init__(self, workers=None, queue_depth=None,
+                 timeout=DEFAULT_TIMEOUT, rounds=None, budget=None):
+        self.workers = workers or int(os.environ.get('PASSWORD_WORKERS',
+                                                     DEFAULT_WORKERS))
+        self.queue_depth = (queue_depth if queue_depth is not None
+                            else int(os.environ.get('PASSWORD_QUEUE_DEPTH',
+                                                    DEFAULT_QUEUE_DEPTH)))
+        self.timeout = timeout
+        self._rounds = rounds or _env_int('BCRYPT_ROUNDS')
+        self.budget = budget or float(os.environ.get('PASSWORD_HASH_BUDGET',
+                                                     DEFAULT_BUDGET))
+        self.latency = LatencyHistograms(
+            'job_board_password_seconds',
+            "Time to hash or check a password, including queueing")
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self._slots = threading.BoundedSemaphore(self.workers
+                                                 + self.queue_depth)
+
+    @property
+    def rounds(self):
+        if self._rounds is None:
+            if os.environ.get('FLASK_ENV') == 'production':
+                raise PasswordCostNotSet(
+                    "Set BCRYPT_ROUNDS (python -m job_board.passwords "
+                    "suggests one) so every worker uses the same cost")
+            self.calibrate()
+        return self._rounds
+
+    def calibrate(self):
+        '''
+        Time a hash in the pool and pick the cost that fits the budget
+        '''
+        seconds = self._get_executor().submit(
+            _time_hash, CALIBRATION_ROUNDS).result(timeout=self.timeout)
+        self._rounds = choose_rounds(seconds, self.budget)
+        logger.info("bcrypt cost %d chosen for a %.3fs budget "
+                    "(cost %d took %.4fs)", self._rounds, self.budget,
+                    CALIBRATION_ROUNDS, seconds)
+        return self._rounds
+
+    def hash(self, password):
+        '''
+        bcrypt hash of password (a str), as a str
+        '''
+        return self._run('hash', _hash, password.encode('utf-8'),
+                         self.rounds)
+
+    def needs_rehash(self, hashed):
+        '''
+        Only for a cost below the target: hashes made with a higher one
+        (by a host with a different cost) are kept, not rewritten back
+        and forth
+        '''
+        rounds = hash_rounds(hashed)
+        return rounds is None or rounds < self.rounds
+
+    def check(self, password, hashed):
+        return self._run('check', _check, password.encode('utf-8'),
+                         hashed.encode('utf-8'))
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+
+    def _run(self, operation, function, *args):
+        if not self._slots.acquire(blocking=False):
+            self.latency.reject(operation)
+            raise PasswordHasherBusy(f"Password {operation} queue is full")
+
+        started = time.perf_counter()
+        try:
+            future = self._get_executor().submit(function, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # held until the work is done, even if we stop waiting for it
+        future.add_done_callback(lambda future: self._slots.release())
+
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            future.cancel()
+            self.latency.reject(operation)
+            raise PasswordHasherBusy(f"Password {operation} timed out "
+                                     f"after {self.timeout} seconds")
+        finally:
+            self.latency.observe(operation, time.perf_counter() - started)
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                # an executor inherited across a fork is unusable here
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'))
+                self._pid = os.getpid()
+                logger.info("Started password hashing pool (%d workers)",
+                            self.workers)
+            return self._executor
+
+def _env_int(name):
+    value = os.environ.get(name)
+    return int(value) if value else None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Suggest a BCRYPT_ROUNDS value for this host")
+    parser.add_argument('--budget', type=float,
+                        help="target seconds per hash (default: "
+                             "PASSWORD_HASH_BUDGET or "
+                             f"{DEFAULT_BUDGET})")
+    args = parser.parse_args(argv)
+
+    hasher = PasswordHasher(workers=1, budget=args.budget)
+    try:
+        print(f"BCRYPT_ROUNDS={hasher.calibrate()}")
+    finally:
+        hasher.shutdown()
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,187 @@
+'''
+Server-side sessions, enabled with SESSION_BACKEND=server.
+
+The cookie carries only a signed, random session id.  Session data lives
+in the sessions table, with a short-lived per-worker LRU cache in front,
+and is only loaded when a request actually touches the session.
+'''
+import secrets
+import time
+
+import logging
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer
+
+from job_board.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_TTL = 60          # seconds a loaded session is reused
+DEFAULT_CACHE_SIZE = 10_000
+DEFAULT_CLEANUP_INTERVAL = 300  # seconds between expired-session sweeps
+DEFAULT_CLEANUP_BATCH = 1_000   # rows deleted per statement
+MAX_CLEANUP_BATCHES = 10        # per sweep, so one request never stalls
+
+class ServerSideSession(SessionMixin):
+    '''
+    Session whose data is fetched by `load(sid)` on first access
+    '''
+    def __init__(self, sid, load):
+        self.sid = sid
+        self.new = sid is None
+        self.modified = False
+        self.accessed = False
+        self.rotated_from = None
+        self._load = load
+        self._data = None
+
+    @property
+    def loaded(self):
+        return self._data is not None
+
+    @property
+    def data(self):
+        if self._data is None:
+            self.accessed = True
+            self._data = self._load(self.sid) if self.sid else None
+            if self._data is None:
+                self.sid = None
+                self.new = True
+                self._data = {}
+        return self._data
+
+    def rotate(self):
+        '''
+        Move the data to a new id when saved, e.g. after signing in
+        '''
+        self.data
+        if self.sid is not None and self.rotated_from is None:
+            self.rotated_from = self.sid
+        self.sid = None
+        self.modified = True
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __setitem__(self, key, value):
+        self.data[key] = value
+        self.modified = True
+
+    def __delitem__(self, key):
+        del self.data[key]
+        self.modified = True
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+class ServerSideSessionInterface(SessionInterface):
+    '''
+    Stores sessions through storage.load_session() and friends.  Writes
+    publish a 'sessions' event, so every worker drops its cached copy.
+    Expired rows are deleted in batches, at most every
+    `cleanup_interval` seconds per worker, after saving a session.
+    '''
+    serializer = TaggedJSONSerializer()
+    salt = 'server-side-session'
+
+    def __init__(self, storage, cache_ttl=DEFAULT_CACHE_TTL,
+                 cache_size=DEFAULT_CACHE_SIZE,
+                 cleanup_interval=DEFAULT_CLEANUP_INTERVAL,
+                 cleanup_batch=DEFAULT_CLEANUP_BATCH):
+        self._storage = storage
+        self._cache = TTLCache(cache_ttl, max_size=cache_size)
+        self.cleanup_interval = cleanup_interval
+        self.cleanup_batch = cleanup_batch
+        self._last_cleanup = time.monotonic()
+        storage.subscribe('sessions', self._evict)
+
+    def _evict(self, sid):
+        if sid is None:
+            self._cache.clear()
+        else:
+            self._cache.evict(sid)
+
+    def _signer(self, app):
+        if not app.secret_key:
+            return None
+        return Signer(app.secret_key, salt=self.salt)
+
+    def open_session(self, app, request):
+        signer = self._signer(app)
+        if signer is None:
+            return None
+
+        sid = None
+        cookie = request.cookies.get(self.get_cookie_name(app))
+        if cookie:
+            try:
+                sid = signer.unsign(cookie).decode('ascii')
+            except BadSignature:
+                pass
+
+        return ServerSideSession(sid, self._load)
+
+    def _load(self, sid):
+        data = self._cache.get_or_load(
+            sid, lambda: self._storage.load_session(sid))
+        return None if data is None else self.serializer.loads(data)
+
+    def save_session(self, app, session, response):
+        if not session.loaded or not session.modified:
+            return # untouched or unchanged: no query, no cookie
+
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        response.vary.add('Cookie')
+
+        if session.rotated_from is not None:
+            self._storage.delete_session(session.rotated_from)
+
+        if not session:
+            if session.sid is not None:
+                self._storage.delete_session(session.sid)
+            response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        if session.sid is None:
+            session.sid = secrets.token_urlsafe(32)
+
+        lifetime = int(app.permanent_session_lifetime.total_seconds())
+        self._storage.save_session(session.sid,
+                                   self.serializer.dumps(dict(session)),
+                                   lifetime)
+        response.set_cookie(
+            name, self._signer(app).sign(session.sid).decode('ascii'),
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain, path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app))
+        self._maybe_cleanup()
+
+    def _maybe_cleanup(self):
+        if time.monotonic() - self._last_cleanup < self.cleanup_interval:
+            return
+
+        self._last_cleanup = time.monotonic()
+        self.cleanup()
+
+    def cleanup(self):
+        '''
+        Delete expired sessions, one batch per statement
+        '''
+        deleted = 0
+        for _ in range(MAX_CLEANUP_BATCHES):
+            count = self._storage.delete_expired_sessions(self.cleanup_batch)
+            deleted += count
+            if count < self.cleanup_batch:
+                break
+
+        if deleted:
+            logger.info("Deleted %d expired sessions", deleted)
+        return deleted
@@ -0,0 +1,179 @@
+'''
+Synthetic data for load testing.
+
+generate() fills the current FLASK_ENV database with companies and jobs
+at realistic sizes.  Text fields are filled to between a third of and
+the whole of their column's limit, and posting dates are spread over
+`days` days.  Every job gets one employment type and one department.
+Rows are written with COPY in batches, so a million jobs take minutes.
+
+Synthetic companies are named "Synthetic Company <n>" and sign in as
+jobs@synthetic-<n>.example, all with the same password.
+'''
+import io
+import random
+from datetime import datetime, timedelta
+
+import logging
+import psycopg2
+
+from job_board.connection_pool import connection_kwargs
+from job_board.invalidation import notify
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 10_000
+NAME_PREFIX = 'Synthetic Company '
+EMAIL_TEMPLATE = 'jobs@synthetic-{}.example'
+
+WORDS = ('team', 'product', 'customers', 'data', 'platform', 'design',
+         'build', 'support', 'growth', 'quality', 'remote', 'service',
+         'analysis', 'systems', 'scale', 'reliable', 'modern', 'mentor',
+         'deliver', 'improve', 'strategy', 'operations', 'experience',
+         'collaborate', 'cloud', 'secure', 'research', 'report', 'own',
+         'ship', 'learn', 'lead', 'review', 'plan', 'test', 'users')
+CITIES = ('Austin, TX', 'Boston, MA', 'Chicago, IL', 'Denver, CO',
+          'London, UK', 'New York, NY', 'Remote', 'Seattle, WA',
+          'Toronto, ON', 'Berlin, DE')
+TITLES = ('Engineer', 'Designer', 'Analyst', 'Manager', 'Accountant',
+          'Specialist', 'Coordinator', 'Scientist', 'Consultant', 'Writer')
+LEVELS = ('Junior', 'Senior', 'Staff', 'Lead', 'Principal', 'Associate')
+
+# column -> varchar limit of the text columns filled with prose
+COMPANY_TEXT = {'description': 1000}
+JOB_TEXT = {'role_overview': 1000, 'responsibilities': 600,
+            'requirements': 600, 'nice_to_haves': 600, 'benefits': 600}
+
+def generate(companies, jobs, password_hash, seed=0, days=90,
+             batch_size=DEFAULT_BATCH_SIZE):
+    '''
+    Add `companies` companies and `jobs` jobs spread across them, and
+    return the ids of the new companies.  password_hash is stored for
+    every company.
+    '''
+    rng = random.Random(seed)
+    connection = psycopg2.connect(**connection_kwargs())
+    try:
+        with connection:
+            with connection.cursor() as cursor:
+                first = _next_company_number(cursor)
+                company_ids = _copy_companies(cursor, rng, first, companies,
+                                              password_hash, batch_size)
+                employment_type_ids, department_ids = _taxonomy_ids(cursor)
+                _copy_jobs(cursor, rng, jobs, company_ids,
+                           employment_type_ids, department_ids, days,
+                           batch_size)
+                cursor.execute("ANALYZE")
+                # other workers drop every cached row when this commits
+                notify(cursor, 'companies')
+                notify(cursor, 'jobs')
+    finally:
+        connection.close()
+
+    logger.info("Generated %d companies and %d jobs", companies, jobs)
+    return company_ids
+
+def company_email(number):
+    return EMAIL_TEMPLATE.format(number)
+
+def _next_company_number(cursor):
+    cursor.execute("""
+        SELECT COALESCE(max(substring(name FROM '[0-9]+$')::int), 0) + 1
+        FROM companies WHERE name LIKE %s
+    """, (NAME_PREFIX + '%',))
+    return cursor.fetchone()[0]
+
+def _prose(rng, limit):
+    '''
+    A sentence of between a third of and all of limit characters
+    '''
+    length = rng.randint(limit // 3, limit)
+    words = [rng.choice(WORDS)]
+    size = len(words[0]) + 1 # counting the full stop
+    while True:
+        word = rng.choice(WORDS)
+        if size + 1 + len(word) > length:
+            break
+        words.append(word)
+        size += 1 + len(word)
+    return ' '.join(words).capitalize() + '.'
+
+def _copy(cursor, table, columns, rows):
+    buffer = io.StringIO()
+    for row in rows:
+        # generated text never contains tabs, newlines or backslashes
+        buffer.write('\t'.join('\\N' if value is None else str(value)
+                               for value in row) + '\n')
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN",
+                       buffer)
+
+def _copy_companies(cursor, rng, first, count, password_hash, batch_size):
+    columns = ('name', 'location', 'email', 'password', 'description')
+    for start in range(first, first + count, batch_size):
+        numbers = range(start, min(start + batch_size, first + count))
+        _copy(cursor, 'companies', columns, (
+            (f'{NAME_PREFIX}{number}', rng.choice(CITIES),
+             company_email(number), password_hash,
+             _prose(rng, COMPANY_TEXT['description']))
+            for number in numbers))
+
+    cursor.execute("""
+        SELECT id FROM companies WHERE email = ANY(%s) ORDER BY id
+    """, ([company_email(number) for number in range(first, first + count)],))
+    return [row[0] for row in cursor.fetchall()]
+
+def _taxonomy_ids(cursor):
+    cursor.execute("SELECT id FROM employment_types ORDER BY id")
+    employment_type_ids = [row[0] for row in cursor.fetchall()]
+    cursor.execute("SELECT id FROM departments ORDER BY id")
+    department_ids = [row[0] for row in cursor.fetchall()]
+    if not employment_type_ids or not department_ids:
+        raise ValueError("Add employment types and departments first "
+                         "(the seed migration does).")
+    return employment_type_ids, department_ids
+
+def _copy_jobs(cursor, rng, count, company_ids, employment_type_ids,
+               department_ids, days, batch_size):
+    if not company_ids:
+        return
+
+    columns = ('id', 'title', 'location', 'role_overview', 'responsibilities',
+               'requirements', 'nice_to_haves', 'benefits', 'pay_range',
+               'posted_date', 'closing_date', 'company_id')
+    now = datetime.now()
+    for start in range(0, count, batch_size):
+        size = min(batch_size, count - start)
+        cursor.execute("SELECT nextval('jobs_id_seq') "
+                       "FROM generate_series(1, %s)", (size,))
+        job_ids = [row[0] for row in cursor.fetchall()]
+
+        jobs = []
+        for job_id in job_ids:
+            posted = now - timedelta(seconds=rng.randint(0, days * 86_400))
+            pay = rng.randrange(40, 200, 5)
+            jobs.append((
+                job_id,
+                f'{rng.choice(LEVELS)} {rng.choice(TITLES)}',
+                rng.choice(CITIES),
+                *(_prose(rng, JOB_TEXT[column]) for column in
+                  ('role_overview', 'responsibilities', 'requirements',
+                   'nice_to_haves')),
+                (_prose(rng, JOB_TEXT['benefits']) if rng.random() < 0.7
+                 else None),
+                f'${pay},000 - ${pay + 30},000' if rng.random() < 0.6
+                else None,
+                posted.isoformat(sep=' '),
+                ((posted + timedelta(days=60)).date().isoformat()
+                 if rng.random() < 0.5 else None),
+                rng.choice(company_ids),
+            ))
+
+        _copy(cursor, 'jobs', columns, jobs)
+        _copy(cursor, 'employment_types_jobs',
+              ('employment_type_id', 'job_id'),
+              ((rng.choice(employment_type_ids), job_id)
+               for job_id in job_ids))
+        _copy(cursor, 'departments_jobs', ('department_id', 'job_id'),
+              ((rng.choice(department_ids), job_id) for job_id in job_ids))
+        logger.info("Generated %d of %d jobs", start + size, count)
@@ -0,0 +1,59 @@
+'''
+Version stamps of public page content, for conditional GETs.
+'''
+import hashlib
+
+from job_board.cache import TTLCache
+
+DEFAULT_TTL = 300 # seconds, bounding staleness if an event is ever lost
+
+class ContentVersions:
+    '''
+    Per-worker cache of the content_versions rows, which triggers bump on
+    every write.  Storage events evict the scopes they touch, so a warm
+    stamp() costs no queries.
+    '''
+    def __init__(self, storage, ttl=DEFAULT_TTL):
+        self._storage = storage
+        self._versions = TTLCache(ttl) # scope -> (version, updated_at)
+        storage.subscribe('companies', self._evict_companies)
+        storage.subscribe('jobs', self._evict_jobs)
+        storage.subscribe('taxonomy',
+                          lambda key: self._versions.evict('taxonomy'))
+
+    def _evict_companies(self, company_id):
+        if company_id is None:
+            self._versions.clear()
+        else:
+            self._versions.evict('companies')
+            self._versions.evict(f'company:{company_id}')
+
+    def _evict_jobs(self, company_id):
+        if company_id is None:
+            self._versions.evict_where(lambda scope: scope.endswith(':jobs'))
+        else:
+            self._versions.evict(f'company:{company_id}:jobs')
+
+    def versions(self, scopes):
+        '''
+        {scope: (version, updated_at)}; scopes never written are (0, None)
+        '''
+        return self._versions.get_many_or_load(scopes, self._load)
+
+    def _load(self, scopes):
+        loaded = self._storage.find_content_versions(scopes)
+        return {scope: loaded.get(scope, (0, None)) for scope in scopes}
+
+    def stamp(self, scopes, *extra):
+        '''
+        (etag, last_modified) for content depending on scopes, with extra
+        values (e.g. the viewer) mixed into the etag
+        '''
+        versions = self.versions(scopes)
+        key = ';'.join(f'{scope}={versions[scope][0]}'
+                       for scope in sorted(versions))
+        key += ';' + ';'.join(map(repr, extra))
+        etag = hashlib.sha1(key.encode('utf-8')).hexdigest()[:20]
+        timestamps = [updated_at for _, updated_at in versions.values()
+                      if updated_at is not None]
+        return etag, max(timestamps, default=None)
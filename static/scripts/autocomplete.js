@@ -0,0 +1,34 @@
+// Fills the search bar's datalist with suggestions as the user types
+(function () {
+  const input = document.querySelector('.search-bar input[name="q"]');
+  const list = document.getElementById('search-suggestions');
+  if (!input || !list) {
+    return;
+  }
+
+  let timer = null;
+  let lastQuery = '';
+
+  input.addEventListener('input', function () {
+    clearTimeout(timer);
+    timer = setTimeout(function () {
+      const query = input.value.trim();
+      if (!query || query === lastQuery) {
+        return;
+      }
+      lastQuery = query;
+
+      fetch(input.dataset.autocompleteUrl + '?q=' + encodeURIComponent(query))
+        .then(function (response) { return response.json(); })
+        .then(function (data) {
+          list.replaceChildren(...data.suggestions.map(function (suggestion) {
+            const option = document.createElement('option');
+            option.value = suggestion.text;
+            option.label = suggestion.kind;
+            return option;
+          }));
+        })
+        .catch(function () { /* suggestions are best effort */ });
+    }, 150);
+  });
+})();
@@ -0,0 +1,20 @@
+// Fills in the Browse Jobs counts on pages that leave them out, so those
+// pages stay cacheable while jobs are posted elsewhere on the site
+(function () {
+  const menu = document.querySelector('[data-job-counts-url]');
+  if (!menu) {
+    return;
+  }
+
+  fetch(menu.dataset.jobCountsUrl)
+    .then(function (response) { return response.json(); })
+    .then(function (counts) {
+      menu.querySelectorAll('[data-department-id]').forEach(function (span) {
+        span.textContent = '(' + (counts.departments[span.dataset.departmentId] || 0) + ')';
+      });
+      menu.querySelectorAll('[data-employment-type-id]').forEach(function (span) {
+        span.textContent = '(' + (counts.employment_types[span.dataset.employmentTypeId] || 0) + ')';
+      });
+    })
+    .catch(function () { /* the counts are best effort */ });
+})();
@@ -0,0 +1,362 @@
+'''
+Micro-benchmarks of every DatabasePersistence method and of the request
+hot paths: context processors, the company session check, password
+validation and rendering job and company listings.
+
+    python -m tests.benchmarks [-k NAME] [--rows 100] [--save FILE]
+                               [--compare FILE] [--threshold 0.10]
+
+Runs against the job_board_test database, cloned afresh from the test
+template (see tests.fixtures) and seeded with synthetic companies and
+jobs, which are committed: generate() has a connection of its own.
+Cached storage methods are measured warm and, as "[cold]", right after
+an event evicts their entry.  Logging is turned down to warnings, so log
+formatting is not part of the timings.  With --compare, the exit status
+is 1 if any median grew by more than the threshold.
+'''
+import argparse
+import itertools
+import logging
+import os
+import sys
+
+os.environ['FLASK_ENV'] = 'test' # before the app opens any connection
+
+import bcrypt
+from flask import render_template, session
+
+from app import (
+    app,
+    company_id_verification_required_w_session,
+    fragments,
+    storage
+)
+from job_board.benchmark import (
+    DEFAULT_MIN_TIME,
+    DEFAULT_ROUNDS,
+    DEFAULT_THRESHOLD,
+    Suite,
+    compare,
+    format_comparison,
+    format_results,
+    load,
+    save
+)
+from job_board.database_persistence import JobPage
+from job_board.synthetic import generate
+from job_board.utils import validate_new_password_minimum_requirements
+
+from tests.fixtures import prepare_database
+
+COMPANIES = 50
+JOBS = 2_000
+
+suite = Suite()
+
+class Fixture:
+    '''
+    Ids and rows of the seeded data, filled in by seed()
+    '''
+    rows = 100
+    company = None
+    job = None
+    jobs = ()
+    companies = ()
+    employment_type_id = None
+    department_id = None
+
+fixture = Fixture()
+counter = itertools.count()
+
+def seed(rows):
+    prepare_database()
+    fixture.rows = rows
+    fixture.employment_type_id = storage.add_employment_type('Full-time')
+    fixture.department_id = storage.add_department('Engineering')
+    company_ids = generate(COMPANIES, JOBS, bcrypt.hashpw(
+        b'Benchmark1!', bcrypt.gensalt(4)).decode('utf-8'))
+    storage.publish_all()
+
+    fixture.company = storage.find_company_by_id(company_ids[0])
+    fixture.job = storage.find_job(storage.find_job_page(
+        fixture.company['id'], limit=1).jobs[0]['id'],
+        fixture.company['id'])
+    fixture.jobs = storage.find_job_page(limit=rows).jobs
+    fixture.companies = list(itertools.islice(storage.iter_companies(), rows))
+
+def unique(prefix):
+    return f'{prefix} {next(counter)}'
+
+def job_fields(**fields):
+    return dict({'title': 'Benchmark Job', 'location': 'Remote',
+                 'role_overview': 'Overview', 'responsibilities': 'Duties',
+                 'requirements': 'Skills', 'nice_to_haves': 'Extras',
+                 'benefits': None, 'pay_range': None, 'closing_date': None,
+                 'employment_type_id': fixture.employment_type_id,
+                 'department_id': fixture.department_id}, **fields)
+
+def storage_benchmark(name, cold=None):
+    '''
+    Registers the decorated function as storage.<name>, and also as
+    storage.<name>[cold] with cold() called before each call
+    '''
+    def decorator(function):
+        suite.add(f'storage.{name}', 'storage')(function)
+        if cold is not None:
+            def cold_function():
+                cold()
+                function()
+            suite.add(f'storage.{name}[cold]', 'storage')(cold_function)
+        return function
+    return decorator
+
+def evict_company():
+    storage.publish('companies', fixture.company['id'])
+
+def evict_jobs():
+    storage.publish('jobs', fixture.company['id'])
+
+# Reads
+
+@storage_benchmark('all_companies')
+def _():
+    storage.all_companies()
+
+@storage_benchmark('iter_companies')
+def _():
+    for _ in storage.iter_companies():
+        pass
+
+@storage_benchmark('find_signup_conflicts')
+def _():
+    storage.find_signup_conflicts('Benchmark Company', 'benchmark.example')
+
+@storage_benchmark('find_company_by_id', cold=evict_company)
+def _():
+    storage.find_company_by_id(fixture.company['id'])
+
+@storage_benchmark('find_company_session_version')
+def _():
+    storage.find_company_session_version(fixture.company['id'])
+
+@storage_benchmark('find_company_by_name')
+def _():
+    storage.find_company_by_name(fixture.company['name'])
+
+@storage_benchmark('find_company_by_email')
+def _():
+    storage.find_company_by_email(fixture.company['email'])
+
+@storage_benchmark('find_job_page', cold=evict_jobs)
+def _():
+    storage.find_job_page(limit=fixture.rows)
+
+@storage_benchmark('job_counts', cold=evict_jobs)
+def _():
+    storage.job_counts()
+
+@storage_benchmark('search_jobs')
+def _():
+    storage.search_jobs('senior engineer')
+
+@storage_benchmark('autocomplete_terms')
+def _():
+    storage.autocomplete_terms(fixture.company['id'])
+
+@storage_benchmark('has_trigram_search')
+def _():
+    storage.has_trigram_search()
+
+@storage_benchmark('fuzzy_autocomplete')
+def _():
+    if storage.has_trigram_search():
+        storage.fuzzy_autocomplete('Enginer', 8)
+
+@storage_benchmark('find_content_versions')
+def _():
+    company_id = fixture.company['id']
+    storage.find_content_versions(['taxonomy', f'company:{company_id}',
+                                   f'company:{company_id}:jobs'])
+
+@storage_benchmark('get_employment_types')
+def _():
+    storage.get_employment_types()
+
+@storage_benchmark('get_departments')
+def _():
+    storage.get_departments()
+
+@storage_benchmark('find_job')
+def _():
+    storage.find_job(fixture.job['id'], fixture.company['id'])
+
+@storage_benchmark('load_session')
+def _():
+    storage.load_session('benchmark-session')
+
+# Writes (each committed)
+
+@storage_benchmark('create_new_company')
+def _():
+    name = unique('Benchmark Company')
+    storage.create_new_company(name, 'Remote',
+                               f"jobs@{name.replace(' ', '-')}.example",
+                               'x', 'About')
+
+@storage_benchmark('update_company_profile_info')
+def _():
+    company = fixture.company
+    storage.update_company_profile_info(company['id'], company['name'],
+                                        company['location'],
+                                        company['description'])
+
+@storage_benchmark('update_company_profile_logo')
+def _():
+    storage.update_company_profile_logo(fixture.company['id'],
+                                        fixture.company['logo'])
+
+@storage_benchmark('update_company_password')
+def _():
+    storage.update_company_password(fixture.company['id'],
+                                    fixture.company['password'])
+
+@storage_benchmark('add_employment_type')
+def _():
+    storage.add_employment_type(unique('Benchmark Type'))
+
+@storage_benchmark('add_department')
+def _():
+    storage.add_department(unique('Benchmark Department'))
+
+@storage_benchmark('insert_new_job')
+def _():
+    storage.insert_new_job(company_id=fixture.company['id'], **job_fields())
+
+@storage_benchmark('import_jobs')
+def _():
+    storage.import_jobs(fixture.company['id'],
+                        [[job_fields() for _ in range(100)]])
+
+@storage_benchmark('update_job')
+def _():
+    fixture.job['version'] = storage.update_job(
+        fixture.job['id'], fixture.company['id'], fixture.job['version'],
+        **job_fields(title=fixture.job['title']))
+
+@storage_benchmark('save_session')
+def _():
+    storage.save_session('benchmark-session', '{}', 3600)
+
+@storage_benchmark('delete_session')
+def _():
+    storage.delete_session('benchmark-deleted-session')
+
+@storage_benchmark('delete_expired_sessions')
+def _():
+    storage.delete_expired_sessions(1000)
+
+# Request hot paths
+
+def in_request(function, path='/', signed_in=True):
+    '''
+    function called in a fresh request context, after the before_request
+    hooks, as it is once per request
+    '''
+    def run():
+        with app.test_request_context(path):
+            if signed_in:
+                session['company_id'] = fixture.company['id']
+                session['company_version'] = fixture.company[
+                    'session_version']
+            app.preprocess_request()
+            function()
+    return run
+
+suite.add('request.context', 'request')(in_request(lambda: None))
+
+for processor in app.template_context_processors[None]:
+    suite.add(f'context_processor.{processor.__name__}',
+              'context_processor')(in_request(processor))
+
+suite.add('context_processor.all[signed out]', 'context_processor')(
+    in_request(lambda: app.update_template_context({}), signed_in=False))
+
+@company_id_verification_required_w_session
+def _verified_view(company_id):
+    return None
+
+suite.add('company_id_verification_required_w_session', 'request')(
+    in_request(lambda: _verified_view(company_id=fixture.company['id'])))
+
+suite.add('company_id_verification_required_w_session[denied]',
+          'request')(in_request(lambda: _verified_view(company_id=0),
+                                signed_in=False))
+
+suite.add('validate_new_password_minimum_requirements', 'request')(
+    lambda: validate_new_password_minimum_requirements('Benchmark1!'))
+
+suite.add('validate_new_password_minimum_requirements[long]', 'request')(
+    lambda: validate_new_password_minimum_requirements('Aa1!' * 32))
+
+def render_jobs():
+    render_template('jobs.html', company=fixture.company, jobs=fixture.jobs,
+                    page=JobPage(fixture.jobs, None, None),
+                    per_page=fixture.rows)
+
+def render_companies():
+    render_template('companies.html', companies=fixture.companies)
+
+def cold(render):
+    def run():
+        fragments.clear()
+        render()
+    return run
+
+for name, render, path in (('jobs.html', render_jobs, '/companies/1/jobs'),
+                           ('companies.html', render_companies,
+                            '/companies')):
+    suite.add(f'render.{name}', 'render')(in_request(render, path))
+    suite.add(f'render.{name}[cold]', 'render')(
+        in_request(cold(render), path))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m tests.benchmarks',
+        description="Micro-benchmarks of storage and request hot paths.")
+    parser.add_argument('-k', dest='selected', action='append',
+                        help="Only benchmarks whose name contains this.")
+    parser.add_argument('--rows', type=int, default=100,
+                        help="Rows rendered and paged (default 100).")
+    parser.add_argument('--min-time', type=float, default=DEFAULT_MIN_TIME)
+    parser.add_argument('--rounds', type=int, default=DEFAULT_ROUNDS)
+    parser.add_argument('--save', help="Write the results to this JSON file.")
+    parser.add_argument('--compare', help="Compare with results saved "
+                                          "earlier.")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Median increase counted as a regression "
+                             "(default 0.10).")
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.WARNING)
+    app.config['TESTING'] = True
+    seed(args.rows)
+    try:
+        results = suite.run(args.selected, args.min_time, args.rounds,
+                            progress=lambda result: print(
+                                result['name'], file=sys.stderr))
+    finally:
+        storage.close()
+
+    print(format_results(results))
+    if args.save:
+        save(results, args.save)
+    if args.compare:
+        rows = compare(results, load(args.compare), args.threshold)
+        print()
+        print(format_comparison(rows, args.threshold))
+        if any(regressed for *_, regressed in rows):
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,196 @@
+'''
+Transactional database fixtures.
+
+prepare_database() builds the schema once per test run.  The migrations
+are applied to a template database, job_board_test_template, which is
+only rebuilt when the migrations change.  job_board_test is then cloned
+from it, with empty tables.
+
+TransactionalTestCase runs each test class inside one transaction on one
+connection, shared by the tests and the app under test, and rolled back
+afterwards.  Each test is rolled back to a savepoint, so no test sees
+another's rows.  Blocks the app would commit release a savepoint
+instead, and blocks that fail roll back to it, as they would have
+rolled back their own transaction.  Rows are never committed, so
+anything reading through a connection of its own (LISTEN/NOTIFY,
+job_board.synthetic) does not belong in such a class.
+'''
+import hashlib
+import os
+import unittest
+from contextlib import closing
+
+import psycopg2
+from psycopg2 import sql
+from psycopg2.extensions import connection as base_connection
+
+from job_board.connection_pool import close_pool, connection_kwargs, use_pool
+from job_board.instrumentation import InstrumentedConnection
+from job_board.migrate import available_migrations, run_migrations
+
+TEMPLATE_DATABASE = 'job_board_test_template'
+MAINTENANCE_DATABASE = 'postgres'
+
+# Rows the seed migrations insert, removed from the template
+SEEDED_TABLES = ('companies', 'jobs', 'employment_types', 'departments',
+                 'employment_types_jobs', 'departments_jobs',
+                 'department_job_counts', 'employment_type_job_counts',
+                 'sessions')
+
+_prepared = False
+
+def migrations_fingerprint():
+    digest = hashlib.sha256()
+    for version, name, path in available_migrations():
+        digest.update(f'{version}_{name}\n'.encode('utf-8'))
+        with open(path, 'rb') as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+def prepare_database():
+    '''
+    Clone job_board_test from the template, building the template first
+    if the migrations changed.  Runs once per process.
+    '''
+    global _prepared
+    if _prepared:
+        return
+
+    os.environ['FLASK_ENV'] = 'test'
+    database = sql.Identifier(connection_kwargs()['dbname'])
+    template = sql.Identifier(TEMPLATE_DATABASE)
+    close_pool() # nothing may stay connected to the database replaced
+    with closing(psycopg2.connect(dbname=MAINTENANCE_DATABASE)) as admin:
+        admin.autocommit = True # CREATE DATABASE can't run in a transaction
+        with admin.cursor() as cursor:
+            fingerprint = migrations_fingerprint()
+            if _template_fingerprint(cursor) != fingerprint:
+                _build_template(cursor, fingerprint)
+            cursor.execute(sql.SQL("DROP DATABASE IF EXISTS {} WITH (FORCE)")
+                           .format(database))
+            cursor.execute(sql.SQL("CREATE DATABASE {} TEMPLATE {}")
+                           .format(database, template))
+
+    _prepared = True
+
+def _template_fingerprint(cursor):
+    cursor.execute("""
+        SELECT shobj_description(oid, 'pg_database')
+        FROM pg_database WHERE datname = %s
+    """, (TEMPLATE_DATABASE,))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+def _build_template(cursor, fingerprint):
+    template = sql.Identifier(TEMPLATE_DATABASE)
+    cursor.execute(sql.SQL("DROP DATABASE IF EXISTS {} WITH (FORCE)")
+                   .format(template))
+    cursor.execute(sql.SQL("CREATE DATABASE {}").format(template))
+
+    with closing(psycopg2.connect(dbname=TEMPLATE_DATABASE)) as connection:
+        run_migrations(connection)
+        with connection, connection.cursor() as template_cursor:
+            template_cursor.execute(
+                sql.SQL("TRUNCATE TABLE {} RESTART IDENTITY").format(
+                    sql.SQL(', ').join(map(sql.Identifier, SEEDED_TABLES))))
+            template_cursor.execute("""
+                DELETE FROM content_versions WHERE scope LIKE 'company:%'
+            """)
+
+    # only stamped once complete, so an interrupted build is redone
+    cursor.execute(sql.SQL("COMMENT ON DATABASE {} IS {}").format(
+        template, sql.Literal(fingerprint)))
+
+class SharedConnection(InstrumentedConnection):
+    '''
+    Connection used as a context manager to run a block in a savepoint,
+    leaving the enclosing transaction open
+    '''
+    def __enter__(self):
+        self._execute("SAVEPOINT block")
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self._execute("RELEASE SAVEPOINT block")
+        else:
+            self._execute("ROLLBACK TO SAVEPOINT block")
+            self._execute("RELEASE SAVEPOINT block")
+        return False
+
+    def _execute(self, query):
+        # an uninstrumented cursor, so request metrics only count the app's
+        with base_connection.cursor(self) as cursor:
+            cursor.execute(query)
+
+class SharedConnectionPool:
+    '''
+    Stands in for ConnectionPool, handing every caller the same connection
+    '''
+    def __init__(self, connection):
+        self.connection = connection
+        self.max_size = 1
+        self.pid = os.getpid()
+
+    def getconn(self):
+        return self.connection
+
+    def putconn(self, connection, discard=False):
+        pass
+
+    def closeall(self):
+        pass
+
+    def stats(self):
+        return {'size': 1, 'idle': 0, 'max_size': self.max_size}
+
+class TransactionalTestCase(unittest.TestCase):
+    '''
+    Runs the class in one transaction on a SharedConnection, which every
+    DatabasePersistence gets from the pool, and each test in a savepoint.
+    Identity sequences restart inside the transaction, so rows added in
+    setUpClass get the same ids whatever ran before.  The caches of
+    `storages` are dropped after every rollback.
+    '''
+    storages = ()
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        prepare_database()
+        cls.connection = psycopg2.connect(
+            connection_factory=SharedConnection, **connection_kwargs())
+        previous_pool = use_pool(SharedConnectionPool(cls.connection))
+        cls.addClassCleanup(cls._end_transaction, previous_pool)
+
+        with base_connection.cursor(cls.connection) as cursor:
+            cursor.execute("""
+                SELECT format('ALTER SEQUENCE %s RESTART', oid::regclass)
+                FROM pg_class
+                WHERE relkind = 'S' AND relnamespace = 'public'::regnamespace
+            """)
+            for statement, in cursor.fetchall():
+                cursor.execute(statement)
+
+    @classmethod
+    def _end_transaction(cls, previous_pool):
+        for storage in cls.storages:
+            storage.close() # forget the connection before it is closed
+        cls.connection.rollback()
+        cls.connection.close()
+        use_pool(previous_pool)
+        cls.reset_caches()
+
+    @classmethod
+    def reset_caches(cls):
+        for storage in cls.storages:
+            storage.publish_all() # cached rows may have been rolled back
+
+    def setUp(self):
+        super().setUp()
+        self.connection._execute("SAVEPOINT test")
+        self.addCleanup(self._rollback)
+
+    def _rollback(self):
+        self.connection._execute("ROLLBACK TO SAVEPOINT test")
+        self.reset_caches()
@@ -1,29 +1,41 @@
+import re
 import unittest
 import shutil
 from flask import session
 import os
 
-from app import app
-from job_board.database_persistence import DatabasePersistence
+from unittest.mock import patch
+
+import bcrypt
+
+from app import (
+    app,
+    autocomplete_index,
+    password_hasher,
+    storage as app_storage
+)
+from job_board.database_persistence import DuplicateCompany
+from job_board.passwords import PasswordHasherBusy
 from io import BytesIO
 
-class JobBoardTest(unittest.TestCase):
+from tests.fixtures import TransactionalTestCase
+
+from PIL import Image
+
+class JobBoardTest(TransactionalTestCase):
+    storages = (app_storage,)
+
     @classmethod
     def setUpClass(cls):
-        """Set up database once for all tests in this class"""
-        os.environ['FLASK_ENV'] = 'test' # for accessing job_board_test database
+        """Seed common data once, in the transaction wrapping the class"""
+        super().setUpClass()
         app.config['TESTING'] = True # for seperate set :: data files
-        cls.storage = DatabasePersistence()
+        app.config['EXPOSE_REQUEST_METRICS'] = True # off outside development
+        cls.storage = app_storage # share the app's caches and connection
+        autocomplete_index.background = False # built on the shared connection
 
         with cls.storage._database_connection() as conn:
             with conn.cursor() as cursor:
-                # Clear tables at very beginning ensuring clean slate
-                cursor.execute("""
-                    TRUNCATE TABLE companies, jobs, employment_types,
-                    departments, employment_types_jobs, departments_jobs
-                    RESTART IDENTITY
-                """)
-
                 # Insert common data that all tests can use
                 cursor.execute("""
                     INSERT INTO companies
@@ -85,20 +97,11 @@ class JobBoardTest(unittest.TestCase):
                       ('$2b$12$EOyJaTWBTsvtBEVJlvj1S.'
                        'sqYDYujWBvWw4BZRr8p80QzfnXhJv/m'),
                       'This is a test description.', 'test.png'))
-    
-    @classmethod
-    def tearDownClass(cls):
-        """Clean up database once after all tests in this class"""
-        storage = DatabasePersistence()
-        with storage._database_connection() as conn:
-            with conn.cursor() as cursor:
-                cursor.execute("""
-                    TRUNCATE TABLE companies, jobs, employment_types,
-                    departments, employment_types_jobs, departments_jobs
-                    RESTART IDENTITY
-                """)
 
+        cls.storage.publish_all() # rows were written behind the caches' back
+    
     def setUp(self):
+        super().setUp()
         self.client = app.test_client()
         self.data_path = os.path.join(os.path.dirname(__file__), 'data')
         self.logos_path = os.path.join(self.data_path, 'logos')
@@ -118,7 +121,9 @@ class JobBoardTest(unittest.TestCase):
     def admin_session(self):
         with self.client as c:
             with c.session_transaction() as sess:
-                sess['company'] = JobBoardTest.storage.find_company_by_id(1)
+                company = JobBoardTest.storage.find_company_by_id(1)
+                sess['company_id'] = company['id']
+                sess['company_version'] = company['session_version']
             return c
     
     def test_view_latest_jobs(self):
@@ -149,6 +154,26 @@ class JobBoardTest(unittest.TestCase):
                       response.get_data(as_text=True))
         self.assertIn("Please, try again.", response.get_data(as_text=True))
     
+    def test_signup_same_company_domain_any_case(self):
+        response = self.client.post('/signup',
+                                    data={
+                                        'name': 'Shouting Company',
+                                        'email': 'hr@TEST.com',
+                                        'location': 'San Francisco, CA',
+                                        'password': 'test',
+                                        'description': 'test',
+                                    })
+        self.assertEqual(response.status_code, 422)
+        self.assertIn("An account with that company domain already exists.",
+                      response.get_data(as_text=True))
+
+    def test_create_company_with_taken_domain(self):
+        # what a concurrent signup that passed the check runs into
+        with self.assertRaises(DuplicateCompany) as context:
+            JobBoardTest.storage.create_new_company(
+                'Racing Company', 'Remote', 'jobs@Test.com', 'x', 'Racing')
+        self.assertEqual(context.exception.field, 'email_domain')
+
     def test_signup_new_company_same_company_name(self):
         response = self.client.post('/signup',
                                     data={
@@ -233,6 +258,63 @@ class JobBoardTest(unittest.TestCase):
         self.assertIn("Invalid credentials.  Please try again.",
                       response.get_data(as_text=True))
 
+    def test_sign_in_keeps_session_slim(self):
+        with self.client as client:
+            client.post('/signin', data={'email': 'test@test.com',
+                                         'password': 'secret'})
+            self.assertEqual(set(session) - {'_flashes'},
+                             {'company_id', 'company_version'})
+
+    def test_bumped_session_version_signs_out(self):
+        client = self.admin_session()
+        with JobBoardTest.storage._database_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("""
+                    UPDATE companies
+                    SET session_version = session_version + 1
+                    WHERE id = 1
+                """)
+        JobBoardTest.storage.publish('companies', 1)
+
+        response = client.get('/companies/1/dashboard')
+        self.assertEqual(response.status_code, 422)
+        with client.session_transaction() as sess:
+            self.assertNotIn('company_id', sess)
+
+    def test_sign_in_rehashes_outdated_cost(self):
+        company = JobBoardTest.storage.find_company_by_email('test@test.com')
+        JobBoardTest.storage.update_company_password(
+            company['id'], bcrypt.hashpw(b'secret', bcrypt.gensalt(4))
+            .decode('utf-8'))
+        with patch.object(password_hasher, '_rounds', 5):
+            self.client.post('/signin', data={'email': 'test@test.com',
+                                              'password': 'secret'})
+        company = JobBoardTest.storage.find_company_by_email('test@test.com')
+        self.assertTrue(company['password'].startswith('$2b$05$'))
+        self.assertTrue(password_hasher.check('secret', company['password']))
+
+    def test_sign_in_keeps_higher_cost(self):
+        original = JobBoardTest.storage.find_company_by_email(
+            'test@test.com')['password'] # cost 12
+        with patch.object(password_hasher, '_rounds', 4):
+            self.client.post('/signin', data={'email': 'test@test.com',
+                                              'password': 'secret'})
+        company = JobBoardTest.storage.find_company_by_email('test@test.com')
+        self.assertEqual(company['password'], original)
+
+    def test_sign_in_when_password_pool_saturated(self):
+        with patch.object(password_hasher, 'check',
+                          side_effect=PasswordHasherBusy):
+            response = self.client.post('/signin',
+                                        data={
+                                            'email': 'test@test.com',
+                                            'password': 'secret',
+                                        })
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response.headers)
+        self.assertIn("Please, try again in a moment.",
+                      response.get_data(as_text=True))
+
     def test_view_company_dashboard(self):
         client = self.admin_session()
         response = self.client.get('/companies/1/dashboard')
@@ -241,6 +323,19 @@ class JobBoardTest(unittest.TestCase):
                       response.get_data(as_text=True))
         self.assertIn("Edit Your Jobs", response.get_data(as_text=True))
 
+    def test_warm_dashboard_authorizes_without_queries(self):
+        client = self.admin_session()
+        client.get('/companies/1/dashboard')
+        response = client.get('/companies/1/dashboard')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('desc="0 queries"', response.headers['Server-Timing'])
+
+    def test_view_other_company_dashboard(self):
+        client = self.admin_session()
+        response = client.get('/companies/2/dashboard')
+        self.assertEqual(response.status_code, 422)
+        self.assertIn("You cannot do that!", response.get_data(as_text=True))
+
     def test_view_company_dashboard_failure(self):
         response = self.client.get('/companies/1/dashboard')
         self.assertEqual(response.status_code, 422)
@@ -270,6 +365,60 @@ class JobBoardTest(unittest.TestCase):
             self.assertIn("Changes NOT saved.",
                           response.get_data(as_text=True))
 
+    def test_update_company_logo(self):
+        client = self.admin_session()
+        company = JobBoardTest.storage.find_company_by_id(1)
+        upload = BytesIO()
+        Image.new('RGB', (600, 300), (0, 90, 200)).save(upload, 'PNG')
+        upload.seek(0)
+        try:
+            response = client.post('/companies/1/dashboard/update_profile',
+                                   data={
+                                       'name': company['name'],
+                                       'location': company['location'],
+                                       'description': 'With a logo',
+                                       'company_logo': (upload, 'logo.png'),
+                                   }, follow_redirects=True)
+            body = response.get_data(as_text=True)
+            self.assertEqual(response.status_code, 200)
+            variant = re.search(r'/logos/1-[0-9a-f]{16}-125\.webp', body)
+            self.assertIsNotNone(variant)
+
+            response = client.get(variant.group(0))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.content_type, 'image/webp')
+            self.assertIn('immutable', response.headers['Cache-Control'])
+            response.close()
+
+            response = client.get('/companies/1/logo')
+            self.assertEqual(response.status_code, 301)
+        finally:
+            JobBoardTest.storage.update_company_profile_logo(1, 'test.png')
+
+    def test_logo_variants_only_serve_hashed_names(self):
+        for name in ('2.png', 'test.png', 'logo_placeholder.png'):
+            self.create_logo(name, b'legacy')
+            with self.subTest(name=name):
+                response = self.client.get(f'/logos/{name}')
+                self.assertEqual(response.status_code, 404)
+                self.assertNotIn('immutable',
+                                 response.headers.get('Cache-Control', ''))
+
+    def test_update_company_logo_invalid(self):
+        client = self.admin_session()
+        company = JobBoardTest.storage.find_company_by_id(1)
+        response = client.post('/companies/1/dashboard/update_profile',
+                               data={
+                                   'name': company['name'],
+                                   'location': company['location'],
+                                   'description': 'Bad logo',
+                                   'company_logo': (BytesIO(b'<svg/>'),
+                                                    'logo.png'),
+                               })
+        self.assertEqual(response.status_code, 422)
+        self.assertIn("Please upload a PNG, JPEG or WebP image.",
+                      response.get_data(as_text=True))
+
     def test_update_company_profile(self):
         client = self.admin_session()
         with (client.post('/companies/1/dashboard/update_profile',
@@ -311,6 +460,209 @@ class JobBoardTest(unittest.TestCase):
         self.assertIn("<h4>Nice to Have:</h4>",
                       response.get_data(as_text=True))
     
+    def test_show_company_job_postings_paginated(self):
+        company_id = JobBoardTest.storage.create_new_company(
+            'Paged Company', 'Remote', 'jobs@paged.com', 'x', 'Paged')
+        for number in range(3):
+            JobBoardTest.storage.insert_new_job(
+                f'Paged Job {number}', 'Remote', 'Overview', 'Duties',
+                'Skills', 'Extras', None, None, None, company_id, 1, 1)
+
+        jobs_url = f'/companies/{company_id}/jobs?per_page=2'
+        response = self.client.get(jobs_url)
+        body = response.get_data(as_text=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Paged Job 2', body)
+        self.assertIn('Paged Job 1', body)
+        self.assertNotIn('Paged Job 0', body)
+        self.assertNotIn('Newer postings', body)
+
+        cursor = re.search(r'after=([^&"]+)', body).group(1)
+        response = self.client.get(f'{jobs_url}&after={cursor}')
+        body = response.get_data(as_text=True)
+        self.assertIn('Paged Job 0', body)
+        self.assertNotIn('Paged Job 1', body)
+        self.assertIn('Newer postings', body)
+        self.assertNotIn('Older postings', body)
+
+        cursor = re.search(r'before=([^&"]+)', body).group(1)
+        response = self.client.get(f'{jobs_url}&before={cursor}')
+        body = response.get_data(as_text=True)
+        self.assertIn('Paged Job 2', body)
+        self.assertIn('Paged Job 1', body)
+        self.assertNotIn('Paged Job 0', body)
+
+    def test_show_company_job_postings_bad_cursor(self):
+        response = self.client.get('/companies/2/jobs?after=not-a-cursor')
+        self.assertEqual(response.status_code, 422)
+        self.assertIn('That page of job postings does not exist.',
+                      response.get_data(as_text=True))
+
+    def test_show_recent_jobs(self):
+        JobBoardTest.storage.insert_new_job(
+            'Feed Job', 'Remote', 'Overview', 'Duties', 'Skills', 'Extras',
+            None, None, None, 2, 1, 1)
+
+        response = self.client.get('/jobs')
+        body = response.get_data(as_text=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Recent Job Postings', body)
+        self.assertIn('Feed Job', body)
+        self.assertLess(body.index('Feed Job'), body.index('Job Title Test'))
+
+    def test_show_department_jobs(self):
+        response = self.client.get('/jobs/departments/1')
+        body = response.get_data(as_text=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Testing Department Jobs', body)
+        self.assertIn('Job Title Test', body)
+
+        response = self.client.get('/jobs/departments/999')
+        self.assertEqual(response.status_code, 422)
+
+    def test_show_employment_type_jobs(self):
+        response = self.client.get('/jobs/employment_types/1')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Full-time Jobs', response.get_data(as_text=True))
+
+    def test_browse_menu_shows_job_counts(self):
+        counts = JobBoardTest.storage.job_counts()
+        response = self.client.get('/')
+        self.assertIn(f"Testing Department ({counts['departments'][1]})",
+                      response.get_data(as_text=True))
+
+    def test_job_counts_follow_new_jobs(self):
+        before = JobBoardTest.storage.job_counts()['departments'][1]
+        JobBoardTest.storage.insert_new_job(
+            'Counted Job', 'Remote', 'Overview', 'Duties', 'Skills',
+            'Extras', None, None, None, 2, 1, 1)
+        after = JobBoardTest.storage.job_counts()['departments'][1]
+        self.assertEqual(after, before + 1)
+
+    def test_search_jobs(self):
+        JobBoardTest.storage.insert_new_job(
+            'Senior Astronomer', 'Remote', 'Map distant galaxies',
+            'Observe', 'Telescopes', 'Extras', None, None, None, 2, 1, 1)
+
+        response = self.client.get('/search?q=astronomer')
+        body = response.get_data(as_text=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Senior Astronomer', body)
+        self.assertIn('Existing Company', body)
+
+        response = self.client.get('/search?q=galaxies&department=999')
+        self.assertIn('No jobs match', response.get_data(as_text=True))
+
+    def test_autocomplete(self):
+        response = self.client.get('/autocomplete?q=exist')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn({'kind': 'company', 'text': 'Existing Company'},
+                      response.get_json()['suggestions'])
+
+    def test_company_directory_is_streamed(self):
+        response = self.client.get('/companies')
+        self.assertTrue(response.is_streamed)
+        self.assertIn('Existing Company', response.get_data(as_text=True))
+        response.close()
+        self.assertIsNone(getattr(app_storage._local, 'connection',
+                                  None))
+
+    def test_iter_companies_in_batches(self):
+        companies = list(JobBoardTest.storage.iter_companies(batch_size=1))
+        self.assertEqual([company['id'] for company in companies],
+                         sorted(company['id'] for company
+                                in JobBoardTest.storage.all_companies()))
+
+    def test_conditional_get(self):
+        response = self.client.get('/companies')
+        etag = response.headers['ETag']
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Last-Modified', response.headers)
+
+        response = self.client.get('/companies',
+                                   headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.data, b'')
+        self.assertIn('desc="0 queries"', response.headers['Server-Timing'])
+
+        JobBoardTest.storage.update_company_profile_logo(1, 'test.png')
+        response = self.client.get('/companies',
+                                   headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+    def test_conditional_get_follows_new_jobs(self):
+        response = self.client.get('/companies/2/jobs')
+        etag = response.headers['ETag']
+        JobBoardTest.storage.insert_new_job(
+            'Fresh Job', 'Remote', 'Overview', 'Duties', 'Skills', 'Extras',
+            None, None, None, 2, 1, 1)
+        response = self.client.get('/companies/2/jobs',
+                                   headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Fresh Job', response.get_data(as_text=True))
+
+    def test_conditional_get_ignores_other_companies_jobs(self):
+        response = self.client.get('/companies/1/jobs')
+        etag = response.headers['ETag']
+        JobBoardTest.storage.insert_new_job(
+            'Fresh Job', 'Remote', 'Overview', 'Duties', 'Skills', 'Extras',
+            None, None, None, 2, 1, 1)
+        response = self.client.get('/companies/1/jobs',
+                                   headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+    def test_conditional_pages_leave_out_job_counts(self):
+        body = self.client.get('/companies').get_data(as_text=True)
+        self.assertIn('data-job-counts-url="/jobs/counts"', body)
+        self.assertIn('data-department-id="1"', body)
+
+        body = self.client.get('/jobs').get_data(as_text=True)
+        self.assertNotIn('data-job-counts-url', body)
+
+    def test_show_job_counts(self):
+        response = self.client.get('/jobs/counts')
+        counts = JobBoardTest.storage.job_counts()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json(), {
+            'departments': {str(id_): count for id_, count
+                            in counts['departments'].items()},
+            'employment_types': {str(id_): count for id_, count
+                                 in counts['employment_types'].items()}})
+
+    def test_server_timing_header(self):
+        response = self.client.get('/jobs')
+        timing = response.headers['Server-Timing']
+        for metric in ('db;dur=', 'conn;dur=', 'render;dur=', 'total;dur='):
+            self.assertIn(metric, timing)
+
+    def test_warm_layout_renders_without_queries(self):
+        self.client.get('/')
+        response = self.client.get('/')
+        self.assertIn('desc="0 queries"', response.headers['Server-Timing'])
+
+    def test_metrics_endpoint(self):
+        self.client.get('/jobs')
+        response = self.client.get('/_metrics')
+        body = response.get_data(as_text=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain'))
+        self.assertIn('# TYPE job_board_request_queries histogram', body)
+        self.assertIn('job_board_request_duration_seconds_count'
+                      '{endpoint="show_recent_jobs"}', body)
+
+    def test_request_metrics_hidden_when_not_exposed(self):
+        with patch.dict(app.config, EXPOSE_REQUEST_METRICS=False):
+            response = self.client.get('/jobs')
+            self.assertNotIn('Server-Timing', response.headers)
+            self.assertEqual(self.client.get('/_metrics').status_code, 404)
+
+    def test_search_jobs_empty_query(self):
+        response = self.client.get('/search?q=')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Enter a job title, skill or keyword to search.',
+                      response.get_data(as_text=True))
+
     def test_show_company_profile_incorrect_id(self):
         response = self.client.get('/companies/9')
         self.assertEqual(response.status_code, 422)
@@ -361,6 +713,125 @@ class JobBoardTest(unittest.TestCase):
         self.assertIn("Successfully posted new job 'New Job Test'.",
                       response.get_data(as_text=True))
 
+    def job_edit(self, version, title='Edited Job', department_id=1):
+        return {'version': version, 'title': title, 'location': 'Remote',
+                'employment_type': 1, 'department': department_id,
+                'role_overview': 'Overview', 'responsibilities': 'Duties',
+                'requirements': 'Skills', 'nice_to_haves': 'Extras',
+                'benefits': '', 'pay_range': '', 'closing_date': ''}
+
+    def test_edit_job(self):
+        job_id = JobBoardTest.storage.insert_new_job(
+            'Job To Edit', 'Remote', 'Overview', 'Duties', 'Skills', 'Extras',
+            None, None, None, 1, 1, 1)
+        client = self.admin_session()
+        response = client.get(f'/post_job/1/jobs/{job_id}')
+        self.assertIn('value="Job To Edit"', response.get_data(as_text=True))
+
+        department_id = JobBoardTest.storage.add_department('Edited Jobs')
+        response = client.post(f'/post_job/1/jobs/{job_id}',
+                               data=self.job_edit(1, department_id=
+                                                  department_id),
+                               follow_redirects=True)
+        self.assertIn("Successfully updated job &#39;Edited Job&#39;.",
+                      response.get_data(as_text=True))
+        job = JobBoardTest.storage.find_job(job_id, 1)
+        self.assertEqual((job['title'], job['version']), ('Edited Job', 2))
+        self.assertEqual(job['department_id'], department_id)
+
+    def test_edit_job_conflict(self):
+        job_id = JobBoardTest.storage.insert_new_job(
+            'Contested Job', 'Remote', 'Overview', 'Duties', 'Skills',
+            'Extras', None, None, None, 1, 1, 1)
+        client = self.admin_session()
+        client.post(f'/post_job/1/jobs/{job_id}',
+                    data=self.job_edit(1, 'First Edit'))
+        response = client.post(f'/post_job/1/jobs/{job_id}',
+                               data=self.job_edit(1, 'Second Edit'))
+        self.assertEqual(response.status_code, 409)
+        self.assertIn('value="First Edit"', response.get_data(as_text=True))
+        self.assertEqual(JobBoardTest.storage.find_job(job_id, 1)['title'],
+                         'First Edit')
+
+    def test_edit_job_invalid_version(self):
+        job_id = JobBoardTest.storage.insert_new_job(
+            'Versioned Job', 'Remote', 'Overview', 'Duties', 'Skills',
+            'Extras', None, None, None, 1, 1, 1)
+        client = self.admin_session()
+        for version in ('abc', ''):
+            with self.subTest(version=version):
+                response = client.post(f'/post_job/1/jobs/{job_id}',
+                                       data=self.job_edit(version))
+                self.assertEqual(response.status_code, 422)
+                self.assertIn("could not be matched to a version",
+                              response.get_data(as_text=True))
+
+        data = self.job_edit(1)
+        del data['version']
+        response = client.post(f'/post_job/1/jobs/{job_id}', data=data)
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(JobBoardTest.storage.find_job(job_id, 1)['title'],
+                         'Versioned Job')
+
+    def test_edit_other_company_job(self):
+        job_id = JobBoardTest.storage.insert_new_job(
+            'Not Yours', 'Remote', 'Overview', 'Duties', 'Skills', 'Extras',
+            None, None, None, 2, 1, 1)
+        client = self.admin_session()
+        response = client.post(f'/post_job/1/jobs/{job_id}',
+                               data=self.job_edit(1))
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(JobBoardTest.storage.find_job(job_id, 2)['title'],
+                         'Not Yours')
+
+    def upload_jobs(self, client, content, filename='jobs.csv'):
+        return client.post('/companies/1/dashboard/import_jobs',
+                           data={'jobs_file': (BytesIO(content), filename)},
+                           content_type='multipart/form-data',
+                           follow_redirects=True)
+
+    def test_import_jobs(self):
+        client = self.admin_session()
+        content = ("title,location,department,employment_type,role_overview,"
+                   "responsibilities,requirements,closing_date\n"
+                   "Imported One,Remote,testing department,Full-time,"
+                   "\"Line one\nLine\ttwo \\ end\",Duties,Skills,"
+                   "2030-01-31\n"
+                   "Imported Two,Remote,Testing Department,Full-time,"
+                   "Overview,Duties,Skills,\n").encode('utf-8')
+        response = self.upload_jobs(client, content)
+        self.assertIn('Successfully imported 2 jobs.',
+                      response.get_data(as_text=True))
+        self.assertIn('Imported Two', response.get_data(as_text=True))
+
+        jobs = JobBoardTest.storage.find_job_page(1, limit=100).jobs
+        imported = {job['title']: job for job in jobs}
+        self.assertEqual(imported['Imported One']['role_overview'],
+                         'Line one\nLine\ttwo \\ end')
+        self.assertEqual(str(imported['Imported One']['closing_date']),
+                         '2030-01-31')
+        self.assertEqual(imported['Imported Two']['department'],
+                         'Testing Department')
+
+    def test_import_jobs_invalid_rows(self):
+        client = self.admin_session()
+        content = (b'{"title": "Never Imported", "location": "Remote", '
+                   b'"department": "Testing Department", '
+                   b'"employment_type": "Full-time", "role_overview": "O", '
+                   b'"responsibilities": "D", "requirements": "S"}\n'
+                   b'{"title": "Bad Row", "department": "Nope"}\n')
+        response = self.upload_jobs(client, content, 'jobs.jsonl')
+        self.assertEqual(response.status_code, 422)
+        self.assertIn("Row 2: unknown department",
+                      response.get_data(as_text=True))
+        jobs = JobBoardTest.storage.find_job_page(1, limit=100).jobs
+        self.assertNotIn('Never Imported', [job['title'] for job in jobs])
+
+    def test_import_jobs_unknown_format(self):
+        client = self.admin_session()
+        response = self.upload_jobs(client, b'', 'jobs.xlsx')
+        self.assertEqual(response.status_code, 422)
+
     @unittest.skip
     def test_signup_missing_required(self):
         response = self.client.post('/signup',
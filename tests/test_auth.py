@@ -0,0 +1,47 @@
+import unittest
+
+from job_board.auth import SessionVerifier
+
+class FakeStorage:
+    def __init__(self):
+        self.queries = 0
+        self.versions = {1: 1}
+        self.subscribers = {}
+
+    def subscribe(self, topic, callback):
+        self.subscribers.setdefault(topic, []).append(callback)
+
+    def publish(self, topic, key=None):
+        for callback in self.subscribers.get(topic, []):
+            callback(key)
+
+    def find_company_session_version(self, company_id):
+        self.queries += 1
+        return self.versions.get(company_id)
+
+class SessionVerifierTest(unittest.TestCase):
+    def setUp(self):
+        self.storage = FakeStorage()
+        self.verifier = SessionVerifier(self.storage)
+
+    def test_cached_after_first_check(self):
+        self.assertTrue(self.verifier.is_valid(1, 1))
+        self.assertTrue(self.verifier.is_valid(1, 1))
+        self.assertEqual(self.storage.queries, 1)
+
+    def test_stale_version_and_missing_company(self):
+        self.assertFalse(self.verifier.is_valid(1, 0))
+        self.assertFalse(self.verifier.is_valid(2, 1))
+        self.assertFalse(self.verifier.is_valid(None, 1))
+
+    def test_company_events_evict(self):
+        self.assertTrue(self.verifier.is_valid(1, 1))
+        del self.storage.versions[1] # company deleted
+        self.storage.publish('companies', 1)
+        self.assertFalse(self.verifier.is_valid(1, 1))
+
+    def test_expires_after_ttl(self):
+        verifier = SessionVerifier(self.storage, ttl=0)
+        verifier.is_valid(1, 1)
+        verifier.is_valid(1, 1)
+        self.assertEqual(self.storage.queries, 2)
@@ -0,0 +1,117 @@
+import threading
+import unittest
+
+from job_board.autocomplete import PrefixIndex
+
+class FakeStorage:
+    def __init__(self):
+        self.subscribers = {}
+        self.terms = {1: {('company', 'BlueTech Solutions'),
+                          ('title', 'Senior Python Developer'),
+                          ('location', 'New York, NY')},
+                      2: {('company', 'GreenLeaf Eco'),
+                          ('location', 'New York, NY')}}
+        self.queries = 0
+        self.closed = 0
+
+    def subscribe(self, topic, callback):
+        self.subscribers.setdefault(topic, []).append(callback)
+
+    def publish(self, topic, key):
+        for callback in self.subscribers.get(topic, []):
+            callback(key)
+
+    def close(self):
+        self.closed += 1
+
+    def autocomplete_terms(self, company_id=None):
+        self.queries += 1
+        return [(id_, kind, text) for id_, terms in self.terms.items()
+                if company_id in (None, id_) for kind, text in terms]
+
+class PrefixIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.storage = FakeStorage()
+        self.index = PrefixIndex(self.storage, background=False)
+
+    def test_matches_prefix_case_insensitively(self):
+        self.assertEqual(self.index.suggest('blue'),
+                         [('company', 'BlueTech Solutions')])
+
+    def test_matches_any_word_start(self):
+        self.assertEqual(self.index.suggest('pyth'),
+                         [('title', 'Senior Python Developer')])
+        self.assertEqual(self.index.suggest('york'),
+                         [('location', 'New York, NY')])
+
+    def test_builds_once(self):
+        self.index.suggest('a')
+        self.index.suggest('b')
+        self.assertEqual(self.storage.queries, 1)
+
+    def test_respects_limit(self):
+        self.assertEqual(len(self.index.suggest('n', limit=1)), 1)
+
+    def test_refreshes_only_the_changed_company(self):
+        self.index.suggest('blue')
+        self.storage.terms[1] = {('company', 'BlueWave Solutions')}
+        self.storage.publish('companies', 1)
+        self.assertEqual(self.index.suggest('blue'),
+                         [('company', 'BlueWave Solutions')])
+        self.assertEqual(self.index.suggest('pyth'), [])
+        # still listed for company 2
+        self.assertEqual(self.index.suggest('new'),
+                         [('location', 'New York, NY')])
+        self.assertEqual(self.storage.queries, 2)
+
+    def test_bounded_entries(self):
+        index = PrefixIndex(self.storage, max_entries=3, background=False)
+        index.suggest('x')
+        self.assertLessEqual(index.stats()['entries'], 3)
+        self.assertGreater(index.stats()['skipped'], 0)
+
+    def test_rebuilds_after_a_reset_during_a_build(self):
+        read = self.storage.autocomplete_terms
+        def reset_once(company_id=None):
+            terms = read(company_id)
+            if self.storage.queries == 1:
+                self.storage.terms[2] = {('company', 'GreenWave Eco')}
+                self.storage.publish('companies', None)
+            return terms
+
+        self.storage.autocomplete_terms = reset_once
+        self.assertEqual(self.index.suggest('green'),
+                         [('company', 'GreenWave Eco')])
+        self.assertEqual(self.storage.queries, 2)
+
+    def test_serves_previous_index_while_rebuilding(self):
+        index = PrefixIndex(self.storage)
+        read = self.storage.autocomplete_terms
+        gate = threading.Event() # full reads wait until it is set
+        def gated_terms(company_id=None):
+            if company_id is None:
+                gate.wait(5)
+            return read(company_id)
+        self.storage.autocomplete_terms = gated_terms
+
+        self.assertEqual(index.suggest('blue'), []) # not built yet
+        gate.set()
+        self.wait_for(lambda: index.suggest('blue'))
+
+        gate.clear()
+        self.storage.terms[1] = {('company', 'BlueWave Solutions')}
+        self.storage.publish('companies', None)
+        self.assertEqual(index.suggest('blue'),
+                         [('company', 'BlueTech Solutions')])
+
+        gate.set()
+        self.wait_for(lambda: index.suggest('blue') ==
+                      [('company', 'BlueWave Solutions')])
+        self.wait_for(lambda: self.storage.closed == 2)
+
+    def wait_for(self, condition):
+        for _ in range(500):
+            if condition():
+                return
+            threading.Event().wait(0.01)
+        self.fail("condition not met")
@@ -0,0 +1,58 @@
+import unittest
+
+from job_board.benchmark import Suite, compare, format_time, measure
+from job_board.database_persistence import DatabasePersistence
+from tests.benchmarks import suite
+from tests.test_query_plans import NOT_QUERIES
+
+def results(**medians):
+    return {'benchmarks': [{'name': name, 'group': None,
+                            'stats': {'median': median}}
+                           for name, median in medians.items()]}
+
+class MeasureTest(unittest.TestCase):
+    def test_calibrates_iterations_to_min_time(self):
+        calls = []
+        stats = measure(lambda: calls.append(None), min_time=0.001, rounds=3)
+        self.assertEqual(stats['rounds'], 3)
+        self.assertGreater(stats['iterations'], 1)
+        self.assertGreater(len(calls), 3 * stats['iterations'])
+        self.assertLessEqual(stats['min'], stats['median'])
+        self.assertLessEqual(stats['median'], stats['max'])
+
+    def test_selects_benchmarks_by_name(self):
+        local = Suite()
+        local.add('storage.a')(lambda: None)
+        local.add('render.b')(lambda: None)
+        run = local.run(['render'], min_time=0.001, rounds=1)
+        self.assertEqual([benchmark['name'] for benchmark in
+                          run['benchmarks']], ['render.b'])
+
+    def test_rejects_duplicate_names(self):
+        local = Suite()
+        local.add('a')(lambda: None)
+        with self.assertRaises(ValueError):
+            local.add('a')(lambda: None)
+
+class CompareTest(unittest.TestCase):
+    def test_flags_medians_beyond_threshold(self):
+        rows = compare(results(fast=1.05, slow=1.5, new=1.0),
+                       results(fast=1.0, slow=1.0), threshold=0.10)
+        self.assertEqual([(name, regressed) for name, *_, regressed in rows],
+                         [('fast', False), ('slow', True)])
+
+    def test_format_time(self):
+        self.assertEqual(format_time(1.5), '1.50 s')
+        self.assertEqual(format_time(0.0025), '2.50 ms')
+        self.assertEqual(format_time(0.0000031), '3.10 us')
+        self.assertEqual(format_time(0.0000000042), '4 ns')
+
+class SuiteTest(unittest.TestCase):
+    def test_every_storage_method_is_benchmarked(self):
+        methods = {name for name in dir(DatabasePersistence)
+                   if not name.startswith('_')
+                   and callable(getattr(DatabasePersistence, name))}
+        benchmarked = {name.split('.')[1].split('[')[0]
+                       for name in suite.benchmarks
+                       if name.startswith('storage.')}
+        self.assertEqual(methods - NOT_QUERIES, benchmarked)
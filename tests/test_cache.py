@@ -0,0 +1,106 @@
+import unittest
+
+from job_board.cache import LazySequence, TaxonomyCache, TTLCache
+
+class FakeStorage:
+    def __init__(self):
+        self.queries = 0
+        self.subscribers = {}
+        self.departments = [{'id': 2, 'name': 'Design'},
+                            {'id': 1, 'name': 'Engineering'}]
+
+    def subscribe(self, topic, callback):
+        self.subscribers.setdefault(topic, []).append(callback)
+
+    def get_employment_types(self):
+        self.queries += 1
+        return [{'id': 1, 'type': 'Full-time'}]
+
+    def get_departments(self):
+        self.queries += 1
+        return list(self.departments)
+
+    def add_department(self, name):
+        self.departments.append({'id': 3, 'name': name})
+        for callback in self.subscribers.get('taxonomy', []):
+            callback(None)
+
+class TaxonomyCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.storage = FakeStorage()
+        self.taxonomy = TaxonomyCache(self.storage)
+
+    def test_loads_once(self):
+        self.assertEqual(self.taxonomy.departments[0].name, 'Design')
+        self.assertEqual(self.taxonomy.employment_types[0].type, 'Full-time')
+        self.assertEqual(self.taxonomy.departments_by_id[1].name,
+                         'Engineering')
+        self.assertEqual(self.storage.queries, 2)
+        self.assertEqual(self.taxonomy.stats(),
+                         {'hits': 2, 'misses': 1, 'loaded': True})
+
+    def test_rows_are_immutable(self):
+        self.assertIsInstance(self.taxonomy.departments, tuple)
+        with self.assertRaises(TypeError):
+            self.taxonomy.departments_by_id[9] = None
+
+    def test_write_invalidates(self):
+        self.assertEqual(len(self.taxonomy.departments), 2)
+        self.storage.add_department('Legal')
+        self.assertEqual(len(self.taxonomy.departments), 3)
+        self.assertEqual(self.storage.queries, 4)
+
+    def test_lazy_sequence_not_loaded_until_used(self):
+        departments = LazySequence(lambda: self.taxonomy.departments)
+        self.assertEqual(self.storage.queries, 0)
+        self.assertEqual([row.id for row in departments], [2, 1])
+        self.assertEqual(self.storage.queries, 2)
+
+class TTLCacheTest(unittest.TestCase):
+    def test_get_or_load_caches(self):
+        cache = TTLCache(ttl=60)
+        calls = []
+        load = lambda: calls.append(1) or 'value'
+        self.assertEqual(cache.get_or_load('key', load), 'value')
+        self.assertEqual(cache.get_or_load('key', load), 'value')
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.stats(), {'hits': 1, 'misses': 1, 'size': 1})
+
+    def test_entries_expire(self):
+        cache = TTLCache(ttl=-1)
+        cache.set('key', 'value')
+        self.assertIsNone(cache.get('key'))
+
+    def test_evicts_least_recently_used(self):
+        cache = TTLCache(ttl=60, max_size=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+
+    def test_load_racing_an_eviction_is_not_stored(self):
+        cache = TTLCache(ttl=60)
+
+        def load():
+            cache.evict('key') # a write lands while loading
+            return 'stale'
+
+        self.assertEqual(cache.get_or_load('key', load), 'stale')
+        self.assertIsNone(cache.get('key'))
+
+    def test_get_many_or_load_loads_misses_once(self):
+        cache = TTLCache(ttl=60)
+        cache.set('a', 1)
+        calls = []
+
+        def load(keys):
+            calls.append(keys)
+            return {key: key.upper() for key in keys}
+
+        self.assertEqual(cache.get_many_or_load(['a', 'b', 'c'], load),
+                         {'a': 1, 'b': 'B', 'c': 'C'})
+        self.assertEqual(cache.get_many_or_load(['b', 'c'], load),
+                         {'b': 'B', 'c': 'C'})
+        self.assertEqual(calls, [['b', 'c']])
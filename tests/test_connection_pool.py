@@ -0,0 +1,64 @@
+import unittest
+from types import SimpleNamespace
+
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+from job_board.connection_pool import ConnectionPool, PoolTimeout
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = 0
+        self.info = SimpleNamespace(transaction_status=TRANSACTION_STATUS_IDLE)
+        self.rollbacks = 0
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = 1
+
+class ConnectionPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.opened = []
+
+    def connect(self):
+        connection = FakeConnection()
+        self.opened.append(connection)
+        return connection
+
+    def test_reuses_returned_connection(self):
+        pool = ConnectionPool(self.connect, max_size=2)
+        first = pool.getconn()
+        pool.putconn(first)
+        second = pool.getconn()
+        self.assertIs(first, second)
+        self.assertEqual(len(self.opened), 1)
+
+    def test_times_out_when_exhausted(self):
+        pool = ConnectionPool(self.connect, max_size=1, timeout=0.01)
+        pool.getconn()
+        with self.assertRaises(PoolTimeout):
+            pool.getconn()
+
+    def test_recycles_connections_past_max_lifetime(self):
+        pool = ConnectionPool(self.connect, max_size=1, max_lifetime=0)
+        first = pool.getconn()
+        pool.putconn(first)
+        second = pool.getconn()
+        self.assertIsNot(first, second)
+        self.assertTrue(first.closed)
+
+    def test_discards_closed_connections(self):
+        pool = ConnectionPool(self.connect, max_size=1)
+        first = pool.getconn()
+        first.close()
+        pool.putconn(first)
+        self.assertEqual(pool.stats()['size'], 0)
+        self.assertIsNot(pool.getconn(), first)
+
+    def test_rolls_back_open_transaction_on_return(self):
+        pool = ConnectionPool(self.connect, max_size=1)
+        connection = pool.getconn()
+        connection.info.transaction_status = None # anything but idle
+        pool.putconn(connection)
+        self.assertEqual(connection.rollbacks, 1)
@@ -0,0 +1,65 @@
+import unittest
+
+import psycopg2
+from psycopg2.errors import DivisionByZero
+
+from job_board.connection_pool import connection_kwargs, get_pool
+from job_board.database_persistence import DatabasePersistence
+
+from tests.fixtures import (
+    SharedConnectionPool,
+    TransactionalTestCase,
+    migrations_fingerprint
+)
+
+class TransactionalTestCaseTest(TransactionalTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.storage = DatabasePersistence()
+        cls.storages = (cls.storage,)
+        cls.department_id = cls.storage.add_department('Fixture Department')
+
+    def count(self, query, params=()):
+        with self.storage._database_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, params)
+                return cursor.fetchone()[0]
+
+    def test_storage_shares_the_class_connection(self):
+        self.assertIsInstance(get_pool(), SharedConnectionPool)
+        with self.storage._database_connection() as conn:
+            self.assertIs(conn, self.connection)
+
+    def test_identities_restart_for_each_class(self):
+        self.assertEqual(self.department_id, 1)
+
+    def test_rows_are_rolled_back_after_each_test(self):
+        self.storage.add_department('Rolled Back Department')
+        self.assertEqual(self.count("SELECT count(*) FROM departments"), 2)
+
+        self.doCleanups() # as after the test
+        self.assertEqual(self.count("SELECT count(*) FROM departments"), 1)
+
+    def test_failed_block_only_undoes_itself(self):
+        self.storage.add_employment_type('Kept')
+        with self.assertRaises(DivisionByZero):
+            with self.storage._database_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("INSERT INTO employment_types (type) "
+                                   "VALUES ('Undone')")
+                    cursor.execute("SELECT 1 / 0")
+
+        self.assertEqual(self.count("SELECT count(*) FROM employment_types"),
+                         1)
+
+    def test_nothing_is_committed(self):
+        with psycopg2.connect(**connection_kwargs()) as other, \
+                other.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM departments")
+            self.assertEqual(cursor.fetchone()[0], 0)
+        other.close()
+
+class FingerprintTest(unittest.TestCase):
+    def test_stable_for_the_same_migrations(self):
+        self.assertEqual(migrations_fingerprint(), migrations_fingerprint())
@@ -0,0 +1,73 @@
+import unittest
+
+from jinja2 import DictLoader, Environment
+
+from job_board.fragments import FragmentCache
+
+class FakeStorage:
+    def __init__(self):
+        self.subscribers = {}
+
+    def subscribe(self, topic, callback):
+        self.subscribers.setdefault(topic, []).append(callback)
+
+    def publish(self, topic, key=None):
+        for callback in self.subscribers.get(topic, []):
+            callback(key)
+
+class FragmentCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.renders = 0
+
+        def count():
+            self.renders += 1
+            return ''
+
+        environment = Environment(autoescape=True, loader=DictLoader(
+            {'card.html': '{{ count() }}<b>{{ job.title }}</b>'}))
+        environment.globals['count'] = count
+        self.storage = FakeStorage()
+        self.fragments = FragmentCache(self.storage, environment, max_size=2)
+
+    def render(self, company_id, job_id, title='Engineer'):
+        return self.fragments.render('card.html', company_id, job_id,
+                                     job={'title': title})
+
+    def test_renders_once(self):
+        self.assertEqual(self.render(1, 10), '<b>Engineer</b>')
+        self.assertEqual(self.render(1, 10), '<b>Engineer</b>')
+        self.assertEqual(self.renders, 1)
+
+    def test_follows_the_row_it_is_given(self):
+        self.render(1, 10)
+        self.assertEqual(self.render(1, 10, 'Manager'), '<b>Manager</b>')
+        self.assertEqual(self.renders, 2)
+
+    def test_row_loaded_before_a_write_is_not_cached_as_current(self):
+        # a page loads the job, then a write lands before it renders
+        self.storage.publish('jobs', 1)
+        self.assertEqual(self.render(1, 10, 'Engineer'), '<b>Engineer</b>')
+        self.assertEqual(self.render(1, 10, 'Manager'), '<b>Manager</b>')
+
+    def test_output_is_markup(self):
+        self.assertEqual(self.render(1, 10, '<i>'), '<b>&lt;i&gt;</b>')
+        self.assertTrue(hasattr(self.render(1, 10), '__html__'))
+
+    def test_writes_invalidate_their_company(self):
+        self.render(1, 10)
+        self.render(2, 20)
+        self.storage.publish('jobs', 1)
+        self.render(1, 10)
+        self.render(2, 20)
+        self.assertEqual(self.renders, 3)
+
+    def test_taxonomy_changes_invalidate_everything(self):
+        self.render(1, 10)
+        self.storage.publish('taxonomy')
+        self.render(1, 10)
+        self.assertEqual(self.renders, 2)
+
+    def test_size_bounded(self):
+        for job_id in range(5):
+            self.render(1, job_id)
+        self.assertEqual(self.fragments.stats()['size'], 2)
@@ -0,0 +1,77 @@
+import os
+import unittest
+
+from job_board.connection_pool import get_pool
+from job_board.instrumentation import (
+    current_metrics,
+    end_request,
+    EndpointHistograms,
+    RequestMetrics,
+    start_request,
+    timed
+)
+
+class RequestMetricsTest(unittest.TestCase):
+    def tearDown(self):
+        end_request()
+
+    def test_server_timing(self):
+        metrics = RequestMetrics()
+        metrics.queries = 3
+        metrics.db_time = 0.0125
+        metrics.finish()
+        timing = metrics.server_timing()
+        self.assertIn('db;dur=12.50;desc="3 queries"', timing)
+        self.assertIn('total;dur=', timing)
+
+    def test_timed_adds_to_current_request(self):
+        with timed('acquire_time'):
+            pass # no request: nothing recorded, nothing raised
+
+        metrics = start_request()
+        self.assertIs(current_metrics(), metrics)
+        with timed('acquire_time'):
+            pass
+        self.assertGreater(metrics.acquire_time, 0)
+
+    def test_nested_renders_count_once(self):
+        metrics = RequestMetrics()
+        metrics.render_started()
+        metrics.render_started()
+        metrics.render_finished()
+        inner_done = metrics.render_time
+        metrics.render_finished()
+        self.assertEqual(inner_done, 0)
+        self.assertGreater(metrics.render_time, 0)
+
+    def test_pooled_connections_count_queries(self):
+        os.environ['FLASK_ENV'] = 'test'
+        metrics = start_request()
+        connection = get_pool().getconn()
+        try:
+            with connection, connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+                cursor.execute('SELECT 2')
+        finally:
+            get_pool().putconn(connection)
+
+        self.assertEqual(metrics.queries, 2)
+        self.assertGreater(metrics.db_time, 0)
+
+class EndpointHistogramsTest(unittest.TestCase):
+    def test_render(self):
+        histograms = EndpointHistograms()
+        metrics = RequestMetrics()
+        metrics.queries = 4
+        metrics.finish()
+        histograms.observe('show_recent_jobs', metrics)
+        histograms.observe('show_recent_jobs', metrics)
+
+        text = histograms.render()
+        label = 'endpoint="show_recent_jobs"'
+        self.assertIn(f'job_board_request_queries_bucket{{{label},le="3"}} 0',
+                      text)
+        self.assertIn(f'job_board_request_queries_bucket{{{label},le="5"}} 2',
+                      text)
+        self.assertIn(f'job_board_request_queries_count{{{label}}} 2', text)
+        self.assertIn(f'job_board_request_queries_sum{{{label}}} 8', text)
@@ -0,0 +1,65 @@
+import json
+import os
+import queue
+import threading
+import unittest
+
+from job_board.connection_pool import get_pool
+from job_board.database_persistence import DatabasePersistence
+from job_board.invalidation import CHANNEL, InvalidationListener, origin_id
+
+class InvalidationListenerTest(unittest.TestCase):
+    def setUp(self):
+        os.environ['FLASK_ENV'] = 'test'
+        self.storage = DatabasePersistence()
+        self.events = queue.Queue()
+        self.storage.subscribe('jobs', self.events.put)
+        self.listener = InvalidationListener(self.storage, poll_interval=0.1)
+        self.listener.ensure_started()
+        # every topic is flushed once the listener is connected
+        self.assertIsNone(self.events.get(timeout=5))
+
+    def tearDown(self):
+        self.listener.stop()
+        self.storage.close()
+
+    def send(self, origin, topic, key):
+        connection = get_pool().getconn()
+        try:
+            with connection, connection.cursor() as cursor:
+                cursor.execute("SELECT pg_notify(%s, %s)", (CHANNEL,
+                    json.dumps({'origin': origin, 'topic': topic,
+                                'key': key})))
+        finally:
+            get_pool().putconn(connection)
+
+    def test_republishes_notifications_from_other_workers(self):
+        self.send('another-host:1', 'jobs', 7)
+        self.assertEqual(self.events.get(timeout=5), 7)
+
+    def test_ignores_own_notifications(self):
+        self.send(origin_id(), 'jobs', 7)
+        self.send('another-host:1', 'jobs', 8)
+        self.assertEqual(self.events.get(timeout=5), 8)
+
+    def test_concurrent_first_calls_start_one_thread(self):
+        listener = InvalidationListener(self.storage, poll_interval=0.1)
+        barrier = threading.Barrier(8)
+        def start():
+            barrier.wait()
+            listener.ensure_started()
+
+        before = self.listener_threads()
+        callers = [threading.Thread(target=start) for _ in range(8)]
+        for caller in callers:
+            caller.start()
+        for caller in callers:
+            caller.join()
+        try:
+            self.assertEqual(self.listener_threads(), before + 1)
+        finally:
+            listener.stop()
+
+    def listener_threads(self):
+        return sum(thread.name == 'cache-invalidation'
+                   for thread in threading.enumerate())
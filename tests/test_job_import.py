@@ -0,0 +1,120 @@
+import json
+import unittest
+from datetime import date
+from io import BytesIO
+
+from job_board.cache import Department, EmploymentType
+from job_board.job_import import (
+    InvalidImport,
+    MAX_REPORTED_ERRORS,
+    detect_format,
+    import_jobs,
+    read_rows,
+    validate_row
+)
+
+DEPARTMENTS = {'engineering': 1}
+EMPLOYMENT_TYPES = {'full-time': 2}
+
+def row(**fields):
+    return dict({'title': 'Engineer', 'location': 'Remote',
+                 'department': 'Engineering', 'employment_type': 'Full-time',
+                 'role_overview': 'Build things', 'responsibilities': 'Code',
+                 'requirements': 'Python'}, **fields)
+
+class FakeTaxonomy:
+    departments = (Department(1, 'Engineering'),)
+    employment_types = (EmploymentType(2, 'Full-time'),)
+
+class FakeStorage:
+    def __init__(self):
+        self.batches = []
+
+    def import_jobs(self, company_id, batches):
+        for batch in batches:
+            self.batches.append(batch)
+        return sum(len(batch) for batch in self.batches)
+
+class ReadRowsTest(unittest.TestCase):
+    def rows(self, content, file_format):
+        return list(read_rows(BytesIO(content.encode('utf-8')), file_format))
+
+    def test_csv(self):
+        rows = self.rows('title,location\nEngineer,"Remote, EU"\n', 'csv')
+        self.assertEqual(rows, [(1, {'title': 'Engineer',
+                                     'location': 'Remote, EU'})])
+
+    def test_json_lines(self):
+        rows = self.rows('{"title": "A"}\n\nnot json\n', 'jsonl')
+        self.assertEqual(rows, [(1, {'title': 'A'}), (2, None)])
+
+    def test_yaml_documents_and_lists(self):
+        rows = self.rows('title: A\n---\n- title: B\n- title: C\n', 'yaml')
+        self.assertEqual([number for number, _ in rows], [1, 2, 3])
+        self.assertEqual(rows[2][1], {'title': 'C'})
+
+    def test_invalid_yaml(self):
+        with self.assertRaises(InvalidImport):
+            self.rows('title: [unclosed\n', 'yaml')
+
+    def test_detect_format(self):
+        self.assertEqual(detect_format('jobs.CSV'), 'csv')
+        self.assertEqual(detect_format('jobs.ndjson'), 'jsonl')
+        self.assertEqual(detect_format('jobs.yml'), 'yaml')
+        self.assertIsNone(detect_format('jobs.xlsx'))
+
+class ValidateRowTest(unittest.TestCase):
+    def test_valid_row(self):
+        job, errors = validate_row(row(closing_date='2030-01-31',
+                                       pay_range=''),
+                                   DEPARTMENTS, EMPLOYMENT_TYPES)
+        self.assertEqual(errors, [])
+        self.assertEqual(job['department_id'], 1)
+        self.assertEqual(job['employment_type_id'], 2)
+        self.assertEqual(job['closing_date'], date(2030, 1, 31))
+        self.assertIsNone(job['pay_range'])
+        self.assertEqual(job['nice_to_haves'], '')
+
+    def test_invalid_row(self):
+        job, errors = validate_row(row(title='', department='Sales',
+                                       location='x' * 101,
+                                       closing_date='soon'),
+                                   DEPARTMENTS, EMPLOYMENT_TYPES)
+        self.assertIsNone(job)
+        self.assertEqual(len(errors), 4)
+
+    def test_not_a_mapping(self):
+        job, errors = validate_row(['Engineer'], DEPARTMENTS,
+                                   EMPLOYMENT_TYPES)
+        self.assertIsNone(job)
+        self.assertTrue(errors)
+
+class ImportJobsTest(unittest.TestCase):
+    def import_lines(self, lines, batch_size=2):
+        storage = FakeStorage()
+        content = '\n'.join(lines).encode('utf-8')
+        count = import_jobs(storage, FakeTaxonomy(), 1, BytesIO(content),
+                            'jsonl', batch_size=batch_size)
+        return storage, count
+
+    def test_batches(self):
+        storage, count = self.import_lines([json.dumps(row())] * 5)
+        self.assertEqual(count, 5)
+        self.assertEqual([len(batch) for batch in storage.batches],
+                         [2, 2, 1])
+
+    def test_errors_stop_the_import(self):
+        lines = [json.dumps(row()), json.dumps(row(title=''))]
+        with self.assertRaises(InvalidImport) as raised:
+            self.import_lines(lines, batch_size=1)
+        self.assertEqual(raised.exception.errors,
+                         ["Row 2: title is required"])
+
+    def test_error_report_is_bounded(self):
+        with self.assertRaises(InvalidImport) as raised:
+            self.import_lines(['{}'] * 100)
+        self.assertEqual(len(raised.exception.errors), MAX_REPORTED_ERRORS)
+
+    def test_empty_file(self):
+        with self.assertRaises(InvalidImport):
+            self.import_lines([])
@@ -0,0 +1,56 @@
+import unittest
+
+from job_board.loadtest import (
+    LoadTest,
+    LoadTestError,
+    compare,
+    format_report,
+    percentile
+)
+
+def report(**scenarios):
+    return {'concurrency': 4, 'duration': 10.0, 'scenarios': scenarios}
+
+def summary(throughput, p50, p95, p99, requests=100):
+    return {'requests': requests, 'errors': 0, 'throughput': throughput,
+            'p50': p50, 'p95': p95, 'p99': p99}
+
+class PercentileTest(unittest.TestCase):
+    def test_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 0.50), 50)
+        self.assertEqual(percentile(values, 0.95), 95)
+        self.assertEqual(percentile(values, 0.99), 99)
+        self.assertEqual(percentile([7], 0.99), 7)
+        self.assertIsNone(percentile([], 0.5))
+
+class CompareTest(unittest.TestCase):
+    def test_reports_regressions_beyond_threshold(self):
+        baseline = report(companies=summary(100, 10, 20, 30))
+        current = report(companies=summary(85, 10.5, 30, 30))
+        self.assertEqual(compare(current, baseline, threshold=0.10), [
+            'companies throughput: 100 -> 85 (-15%)',
+            'companies p95: 20 -> 30 (+50%)',
+        ])
+
+    def test_improvements_and_new_scenarios_pass(self):
+        baseline = report(companies=summary(100, 10, 20, 30))
+        current = report(companies=summary(200, 5, 10, 15),
+                         signin=summary(1, 900, 1000, 1100))
+        self.assertEqual(compare(current, baseline), [])
+
+class LoadTestTest(unittest.TestCase):
+    def test_signing_in_needs_credentials(self):
+        with self.assertRaises(LoadTestError):
+            LoadTest('http://localhost', weights={'signin': 1})
+        LoadTest('http://localhost', weights={'companies': 1, 'signin': 0})
+
+    def test_report(self):
+        load_test = LoadTest('http://localhost', weights={'companies': 1})
+        load_test._latencies['companies'] = [0.01, 0.02, 0.03, 0.04]
+        load_test._errors['companies'] = 1
+        result = load_test.report(2.0)
+        self.assertEqual(result['scenarios']['companies'],
+                         {'requests': 4, 'errors': 1, 'throughput': 2.0,
+                          'p50': 20.0, 'p95': 40.0, 'p99': 40.0})
+        self.assertIn('companies', format_report(result))
@@ -0,0 +1,70 @@
+import os
+import shutil
+import tempfile
+import unittest
+from io import BytesIO
+
+from PIL import Image
+
+from job_board.logos import (
+    InvalidLogo,
+    is_processed,
+    MAX_UPLOAD_BYTES,
+    process_logo,
+    remove_other_variants,
+    SIZES,
+    variant_name
+)
+
+def image_bytes(size=(400, 200), image_format='PNG'):
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 30, 30)).save(buffer, image_format)
+    return buffer.getvalue()
+
+class ProcessLogoTest(unittest.TestCase):
+    def setUp(self):
+        self.logos_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.logos_dir)
+
+    def test_writes_square_variants(self):
+        logo = process_logo(BytesIO(image_bytes()), self.logos_dir, 7)
+        self.assertTrue(is_processed(logo))
+        self.assertTrue(logo.startswith('7-'))
+        for size in SIZES:
+            for extension in ('webp', 'png'):
+                path = os.path.join(self.logos_dir,
+                                    variant_name(logo, size, extension))
+                with Image.open(path) as variant:
+                    self.assertEqual(variant.size, (size, size))
+
+    def test_name_follows_content(self):
+        first = process_logo(BytesIO(image_bytes()), self.logos_dir, 7)
+        again = process_logo(BytesIO(image_bytes()), self.logos_dir, 7)
+        other = process_logo(BytesIO(image_bytes((300, 300))),
+                             self.logos_dir, 7)
+        self.assertEqual(first, again)
+        self.assertNotEqual(first, other)
+
+        remove_other_variants(self.logos_dir, 7, keep=other)
+        self.assertTrue(all(name.startswith(other)
+                            for name in os.listdir(self.logos_dir)))
+
+    def test_rejects_non_images(self):
+        with self.assertRaises(InvalidLogo):
+            process_logo(BytesIO(b'not an image'), self.logos_dir, 7)
+        with self.assertRaises(InvalidLogo):
+            process_logo(BytesIO(image_bytes(image_format='GIF')),
+                         self.logos_dir, 7)
+        self.assertEqual(os.listdir(self.logos_dir), [])
+
+    def test_rejects_oversized_uploads(self):
+        with self.assertRaises(InvalidLogo):
+            process_logo(BytesIO(b'\0' * (MAX_UPLOAD_BYTES + 1)),
+                         self.logos_dir, 7)
+
+    def test_legacy_logos_are_not_processed(self):
+        self.assertFalse(is_processed('2.png'))
+        self.assertFalse(is_processed('logo_placeholder.png'))
+        self.assertFalse(is_processed(None))
@@ -0,0 +1,67 @@
+import unittest
+
+from psycopg2.errors import RaiseException
+
+from job_board.connection_pool import get_pool
+from job_board.migrate import (
+    available_migrations,
+    pending_migrations,
+    run_migrations
+)
+
+from tests.fixtures import prepare_database
+
+class MigrateTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        prepare_database()
+
+    def test_migrations_are_numbered_in_order(self):
+        versions = [version for version, _, _ in available_migrations()]
+        self.assertEqual(versions, sorted(versions))
+        self.assertEqual(versions[0], 1)
+
+    def test_nothing_pending_after_run(self):
+        self.assertEqual(pending_migrations(), [])
+        self.assertEqual(run_migrations(), [])
+
+    def test_every_version_recorded(self):
+        connection = get_pool().getconn()
+        try:
+            with connection, connection.cursor() as cursor:
+                cursor.execute("SELECT version FROM schema_version "
+                               "ORDER BY version")
+                recorded = [row[0] for row in cursor.fetchall()]
+        finally:
+            get_pool().putconn(connection)
+
+        self.assertEqual(recorded, [version for version, _, _
+                                    in available_migrations()])
+
+    def test_email_domain_migration_reports_shared_domains(self):
+        path = next(path for version, _, path in available_migrations()
+                    if version == 10)
+        with open(path, encoding='utf-8') as file:
+            migration = file.read()
+
+        connection = get_pool().getconn()
+        try:
+            with connection.cursor() as cursor:
+                # a legacy companies table, in a schema of its own
+                cursor.execute("""
+                    CREATE SCHEMA legacy;
+                    SET LOCAL search_path TO legacy;
+                    CREATE TABLE companies (id serial PRIMARY KEY,
+                                            email text NOT NULL);
+                    INSERT INTO companies (email)
+                    VALUES ('jobs@Example.com'), ('hr@example.COM'),
+                           ('team@other.org');
+                """)
+                with self.assertRaises(RaiseException) as error:
+                    cursor.execute(migration)
+        finally:
+            connection.rollback()
+            get_pool().putconn(connection)
+
+        self.assertIn('example.com (company ids 1, 2)', str(error.exception))
+        self.assertNotIn('other.org', str(error.exception))
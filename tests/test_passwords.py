@@ -0,0 +1,75 @@
+import os
+import unittest
+from unittest.mock import patch
+
+from job_board.passwords import (
+    choose_rounds,
+    hash_rounds,
+    MAX_ROUNDS,
+    MIN_ROUNDS,
+    PasswordCostNotSet,
+    PasswordHasher,
+    PasswordHasherBusy
+)
+
+class PasswordHasherTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.hasher = PasswordHasher(workers=1, queue_depth=0, rounds=4)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.hasher.shutdown()
+
+    def test_hash_and_check(self):
+        hashed = self.hasher.hash('Secret_pass7')
+        self.assertTrue(hashed.startswith('$2b$04$'))
+        self.assertTrue(self.hasher.check('Secret_pass7', hashed))
+        self.assertFalse(self.hasher.check('wrong', hashed))
+        self.assertIn('job_board_password_seconds_count{operation="check"} 2',
+                      self.hasher.latency.render())
+
+    def test_rejects_when_saturated(self):
+        self.hasher._slots.acquire() # the only slot is busy
+        try:
+            with self.assertRaises(PasswordHasherBusy):
+                self.hasher.check('Secret_pass7', 'not a hash')
+        finally:
+            self.hasher._slots.release()
+
+        self.assertIn('job_board_password_rejected_total'
+                      '{operation="check"} 1', self.hasher.latency.render())
+
+    def test_needs_rehash(self):
+        hasher = PasswordHasher(workers=1, rounds=12)
+        self.assertTrue(hasher.needs_rehash('$2b$10$' + 'x' * 53))
+        self.assertFalse(hasher.needs_rehash('$2b$12$' + 'x' * 53))
+        # a higher cost is kept rather than downgraded
+        self.assertFalse(hasher.needs_rehash('$2b$13$' + 'x' * 53))
+        self.assertTrue(hasher.needs_rehash('plaintext'))
+
+    def test_production_requires_fixed_rounds(self):
+        with patch.dict(os.environ, {'FLASK_ENV': 'production'}):
+            with self.assertRaises(PasswordCostNotSet):
+                PasswordHasher(workers=1).rounds
+            self.assertEqual(PasswordHasher(workers=1, rounds=11).rounds, 11)
+
+    def test_calibrate(self):
+        hasher = PasswordHasher(workers=1, budget=0.001)
+        try:
+            self.assertEqual(hasher.rounds, MIN_ROUNDS)
+        finally:
+            hasher.shutdown()
+
+class RoundsTest(unittest.TestCase):
+    def test_choose_rounds(self):
+        # 4 ms at cost 8 doubles to 64 ms at 12 and 128 ms at 13
+        self.assertEqual(choose_rounds(0.004, 0.1), 12)
+        self.assertEqual(choose_rounds(0.004, 0.128), 13)
+        self.assertEqual(choose_rounds(1.0, 0.1), MIN_ROUNDS)
+        self.assertEqual(choose_rounds(0.0, 1.0), MAX_ROUNDS)
+
+    def test_hash_rounds(self):
+        self.assertEqual(hash_rounds('$2b$12$abc'), 12)
+        self.assertIsNone(hash_rounds('$2b$'))
+        self.assertIsNone(hash_rounds(''))
@@ -0,0 +1,265 @@
+'''
+Query plan regression suite.
+
+Seeds a few thousand companies and tens of thousands of jobs inside a
+transaction that is rolled back afterwards, runs every DatabasePersistence
+method against that data while recording the SQL it sends, and fails if
+the plan for any of those statements scans a large table sequentially.
+'''
+import inspect
+import unittest
+
+import psycopg2
+from psycopg2.extensions import connection as base_connection, cursor
+
+from job_board.connection_pool import connection_kwargs
+from job_board.database_persistence import DatabasePersistence
+
+from tests.fixtures import prepare_database
+
+COMPANIES = 2_000
+JOBS = 50_000
+LARGE_TABLES = {'companies', 'jobs', 'employment_types_jobs',
+                'departments_jobs'}
+
+# Methods that read every row by design, so a full scan is their plan
+FULL_SCAN_ALLOWED = {'all_companies', 'iter_companies'}
+
+# Methods relying on an optional extension
+REQUIRES_EXTENSION = {'fuzzy_autocomplete': 'pg_trgm'}
+
+# Methods that never reach the database
+NOT_QUERIES = {'close', 'subscribe', 'publish', 'publish_all',
+               'cache_stats'}
+
+def _recording_execute(self, query, vars=None):
+    self.connection.statements.append(self.mogrify(query, vars).decode())
+    return super(type(self), self).execute(query, vars)
+
+class RecordingConnection(base_connection):
+    '''
+    Records every statement run through its cursors and never commits
+    when used as a context manager, so seeded rows stay uncommitted
+    '''
+    _cursor_classes = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.statements = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def cursor(self, *args, **kwargs):
+        factory = kwargs.pop('cursor_factory', None) or cursor
+        if factory not in self._cursor_classes:
+            self._cursor_classes[factory] = type(
+                f'Recording{factory.__name__}', (factory,),
+                {'execute': _recording_execute})
+        return super().cursor(*args, cursor_factory=self._cursor_classes[
+            factory], **kwargs)
+
+def sequential_scans(plan):
+    found = []
+    if plan.get('Node Type') == 'Seq Scan':
+        found.append(plan['Relation Name'])
+    for child in plan.get('Plans', []):
+        found.extend(sequential_scans(child))
+    return found
+
+class QueryPlanTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        prepare_database()
+        cls.connection = psycopg2.connect(
+            connection_factory=RecordingConnection, **connection_kwargs())
+        cls.seed(cls.connection)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.connection.rollback()
+        cls.connection.close()
+
+    @staticmethod
+    def seed(connection):
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO employment_types ("type")
+                VALUES ('Plan Type A'), ('Plan Type B')
+            """)
+            cursor.execute("""
+                INSERT INTO departments ("name")
+                SELECT 'Plan Department ' || n FROM generate_series(1, 20) n
+            """)
+            cursor.execute("""
+                INSERT INTO companies
+                ("name", "location", email, "password", "description")
+                SELECT 'Plan Company ' || n, 'Somewhere',
+                       'jobs@plan' || n || '.example', 'x',
+                       repeat('About us. ', 50)
+                FROM generate_series(1, %s) n
+            """, (COMPANIES,))
+            cursor.execute("""
+                INSERT INTO jobs
+                (title, "location", role_overview, responsibilities,
+                requirements, nice_to_haves, posted_date, company_id)
+                SELECT 'Plan Job ' || n, 'Remote', repeat('Role. ', 100),
+                       'Duties', 'Skills', 'Extras',
+                       NOW() - n * interval '1 minute',
+                       (SELECT min(id) FROM companies
+                        WHERE "name" LIKE 'Plan Company %%')
+                       + n %% %s
+                FROM generate_series(1, %s) n
+            """, (COMPANIES, JOBS))
+            cursor.execute("""
+                INSERT INTO employment_types_jobs (employment_type_id, job_id)
+                SELECT (SELECT array_agg(id) FROM employment_types
+                        WHERE "type" LIKE 'Plan Type %')[1 + id % 2], id
+                FROM jobs
+            """)
+            cursor.execute("""
+                INSERT INTO departments_jobs (department_id, job_id)
+                SELECT (SELECT array_agg(id) FROM departments
+                        WHERE "name" LIKE 'Plan Department %')[1 + id % 20],
+                       id
+                FROM jobs
+            """)
+            cursor.execute("ANALYZE")
+            cursor.execute("""
+                SELECT min(id) FROM companies
+                WHERE "name" LIKE 'Plan Company %%'
+            """)
+            QueryPlanTest.company_id = cursor.fetchone()[0]
+
+    def calls(self):
+        '''Sample invocation for every storage method'''
+        company_id = self.company_id
+        return {
+            'all_companies': (),
+            'iter_companies': (),
+            'find_signup_conflicts': ('Plan Company 7', 'PLAN7.example'),
+            'find_company_by_id': (company_id,),
+            'find_company_session_version': (company_id,),
+            'find_company_by_name': ('Plan Company 7',),
+            'find_company_by_email': ('jobs@plan7.example',),
+            'create_new_company': ('Plan Company New', 'Here',
+                                   'new@plan-new.example', 'x', 'About'),
+            'update_company_profile_info': (company_id, 'Plan Company 1',
+                                            'There', 'About'),
+            'update_company_profile_logo': (company_id, 'logo.png'),
+            'update_company_password': (company_id, 'x'),
+            'find_job_page': (company_id,),
+            'job_counts': (),
+            'search_jobs': ('zyzzyva',),
+            'autocomplete_terms': (company_id,),
+            'has_trigram_search': (),
+            'fuzzy_autocomplete': ('Plan Compny 7', 8),
+            'find_content_versions': ([f'company:{company_id}',
+                                       f'company:{company_id}:jobs'],),
+            'get_employment_types': (),
+            'get_departments': (),
+            'add_employment_type': ('Plan Type C',),
+            'add_department': ('Plan Department New',),
+            'find_job': (self.job_id(), company_id),
+            'insert_new_job': ('Plan Job New', 'Remote', 'Role', 'Duties',
+                               'Skills', 'Extras', None, None, None,
+                               company_id, *self.taxonomy_ids()),
+            'update_job': (self.job_id(), company_id, 1, 'Plan Job Edited',
+                           'Remote', 'Role', 'Duties', 'Skills', 'Extras',
+                           None, None, None, *self.taxonomy_ids()),
+            'import_jobs': (company_id, [[self.imported_job()]]),
+            'load_session': ('plan-session',),
+            'save_session': ('plan-session', '{}', 60),
+            'delete_session': ('plan-session',),
+            'delete_expired_sessions': (100,),
+        }
+
+    def job_id(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT min(id) FROM jobs WHERE company_id = %s",
+                           (self.company_id,))
+            return cursor.fetchone()[0]
+
+    def imported_job(self):
+        employment_type_id, department_id = self.taxonomy_ids()
+        return {'title': 'Plan Job Imported', 'location': 'Remote',
+                'role_overview': 'Role', 'responsibilities': 'Duties',
+                'requirements': 'Skills', 'nice_to_haves': '',
+                'benefits': None, 'pay_range': None, 'closing_date': None,
+                'employment_type_id': employment_type_id,
+                'department_id': department_id}
+
+    def taxonomy_ids(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute("""SELECT min(id) FROM employment_types
+                              WHERE "type" LIKE 'Plan Type %'""")
+            employment_type_id = cursor.fetchone()[0]
+            cursor.execute("""SELECT min(id) FROM departments
+                              WHERE "name" LIKE 'Plan Department %'""")
+            department_id = cursor.fetchone()[0]
+        return employment_type_id, department_id
+
+    def has_extension(self, name):
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = %s",
+                           (name,))
+            return cursor.fetchone() is not None
+
+    def statements_for(self, method, args, kwargs={}):
+        storage = DatabasePersistence()
+        storage._local.connection = self.connection
+        self.connection.statements = []
+        result = getattr(storage, method)(*args, **kwargs)
+        if inspect.isgenerator(result):
+            result = list(result) # queries run as it is consumed
+        statements = list(self.connection.statements)
+        return statements, result
+
+    def assert_no_large_seq_scans(self, method, statements):
+        for statement in statements:
+            if statement.lstrip().startswith('CREATE'):
+                continue # DDL has no plan
+            with self.connection.cursor() as cursor:
+                cursor.execute('EXPLAIN (FORMAT JSON) ' + statement)
+                plan = cursor.fetchone()[0][0]['Plan']
+
+            scanned = set(sequential_scans(plan)) & LARGE_TABLES
+            self.assertFalse(scanned,
+                             f"{method} seq scans {sorted(scanned)}:\n"
+                             f"{statement}")
+
+    def test_every_storage_method_is_covered(self):
+        methods = {name for name in dir(DatabasePersistence)
+                   if not name.startswith('_')
+                   and callable(getattr(DatabasePersistence, name))}
+        self.assertEqual(methods - NOT_QUERIES, set(self.calls()))
+
+    def test_no_sequential_scans_on_large_tables(self):
+        for method, args in self.calls().items():
+            if method in FULL_SCAN_ALLOWED:
+                continue
+            if (method in REQUIRES_EXTENSION
+                    and not self.has_extension(REQUIRES_EXTENSION[method])):
+                continue
+            with self.subTest(method=method):
+                statements, _ = self.statements_for(method, args)
+                self.assertTrue(statements, f"{method} ran no queries")
+                self.assert_no_large_seq_scans(method, statements)
+
+    def test_paginated_job_pages_use_index(self):
+        employment_type_id, department_id = self.taxonomy_ids()
+        for filters in ({'company_id': self.company_id}, {},
+                        {'department_id': department_id},
+                        {'employment_type_id': employment_type_id}):
+            _, page = self.statements_for('find_job_page', (), filters)
+            self.assertIsNotNone(page.next_cursor)
+            for cursors in ({'after': page.next_cursor},
+                            {'before': page.next_cursor}):
+                with self.subTest(**filters, **cursors):
+                    statements, _ = self.statements_for(
+                        'find_job_page', (), {**filters, **cursors})
+                    self.assert_no_large_seq_scans('find_job_page',
+                                                   statements)
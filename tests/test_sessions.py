@@ -0,0 +1,126 @@
+import unittest
+from unittest.mock import patch
+
+from flask import Flask, session
+
+from job_board.database_persistence import DatabasePersistence
+from job_board.sessions import ServerSideSession, ServerSideSessionInterface
+
+from tests.fixtures import TransactionalTestCase
+
+def create_app(storage):
+    app = Flask(__name__)
+    app.secret_key = 'test'
+    app.session_interface = ServerSideSessionInterface(storage)
+
+    @app.route('/set/<value>')
+    def set_value(value):
+        session['value'] = value
+        return ''
+
+    @app.route('/get')
+    def get_value():
+        return session.get('value', '')
+
+    @app.route('/nothing')
+    def nothing():
+        return ''
+
+    @app.route('/clear')
+    def clear():
+        session.clear()
+        return ''
+
+    @app.route('/rotate')
+    def rotate():
+        session.rotate()
+        return session.get('value', '')
+
+    return app
+
+class ServerSideSessionTest(TransactionalTestCase):
+    def setUp(self):
+        super().setUp()
+        self.storage = DatabasePersistence()
+        self.app = create_app(self.storage)
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        self.storage.close()
+
+    def session_id(self):
+        cookie = self.client.get_cookie('session')
+        return cookie.value.split('.')[0] if cookie else None
+
+    def test_round_trip(self):
+        self.client.get('/set/hello')
+        self.assertNotIn('hello', self.client.get_cookie('session').value)
+        self.assertEqual(self.client.get('/get').get_data(as_text=True),
+                         'hello')
+
+    def test_untouched_session_is_not_loaded_or_saved(self):
+        with patch.object(self.storage, 'load_session') as load:
+            response = self.client.get('/nothing')
+        load.assert_not_called()
+        self.assertNotIn('Set-Cookie', response.headers)
+
+    def test_reads_are_cached(self):
+        self.client.get('/set/cached')
+        with patch.object(self.storage, 'load_session',
+                          wraps=self.storage.load_session) as load:
+            self.client.get('/get')
+            self.client.get('/get')
+        self.assertEqual(load.call_count, 1)
+
+    def test_writes_evict_cached_copies(self):
+        self.client.get('/set/first')
+        self.client.get('/get')
+        self.storage.publish('sessions', self.session_id())
+        with patch.object(self.storage, 'load_session',
+                          wraps=self.storage.load_session) as load:
+            self.client.get('/get')
+        self.assertEqual(load.call_count, 1)
+
+    def test_clear_deletes_session(self):
+        self.client.get('/set/gone')
+        sid = self.session_id()
+        self.client.get('/clear')
+        self.assertIsNone(self.client.get_cookie('session'))
+        self.assertIsNone(self.storage.load_session(sid))
+
+    def test_tampered_cookie_starts_new_session(self):
+        self.client.get('/set/secret')
+        self.client.set_cookie('session', 'forged.signature')
+        self.assertEqual(self.client.get('/get').get_data(as_text=True), '')
+
+    def test_rotate_moves_data_to_new_id(self):
+        self.client.get('/set/kept')
+        old_sid = self.session_id()
+        self.assertEqual(self.client.get('/rotate').get_data(as_text=True),
+                         'kept')
+        self.assertNotEqual(self.session_id(), old_sid)
+        self.assertIsNone(self.storage.load_session(old_sid))
+        self.assertEqual(self.client.get('/get').get_data(as_text=True),
+                         'kept')
+
+    def test_cleanup_deletes_expired_sessions(self):
+        self.storage.save_session('expired-session', '{}', -1)
+        interface = ServerSideSessionInterface(self.storage, cleanup_batch=1)
+        self.assertGreaterEqual(interface.cleanup(), 1)
+        self.assertIsNone(self.storage.load_session('expired-session'))
+
+class ServerSideSessionObjectTest(unittest.TestCase):
+    def test_loads_lazily(self):
+        loads = []
+        session = ServerSideSession('sid', lambda sid: loads.append(sid)
+                                    or {'a': 1})
+        self.assertFalse(session.loaded)
+        self.assertEqual(session['a'], 1)
+        self.assertEqual(loads, ['sid'])
+        self.assertFalse(session.modified)
+
+    def test_unknown_id_becomes_new_session(self):
+        session = ServerSideSession('stale', lambda sid: None)
+        self.assertEqual(len(session), 0)
+        self.assertTrue(session.new)
+        self.assertIsNone(session.sid)
@@ -0,0 +1,54 @@
+import unittest
+
+from job_board.database_persistence import DatabasePersistence
+from job_board.synthetic import NAME_PREFIX, generate
+
+from tests.fixtures import prepare_database
+
+class GenerateTest(unittest.TestCase):
+    def setUp(self):
+        prepare_database() # committed rows: generate() has its own connection
+        self.storage = DatabasePersistence()
+        self.department_id = self.storage.add_department('Synthetic Dept')
+        self.employment_type_id = self.storage.add_employment_type(
+            'Synthetic Type')
+
+    def tearDown(self):
+        with self.storage._database_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("DELETE FROM companies WHERE name LIKE %s",
+                               (NAME_PREFIX + '%',))
+                cursor.execute("DELETE FROM departments WHERE id = %s",
+                               (self.department_id,))
+                cursor.execute("DELETE FROM employment_types WHERE id = %s",
+                               (self.employment_type_id,))
+        self.storage.close()
+
+    def query(self, query, params=()):
+        with self.storage._database_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, params)
+                return cursor.fetchone()
+
+    def test_generates_companies_and_jobs(self):
+        company_ids = generate(3, 25, 'not-a-hash', batch_size=10)
+        self.assertEqual(len(company_ids), 3)
+
+        jobs, departments, types, longest = self.query("""
+            SELECT count(*), count(dj.id), count(etj.id),
+                   max(length(role_overview))
+            FROM jobs
+            LEFT JOIN departments_jobs AS dj ON dj.job_id = jobs.id
+            LEFT JOIN employment_types_jobs AS etj ON etj.job_id = jobs.id
+            WHERE company_id = ANY(%s)
+        """, (company_ids,))
+        self.assertEqual((jobs, departments, types), (25, 25, 25))
+        self.assertLessEqual(longest, 1000)
+        self.assertGreaterEqual(longest, 333)
+
+    def test_numbers_continue_after_existing_companies(self):
+        first = generate(2, 0, 'not-a-hash')
+        second = generate(2, 0, 'not-a-hash')
+        names = self.query("SELECT array_agg(name ORDER BY id) FROM companies "
+                           "WHERE id = ANY(%s)", (first + second,))[0]
+        self.assertEqual(len(set(names)), 4)